@@ -0,0 +1,174 @@
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""_common.py.
+
+This module contains the corpus loading and reporting functions shared by the
+benchmark helpers. Like `regenerate_outputs.py`, the helpers read their inputs
+from `regtest_names.csv` and the stored outputs in the `corpora` directory.
+"""
+
+import bz2
+import codecs
+import importlib
+import os
+import struct
+import sys
+
+CORPORA = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), '..', 'corpora'
+)
+
+
+def load_names(corpora_dir=CORPORA):
+    """Return the names list used to generate the corpora.
+
+    Parameters
+    ----------
+    corpora_dir : str
+        The directory containing the corpora
+
+    Returns
+    -------
+    list
+        The names in `regtest_names.csv`, in order
+
+    """
+    with open(os.path.join(corpora_dir, 'regtest_names.csv')) as names_file:
+        next(names_file)
+        return [name.strip() for name in names_file]
+
+
+def load_dist_corpus(algo, corpora_dir=CORPORA):
+    """Return the stored values of a distance measure.
+
+    The value at index i is the measure's value for names i & i+1.
+
+    Parameters
+    ----------
+    algo : str
+        The name of the measure, e.g. 'levenshtein_dist_abs'
+    corpora_dir : str
+        The directory containing the corpora
+
+    Returns
+    -------
+    list
+        The stored values, as Python floats
+
+    """
+    with bz2.open(os.path.join(corpora_dir, algo + '.dat.bz2'), 'rb') as file:
+        return [val for (val,) in struct.iter_unpack('<f', file.read())]
+
+
+def load_csv_corpus(algo, corpora_dir=CORPORA):
+    """Return the stored outputs of a phonetic or fingerprint algorithm.
+
+    Parameters
+    ----------
+    algo : str
+        The name of the algorithm, e.g. 'soundex'
+    corpora_dir : str
+        The directory containing the corpora
+
+    Returns
+    -------
+    list
+        The stored outputs, one per name
+
+    """
+    with codecs.open(
+        os.path.join(corpora_dir, algo + '.csv'), encoding='UTF-8'
+    ) as transformed:
+        transformed.readline()
+        return [trans[:-1] for trans in transformed]
+
+
+def load_reg_test(module):
+    """Return one of the regression test modules, e.g. `reg_test_phonetic`.
+
+    The regression tests are a subpackage of the Abydos tests, so the module
+    is imported by its package path, with the directory holding the tests
+    package added to the import path.
+
+    Parameters
+    ----------
+    module : str
+        The name of the regression test module
+
+    Returns
+    -------
+    module
+        The imported module
+
+    """
+    regression = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    tests = os.path.dirname(regression)
+    if os.path.dirname(tests) not in sys.path:
+        sys.path.insert(0, os.path.dirname(tests))
+    return importlib.import_module(
+        '.'.join(
+            (os.path.basename(tests), os.path.basename(regression), module)
+        )
+    )
+
+
+def to_float32(val):
+    """Return a value cast to a 32-bit float.
+
+    The distance corpora are stored as 32-bit floats, so calculated values
+    must be cast the same way before they are compared.
+
+    Parameters
+    ----------
+    val : float
+        The value to cast
+
+    Returns
+    -------
+    float
+        The value, as stored in a distance corpus
+
+    """
+    return struct.unpack('<f', struct.pack('<f', val))[0]
+
+
+def report(label, value):
+    """Write a right-aligned result line, as in `regenerate_outputs.py`.
+
+    Parameters
+    ----------
+    label : str
+        The label of the result
+    value : str
+        The formatted result
+
+    """
+    sys.stdout.write(label + ' ' * max(1, 38 - len(label) - len(value)))
+    sys.stdout.write(value + '\n')
+    sys.stdout.flush()
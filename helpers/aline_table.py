@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""aline_table.py.
+
+This module contains an ALINE measure that scores alignments from precomputed
+tables. :py:class:`ALINE` rebuilds the feature dicts of every segment on each
+call and computes the skip, substitution & expansion scores of each cell
+feature by feature. Here each distinct feature vector is numbered once, the
+substitution scores & feature differences of the phone set are tabulated at
+construction, and the segment sequences of strings are kept for reuse, so
+that the dynamic programming fill only adds table entries.
+
+Run as a script, it checks every name pair against the stored `aline_sim` &
+`aline_sim_score` corpora and compares throughput with :py:class:`ALINE`. An
+optional argument sets the stride through the names for the baseline
+(default 20).
+"""
+
+import sys
+from time import time
+
+from abydos.distance import ALINE
+
+from _common import load_dist_corpus, load_names, report, to_float32
+
+_NINF = float('-inf')
+
+
+class TabulatedALINE(ALINE):
+    """ALINE similarity, scored from precomputed tables.
+
+    Scores are identical to those of :py:class:`ALINE`. Alignments other than
+    the top score are produced by :py:class:`ALINE` itself.
+    """
+
+    def __init__(self, cache_size=2 ** 16, **kwargs):
+        """Initialize TabulatedALINE instance.
+
+        Parameters
+        ----------
+        cache_size : int
+            The maximum number of strings whose segment sequences & self
+            scores are kept; the caches are emptied when they fill
+        **kwargs
+            Arbitrary keyword arguments, as for :py:class:`ALINE`
+
+        """
+        super(TabulatedALINE, self).__init__(**kwargs)
+        self._cache_size = cache_size
+        self._segments_cache = {}
+        self._self_scores = {}
+
+        # feature vectors (as sorted item tuples), their numbers & vowel costs
+        self._vector_ids = {}
+        self._vectors = []
+        self._vwl = []
+        self._delta = {}
+        self._sub = {}
+
+        for phone in self._phones.values():
+            if 'supplemental' not in phone:
+                self._vector_id(
+                    {
+                        key: self.feature_weights[value]
+                        for key, value in phone.items()
+                    }
+                )
+        for seg1 in range(len(self._vectors)):
+            for seg2 in range(len(self._vectors)):
+                self._sub_score(seg1, seg2)
+
+    def _vector_id(self, features):
+        """Return the number of a feature vector, adding it if it is new.
+
+        Parameters
+        ----------
+        features : dict
+            A segment's feature weights
+
+        Returns
+        -------
+        int
+            The feature vector's number
+
+        """
+        vector = tuple(sorted(features.items()))
+        if vector not in self._vector_ids:
+            self._vector_ids[vector] = len(self._vectors)
+            self._vectors.append(features)
+            self._vwl.append(
+                0.0
+                if features['manner'] > self.feature_weights['high vowel']
+                else self._c_vwl
+            )
+        return self._vector_ids[vector]
+
+    def _delta_score(self, seg1, seg2):
+        """Return the weighted feature difference of two segments.
+
+        Parameters
+        ----------
+        seg1 : int
+            The number of the first feature vector
+        seg2 : int
+            The number of the second feature vector
+
+        Returns
+        -------
+        float
+            The salience-weighted difference of the segments' features
+
+        """
+        diff = self._delta.get((seg1, seg2))
+        if diff is None:
+            feat1 = self._vectors[seg1]
+            feat2 = self._vectors[seg2]
+            # the features are summed in the order that ALINE sums them
+            features = (
+                self.c_features
+                if max(feat1['manner'], feat2['manner'])
+                > self.feature_weights['high vowel']
+                else self.v_features
+            )
+            diff = 0.0
+            for f in features:
+                diff += (
+                    abs(feat1.get(f, 0.0) - feat2.get(f, 0.0))
+                    * self.salience[f]
+                )
+            self._delta[seg1, seg2] = diff
+        return diff
+
+    def _sub_score(self, seg1, seg2):
+        """Return the substitution score of two segments.
+
+        Parameters
+        ----------
+        seg1 : int
+            The number of the first feature vector
+        seg2 : int
+            The number of the second feature vector
+
+        Returns
+        -------
+        float
+            The substitution score, as ALINE's sigma_sub
+
+        """
+        score = self._sub.get((seg1, seg2))
+        if score is None:
+            score = (
+                self._c_sub
+                - self._delta_score(seg1, seg2)
+                - self._vwl[seg1]
+                - self._vwl[seg2]
+            )
+            self._sub[seg1, seg2] = score
+        return score
+
+    def _exp_score(self, seg1, seg2a, seg2b):
+        """Return the expansion score of a segment and a segment pair.
+
+        Parameters
+        ----------
+        seg1 : int
+            The number of the expanded segment's feature vector
+        seg2a : int
+            The number of the first feature vector of the pair
+        seg2b : int
+            The number of the second feature vector of the pair
+
+        Returns
+        -------
+        float
+            The expansion score, as ALINE's sigma_exp
+
+        """
+        return (
+            self._c_exp
+            - self._delta_score(seg1, seg2a)
+            - self._delta_score(seg1, seg2b)
+            - self._vwl[seg1]
+            - max(self._vwl[seg2a], self._vwl[seg2b])
+        )
+
+    def _segments(self, word):
+        """Return the feature vector numbers of the segments of a string.
+
+        Parameters
+        ----------
+        word : str
+            The string to segment
+
+        Returns
+        -------
+        tuple
+            The feature vector number of each segment
+
+        """
+        segments = self._segments_cache.get(word)
+        if segments is not None:
+            return segments
+
+        feats = [dict(self._phones[ch]) for ch in word if ch in self._phones]
+        # supplemental diacritics modify the nearest preceding full segment
+        for i in range(1, len(feats)):
+            if 'supplemental' in feats[i]:
+                for j in range(i - 1, -1, -1):
+                    if 'supplemental' not in feats[j]:
+                        for key, value in feats[i].items():
+                            if key != 'supplemental':
+                                feats[j][key] = value
+                        break
+        segments = tuple(
+            self._vector_id(
+                {
+                    key: self.feature_weights[value]
+                    for key, value in feat.items()
+                }
+            )
+            for feat in feats
+            if 'supplemental' not in feat
+        )
+
+        if len(self._segments_cache) >= self._cache_size:
+            self._segments_cache.clear()
+        self._segments_cache[word] = segments
+        return segments
+
+    def _score(self, src, tar):
+        """Return the top ALINE alignment score of two segment sequences.
+
+        Parameters
+        ----------
+        src : tuple
+            Source feature vector numbers
+        tar : tuple
+            Target feature vector numbers
+
+        Returns
+        -------
+        float
+            ALINE alignment score
+
+        """
+        mode = self._mode
+        c_skip = self._c_skip
+        floor = 0.0 if mode in {'local', 'half-local'} else _NINF
+        sub_score = self._sub_score
+        exp_score = self._exp_score
+        src_len = len(src)
+        tar_len = len(tar)
+
+        if mode == 'global':
+            prev = [0.0]
+            for j in range(tar_len):
+                prev.append(prev[j] + c_skip)
+        else:
+            prev = [0.0] * (tar_len + 1)
+        prev2 = None
+        best = max(prev)
+
+        for i in range(1, src_len + 1):
+            seg1 = src[i - 1]
+            row = [prev[0] + c_skip if mode == 'global' else 0.0]
+            for j in range(1, tar_len + 1):
+                seg2 = tar[j - 1]
+                row.append(
+                    max(
+                        prev[j] + c_skip,
+                        row[j - 1] + c_skip,
+                        prev[j - 1] + sub_score(seg1, seg2),
+                        prev[j - 2] + exp_score(seg1, tar[j - 2], seg2)
+                        if j > 1
+                        else _NINF,
+                        prev2[j - 1] + exp_score(seg2, src[i - 2], seg1)
+                        if i > 1
+                        else _NINF,
+                        floor,
+                    )
+                )
+            row_best = max(row)
+            if row_best > best:
+                best = row_best
+            prev2 = prev
+            prev = row
+
+        if mode in {'global', 'half-local'}:
+            return prev[tar_len]
+        return best
+
+    def alignments(self, src, tar, score_only=False):
+        """Return the ALINE alignments of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+        score_only : bool
+            Return the score only, not the alignments
+
+        Returns
+        -------
+        list(tuple(float, str, str) or float
+            ALINE alignments and their scores or the top score
+
+        """
+        if not score_only:
+            return super(TabulatedALINE, self).alignments(src, tar)
+        return self._score(self._segments(src), self._segments(tar))
+
+    def sim(self, src, tar):
+        """Return the normalized ALINE similarity of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            Normalized ALINE similarity
+
+        """
+        num = self.sim_score(src, tar)
+        if num:
+            return num / self._normalizer(
+                [self._self_score(src), self._self_score(tar)]
+            )
+        return 0.0
+
+    def _self_score(self, word):
+        """Return the ALINE alignment score of a string with itself.
+
+        Parameters
+        ----------
+        word : str
+            The string
+
+        Returns
+        -------
+        float
+            ALINE alignment score
+
+        """
+        score = self._self_scores.get(word)
+        if score is None:
+            score = self.sim_score(word, word)
+            if len(self._self_scores) >= self._cache_size:
+                self._self_scores.clear()
+            self._self_scores[word] = score
+        return score
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(len(names) - 1)]
+    sample = pairs[::step]
+
+    mismatches = 0
+    for method in ('sim_score', 'sim'):
+        algo = 'aline_' + method
+
+        cmp = getattr(ALINE(), method)
+        start = time()
+        for src, tar in sample:
+            cmp(src, tar)
+        baseline = len(sample) / (time() - start)
+        report(algo, '{:0.1f} pairs/s'.format(baseline))
+
+        tab_cmp = getattr(TabulatedALINE(), method)
+        start = time()
+        calcs = [tab_cmp(src, tar) for src, tar in pairs]
+        rate = len(pairs) / (time() - start)
+        report(
+            algo + ' tabulated',
+            '{:0.1f} pairs/s ({:0.1f}x)'.format(rate, rate / baseline),
+        )
+
+        for (src, tar), val, calc in zip(pairs, load_dist_corpus(algo), calcs):
+            if to_float32(calc) != val:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} mismatch for: {} & {}: {} != {}\n'.format(
+                        algo, src, tar, calc, val
+                    )
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""banded_edit.py.
+
+This module contains thresholded variants of the Levenshtein,
+Damerau-Levenshtein, and Typo distances. Each takes a `max_distance` argument
+and, when it is set, restricts the dynamic programming to the diagonal band
+that can hold values no greater than `max_distance` and stops as soon as
+every cell in a row exceeds it. Distances greater than `max_distance` are not
+calculated exactly; `max_distance + 1` is returned in their place.
+
+Run as a script, it checks that every value not exceeding the cutoff matches
+the stored `.dat.bz2` corpus for the pairs of consecutive names and reports
+throughput against the cutoff. Values that differ from the corpus but match
+the installed parent measure are reported as changed in Abydos (as the Typo
+corpus is). An optional argument sets the stride through the pairs (default
+10); a stride of 1 checks every pair.
+"""
+
+import sys
+from array import array
+from itertools import chain
+from math import log
+from time import time
+
+from abydos.distance import DamerauLevenshtein, Levenshtein, Typo
+
+from _common import load_dist_corpus, load_names, report
+
+_INF = float('inf')
+
+
+def _band(max_distance, ins_cost, del_cost):
+    """Return the widths of the band below & above the main diagonal.
+
+    Parameters
+    ----------
+    max_distance : int or float
+        The cutoff distance
+    ins_cost : int or float
+        The cost of an insertion
+    del_cost : int or float
+        The cost of a deletion
+
+    Returns
+    -------
+    tuple
+        The number of diagonals below (deletions) & above (insertions) the
+        main diagonal that can hold values no greater than max_distance
+
+    """
+    return int(max_distance // del_cost), int(max_distance // ins_cost)
+
+
+class BandedLevenshtein(Levenshtein):
+    """Levenshtein distance with an optional cutoff.
+
+    With `max_distance` set, :py:meth:`dist_abs` fills only the diagonal band
+    of the alignment matrix that can hold values up to the cutoff and returns
+    `max_distance + 1` as soon as the distance is known to exceed it. Tapered
+    costs are not banded and fall back to :py:class:`Levenshtein`.
+    """
+
+    def __init__(self, max_distance=None, **kwargs):
+        """Initialize BandedLevenshtein instance.
+
+        Parameters
+        ----------
+        max_distance : int or float
+            The cutoff distance; None (the default) computes the full matrix
+        **kwargs
+            Arbitrary keyword arguments passed to :py:class:`Levenshtein`
+
+        """
+        super(BandedLevenshtein, self).__init__(**kwargs)
+        self._max_distance = max_distance
+
+    def dist_abs(self, src, tar):
+        """Return the Levenshtein distance, up to the cutoff.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        int (may return a float if cost has float values)
+            The Levenshtein distance between src & tar, or max_distance + 1
+            if it exceeds max_distance
+
+        """
+        max_distance = self._max_distance
+        if max_distance is None or self._taper_enabled:
+            return super(BandedLevenshtein, self).dist_abs(src, tar)
+
+        ins_cost, del_cost, sub_cost, trans_cost = self._cost
+        over = max_distance + 1
+        src_len = len(src)
+        tar_len = len(tar)
+
+        if src == tar:
+            return 0
+        if src_len > tar_len:
+            if (src_len - tar_len) * del_cost > max_distance:
+                return over
+        elif (tar_len - src_len) * ins_cost > max_distance:
+            return over
+
+        osa = self._mode == 'osa'
+        # A transposition skips a row, so the row minimum bounds the distance
+        # only while a cheaper edit can stand in for it.
+        early_exit = not osa or min(del_cost, sub_cost) <= trans_cost
+        below, above = _band(max_distance, ins_cost, del_cost)
+
+        prev_row = [
+            j * ins_cost if j <= above else _INF for j in range(tar_len + 1)
+        ]
+        prev_prev_row = None
+        for i in range(1, src_len + 1):
+            row = [_INF] * (tar_len + 1)
+            if i <= below:
+                row[0] = i * del_cost
+            row_min = row[0]
+            src_char = src[i - 1]
+            for j in range(max(1, i - below), min(tar_len, i + above) + 1):
+                tar_char = tar[j - 1]
+                val = prev_row[j - 1]
+                if src_char != tar_char:
+                    val += sub_cost
+                    if (
+                        osa
+                        and i > 1
+                        and j > 1
+                        and src_char == tar[j - 2]
+                        and src[i - 2] == tar_char
+                    ):
+                        swap = prev_prev_row[j - 2] + trans_cost
+                        if swap < val:
+                            val = swap
+                cand = prev_row[j] + del_cost
+                if cand < val:
+                    val = cand
+                cand = row[j - 1] + ins_cost
+                if cand < val:
+                    val = cand
+                row[j] = val
+                if val < row_min:
+                    row_min = val
+            if early_exit and row_min > max_distance:
+                return over
+            prev_prev_row, prev_row = prev_row, row
+
+        distance = prev_row[tar_len]
+        return distance if distance <= max_distance else over
+
+
+class BandedDamerauLevenshtein(DamerauLevenshtein):
+    """Damerau-Levenshtein distance with an optional cutoff.
+
+    With `max_distance` set, :py:meth:`dist_abs` computes the
+    Lowrance-Wagner recurrence over the diagonal band that can hold values up
+    to the cutoff and returns `max_distance + 1` once the distance is known to
+    exceed it.
+
+    A cutoff requires unit costs: with other costs, the parent's recurrence
+    takes the distance before a transposition from one row or column off
+    when the transposed character is the first of either string, and
+    truncates its matrix to integers, so its values are not the
+    Lowrance-Wagner distances the band computes.
+    """
+
+    def __init__(self, max_distance=None, **kwargs):
+        """Initialize BandedDamerauLevenshtein instance.
+
+        Parameters
+        ----------
+        max_distance : int or float
+            The cutoff distance; None (the default) computes the full matrix
+        **kwargs
+            Arbitrary keyword arguments passed to
+            :py:class:`DamerauLevenshtein`
+
+        Raises
+        ------
+        ValueError
+            Unsupported cost assignment; a cutoff requires unit costs.
+
+        """
+        super(BandedDamerauLevenshtein, self).__init__(**kwargs)
+        if max_distance is not None and tuple(self._cost) != (1, 1, 1, 1):
+            raise ValueError(
+                'Unsupported cost assignment; a cutoff requires unit costs.'
+            )
+        self._max_distance = max_distance
+
+    def dist_abs(self, src, tar):
+        """Return the Damerau-Levenshtein distance, up to the cutoff.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        int
+            The Damerau-Levenshtein distance between src & tar, or
+            max_distance + 1 if it exceeds max_distance
+
+        """
+        max_distance = self._max_distance
+        if max_distance is None:
+            return super(BandedDamerauLevenshtein, self).dist_abs(src, tar)
+
+        ins_cost, del_cost, sub_cost, trans_cost = self._cost
+        over = max_distance + 1
+        src_len = len(src)
+        tar_len = len(tar)
+
+        if src == tar:
+            return 0
+        if abs(src_len - tar_len) > max_distance:
+            return over
+
+        below, above = _band(max_distance, ins_cost, del_cost)
+
+        # d_mat[i][j] holds the distance between src[:i] & tar[:j]
+        d_mat = [
+            [j * ins_cost if j <= above else _INF for j in range(tar_len + 1)]
+        ]
+        last_row = {}
+        for i in range(1, src_len + 1):
+            row = [_INF] * (tar_len + 1)
+            if i <= below:
+                row[0] = i * del_cost
+            row_min = row[0]
+            prev_row = d_mat[i - 1]
+            src_char = src[i - 1]
+            lo = max(1, i - below)
+            # last column left of the band where src_char matched
+            last_col = tar.rfind(src_char, 0, lo - 1) + 1
+            for j in range(lo, min(tar_len, i + above) + 1):
+                tar_char = tar[j - 1]
+                swap_row = last_row.get(tar_char, 0)
+                swap_col = last_col
+                val = prev_row[j - 1]
+                if src_char == tar_char:
+                    last_col = j
+                else:
+                    val += sub_cost
+                cand = prev_row[j] + del_cost
+                if cand < val:
+                    val = cand
+                cand = row[j - 1] + ins_cost
+                if cand < val:
+                    val = cand
+                if swap_row and swap_col:
+                    cand = (
+                        d_mat[swap_row - 1][swap_col - 1]
+                        + (i - swap_row - 1) * del_cost
+                        + (j - swap_col - 1) * ins_cost
+                        + trans_cost
+                    )
+                    if cand < val:
+                        val = cand
+                row[j] = val
+                if val < row_min:
+                    row_min = val
+            # A transposition may skip any number of rows, deleting the
+            # source characters between; deleting them instead bounds the
+            # row minimum, since a deletion costs no more than a
+            # transposition.
+            if row_min > max_distance:
+                return over
+            d_mat.append(row)
+            last_row[src_char] = i
+
+        distance = d_mat[src_len][tar_len]
+        return distance if distance <= max_distance else over
+
+
+class BandedTypo(Typo):
+    """Typo distance with an optional cutoff.
+
+    With `max_distance` set, :py:meth:`dist_abs` fills only the diagonal band
+    of the edit matrix that can hold values up to the cutoff and returns
+    `max_distance + 1` as soon as the distance is known to exceed it.
+    Substitution costs are cached per character pair. Like the parent's
+    matrix, the rows hold 32-bit floats, so each cell is rounded as it is
+    stored and the values match the parent's exactly.
+    """
+
+    def __init__(self, max_distance=None, **kwargs):
+        """Initialize BandedTypo instance.
+
+        Parameters
+        ----------
+        max_distance : float
+            The cutoff distance; None (the default) computes the full matrix
+        **kwargs
+            Arbitrary keyword arguments passed to :py:class:`Typo`
+
+        """
+        super(BandedTypo, self).__init__(**kwargs)
+        self._max_distance = max_distance
+        self._sub_costs = {}
+
+    def _keyboard_name(self, src, tar):
+        """Return the name of the keyboard layout to use for src & tar.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        str
+            The name of a layout in Typo._keyboard
+
+        """
+        if self._layout != 'auto':
+            return self._layout
+        letters = set(src) | set(tar)
+        for kb in ['QWERTY', 'QWERTZ', 'AZERTY']:
+            if not (letters - set(chain(*chain(*self._keyboard[kb])))):
+                return kb
+        return 'QWERTY'
+
+    def _substitution_cost(self, kb_name, char1, char2):
+        """Return the cost of substituting char2 for char1.
+
+        Parameters
+        ----------
+        kb_name : str
+            The name of the keyboard layout
+        char1 : str
+            The source character
+        char2 : str
+            The target character
+
+        Returns
+        -------
+        float
+            The substitution cost
+
+        Raises
+        ------
+        ValueError
+            char not found in any keyboard layouts
+
+        """
+        key = (kb_name, char1, char2)
+        if key in self._sub_costs:
+            return self._sub_costs[key]
+
+        ins_cost, del_cost, sub_cost, shift_cost = self._cost
+        keyboard = self._keyboard[kb_name]
+        lowercase = set(chain(*keyboard[0]))
+        uppercase = set(chain(*keyboard[1]))
+
+        if self._failsafe and not (
+            char1 in lowercase | uppercase and char2 in lowercase | uppercase
+        ):
+            cost = ins_cost + del_cost
+        else:
+            coords = []
+            kb_arrays = []
+            for char in (char1, char2):
+                if char in lowercase:
+                    kb_array = keyboard[0]
+                elif char in uppercase:
+                    kb_array = keyboard[1]
+                else:
+                    raise ValueError(
+                        char + ' not found in any keyboard layouts'
+                    )
+                for row_num, row in enumerate(kb_array):  # pragma: no branch
+                    if char in row:
+                        coords.append((row_num, row.index(char)))
+                        break
+                kb_arrays.append(kb_array)
+
+            (row1, col1), (row2, col2) = coords
+            if self._metric in {'manhattan', 'log-manhattan'}:
+                dist = abs(row1 - row2) + abs(col1 - col2)
+            else:
+                dist = ((row1 - row2) ** 2 + (col1 - col2) ** 2) ** 0.5
+            if self._metric.startswith('log-'):
+                dist = log(1 + dist)
+            cost = sub_cost * (
+                dist + shift_cost * (kb_arrays[0] != kb_arrays[1])
+            )
+
+        self._sub_costs[key] = cost
+        return cost
+
+    def dist_abs(self, src, tar):
+        """Return the typo distance, up to the cutoff.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            Typo distance, or max_distance + 1 if it exceeds max_distance
+
+        Raises
+        ------
+        ValueError
+            char not found in any keyboard layouts
+
+        """
+        max_distance = self._max_distance
+        if max_distance is None:
+            return super(BandedTypo, self).dist_abs(src, tar)
+
+        ins_cost, del_cost = self._cost[:2]
+        over = max_distance + 1
+        src_len = len(src)
+        tar_len = len(tar)
+
+        if src == tar:
+            return 0.0
+        if src_len > tar_len:
+            if (src_len - tar_len) * del_cost > max_distance:
+                return over
+        elif (tar_len - src_len) * ins_cost > max_distance:
+            return over
+        if not src:
+            return tar_len * ins_cost
+        if not tar:
+            return src_len * del_cost
+
+        kb_name = self._keyboard_name(src, tar)
+        sub = self._substitution_cost
+        below, above = _band(max_distance, ins_cost, del_cost)
+
+        # rows of 32-bit floats, like the parent's matrix
+        prev_row = array(
+            'f',
+            [j * ins_cost if j <= above else _INF for j in range(tar_len + 1)],
+        )
+        for i in range(1, src_len + 1):
+            row = array('f', [_INF]) * (tar_len + 1)
+            if i <= below:
+                row[0] = i * del_cost
+            row_min = row[0]
+            src_char = src[i - 1]
+            for j in range(max(1, i - below), min(tar_len, i + above) + 1):
+                tar_char = tar[j - 1]
+                val = prev_row[j - 1]
+                if src_char != tar_char:
+                    val += sub(kb_name, src_char, tar_char)
+                cand = prev_row[j] + del_cost
+                if cand < val:
+                    val = cand
+                cand = row[j - 1] + ins_cost
+                if cand < val:
+                    val = cand
+                row[j] = val
+                if row[j] < row_min:
+                    row_min = row[j]
+            if row_min > max_distance:
+                return over
+            prev_row = row
+
+        distance = prev_row[tar_len]
+        return distance if distance <= max_distance else over
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    measures = {
+        'levenshtein_dist_abs': BandedLevenshtein,
+        'dameraulevenshtein_dist_abs': BandedDamerauLevenshtein,
+        'typo_dist_abs': BandedTypo,
+    }
+    cutoffs = {
+        'levenshtein_dist_abs': (1, 2, 3, 5),
+        'dameraulevenshtein_dist_abs': (1, 2, 3, 5),
+        'typo_dist_abs': (1.0, 2.0, 3.0, 5.0),
+    }
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(0, len(names) - 1, step)]
+
+    mismatches = 0
+    for algo, cls in measures.items():
+        # the stored values are 32-bit floats
+        stored = load_dist_corpus(algo)[::step]
+
+        # without a cutoff, each class is its parent measure
+        cmp = cls()
+        start = time()
+        for src, tar in pairs:
+            cmp.dist_abs(src, tar)
+        report(
+            '{} parent'.format(algo),
+            '{:0.0f} pairs/s'.format(len(pairs) / (time() - start)),
+        )
+
+        for max_distance in cutoffs[algo]:
+            cmp = cls(max_distance=max_distance)
+            start = time()
+            calcs = [cmp.dist_abs(src, tar) for src, tar in pairs]
+            dur = time() - start
+
+            changed = 0
+            for (src, tar), val, calc, calc32 in zip(
+                pairs, stored, calcs, array('f', calcs)
+            ):
+                if val <= max_distance:
+                    if calc32 == val:
+                        continue
+                elif calc > max_distance:
+                    continue
+
+                val = cls().dist_abs(src, tar)
+                if val <= max_distance:
+                    as_parent = calc == val
+                else:
+                    as_parent = calc > max_distance
+                if as_parent:
+                    changed += 1
+                    continue
+                mismatches += 1
+                sys.stdout.write(
+                    '{} (k={}) mismatch for: {} & {}: {} != {}\n'.format(
+                        algo, max_distance, src, tar, calc, val
+                    )
+                )
+
+            report(
+                '{} k={}'.format(algo, max_distance),
+                '{:0.0f} pairs/s'.format(len(pairs) / dur),
+            )
+            if changed:
+                report(
+                    '{} k={} changed in Abydos'.format(algo, max_distance),
+                    str(changed),
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""batch_alignment.py.
+
+This module contains batched versions of the Needleman-Wunsch, Smith-Waterman,
+and Gotoh alignment scores. Rather than filling one dynamic programming matrix
+cell by cell per pair, pairs are grouped by the lengths of their strings and
+each group's matrices are filled together, one anti-diagonal at a time, with
+NumPy operations across the whole group. As in the parent classes, whose
+matrices hold 32-bit floats, each cell is computed in double precision and
+rounded to single precision as it is stored, so the scores match exactly.
+
+Run as a script, it checks every pair's score and normalized similarity
+against the stored corpora, counting values that differ because the
+installed per-pair class differs from the corpora as changed in Abydos, and
+compares throughput with the per-pair classes. An optional argument sets the
+stride through the corpus pairs for the per-pair baseline (default 10).
+"""
+
+import sys
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from time import time
+
+from abydos.distance import Gotoh, NeedlemanWunsch, SmithWaterman
+
+import numpy as np
+
+from _common import load_dist_corpus, load_names, report, to_float32
+
+
+def _round32(values):
+    """Return values rounded to 32-bit floats.
+
+    Parameters
+    ----------
+    values : numpy.ndarray or float
+        The values to round
+
+    Returns
+    -------
+    numpy.ndarray
+        The values, as the parents' 32-bit float matrices store them
+
+    """
+    return np.asarray(values).astype(np.float32)
+
+
+class _BatchAlignment(ABC):
+    """Batched alignment scoring.
+
+    Subclasses supply _fill, which scores a group of equal-shape pairs from
+    their character similarity tensor.
+    """
+
+    _max_group = 4096
+
+    @abstractmethod
+    def _fill(self, sims, src_len, tar_len):
+        """Return the alignment scores of a group of pairs.
+
+        Parameters
+        ----------
+        sims : numpy.ndarray
+            A (group size, src_len, tar_len) array of character similarities
+        src_len : int
+            The length of each source string
+        tar_len : int
+            The length of each target string
+
+        Returns
+        -------
+        numpy.ndarray
+            The scores of the pairs in the group
+
+        """
+
+    def sim_score_many(self, pairs):
+        """Return the alignment scores of many pairs of strings.
+
+        Parameters
+        ----------
+        pairs : iterable
+            (src, tar) pairs of strings
+
+        Returns
+        -------
+        numpy.ndarray
+            The score of each pair, in order
+
+        """
+        pairs = list(pairs)
+        scores = np.empty(len(pairs))
+
+        alphabet = {}
+        for src, tar in pairs:
+            for char in src + tar:
+                if char not in alphabet:
+                    alphabet[char] = len(alphabet)
+        chars = list(alphabet)
+        sim_mat = np.array(
+            [[self._sim_func(ch1, ch2) for ch2 in chars] for ch1 in chars],
+            dtype=np.float64,
+        ).reshape(len(chars), len(chars))
+
+        groups = defaultdict(list)
+        for pos, (src, tar) in enumerate(pairs):
+            groups[len(src), len(tar)].append(pos)
+
+        for (src_len, tar_len), positions in groups.items():
+            for start in range(0, len(positions), self._max_group):
+                group = positions[start : start + self._max_group]
+                src_codes = np.array(
+                    [
+                        [alphabet[char] for char in pairs[pos][0]]
+                        for pos in group
+                    ],
+                    dtype=np.intp,
+                ).reshape(len(group), src_len)
+                tar_codes = np.array(
+                    [
+                        [alphabet[char] for char in pairs[pos][1]]
+                        for pos in group
+                    ],
+                    dtype=np.intp,
+                ).reshape(len(group), tar_len)
+                sims = sim_mat[src_codes[:, :, None], tar_codes[:, None, :]]
+                scores[group] = self._fill(sims, src_len, tar_len)
+
+        return scores
+
+    def sim_many(self, pairs):
+        """Return the normalized alignment scores of many pairs of strings.
+
+        Parameters
+        ----------
+        pairs : iterable
+            (src, tar) pairs of strings
+
+        Returns
+        -------
+        numpy.ndarray
+            The normalized score of each pair, in order; as in the parent's
+            sim, a pair of distinct strings one of which scores 0 against
+            itself, e.g. the empty string, is nan (or inf)
+
+        """
+        pairs = list(pairs)
+        strings = list({string for pair in pairs for string in pair})
+        self_scores = dict(
+            zip(
+                strings,
+                self.sim_score_many(
+                    (string, string) for string in strings
+                ).tolist(),
+            )
+        )
+        norms = np.array(
+            [
+                self_scores[src] ** 0.5 * self_scores[tar] ** 0.5
+                for src, tar in pairs
+            ]
+        )
+
+        # the parent divides NumPy scalars, so a zero norm gives nan or inf
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sims = np.maximum(self.sim_score_many(pairs), 0.0) / norms
+        sims[[src == tar for src, tar in pairs]] = 1.0
+        return sims
+
+    @staticmethod
+    def _diagonals(src_len, tar_len):
+        """Yield the cell indices of each anti-diagonal of a matrix.
+
+        Parameters
+        ----------
+        src_len : int
+            The length of each source string
+        tar_len : int
+            The length of each target string
+
+        Yields
+        ------
+        tuple
+            The row & column index arrays of the cells i+j=d for each d,
+            excluding the first row & column
+
+        """
+        for diag in range(2, src_len + tar_len + 1):
+            rows = np.arange(
+                max(1, diag - tar_len), min(src_len, diag - 1) + 1
+            )
+            yield rows, diag - rows
+
+
+class BatchNeedlemanWunsch(_BatchAlignment, NeedlemanWunsch):
+    """Needleman-Wunsch score, batched.
+
+    This accepts the same arguments as :py:class:`NeedlemanWunsch` and adds
+    :py:meth:`sim_score_many` and :py:meth:`sim_many`.
+    """
+
+    def _fill(self, sims, src_len, tar_len):
+        gap = self._gap_cost
+        d_mat = np.empty((sims.shape[0], src_len + 1, tar_len + 1))
+        d_mat[:, :, 0] = _round32(-(np.arange(src_len + 1) * gap))
+        d_mat[:, 0, :] = _round32(-(np.arange(tar_len + 1) * gap))
+
+        for i, j in self._diagonals(src_len, tar_len):
+            d_mat[:, i, j] = _round32(
+                np.maximum(
+                    np.maximum(
+                        d_mat[:, i - 1, j - 1] + sims[:, i - 1, j - 1],
+                        d_mat[:, i - 1, j] - gap,
+                    ),
+                    d_mat[:, i, j - 1] - gap,
+                )
+            )
+        return d_mat[:, src_len, tar_len]
+
+
+class BatchSmithWaterman(_BatchAlignment, SmithWaterman):
+    """Smith-Waterman score, batched.
+
+    This accepts the same arguments as :py:class:`SmithWaterman` and adds
+    :py:meth:`sim_score_many` and :py:meth:`sim_many`.
+    """
+
+    def _fill(self, sims, src_len, tar_len):
+        gap = self._gap_cost
+        d_mat = np.zeros((sims.shape[0], src_len + 1, tar_len + 1))
+
+        for i, j in self._diagonals(src_len, tar_len):
+            d_mat[:, i, j] = _round32(
+                np.maximum(
+                    np.maximum(
+                        d_mat[:, i - 1, j - 1] + sims[:, i - 1, j - 1],
+                        d_mat[:, i - 1, j] - gap,
+                    ),
+                    np.maximum(d_mat[:, i, j - 1] - gap, 0),
+                )
+            )
+        return d_mat[:, src_len, tar_len]
+
+
+class BatchGotoh(_BatchAlignment, Gotoh):
+    """Gotoh score, batched.
+
+    This accepts the same arguments as :py:class:`Gotoh` and adds
+    :py:meth:`sim_score_many` and :py:meth:`sim_many`.
+    """
+
+    def _fill(self, sims, src_len, tar_len):
+        gap_open = self._gap_open
+        gap_ext = self._gap_ext
+        shape = (sims.shape[0], src_len + 1, tar_len + 1)
+        d_mat = np.full(shape, float('-inf'))
+        p_mat = np.full(shape, float('-inf'))
+        q_mat = np.full(shape, float('-inf'))
+        d_mat[:, 0, 0] = 0
+        for i in range(1, src_len + 1):
+            p_mat[:, i, 0] = _round32(-gap_open - gap_ext * (i - 1))
+        for j in range(1, tar_len + 1):
+            q_mat[:, 0, j] = _round32(-gap_open - gap_ext * (j - 1))
+
+        for i, j in self._diagonals(src_len, tar_len):
+            sim_val = sims[:, i - 1, j - 1]
+            d_mat[:, i, j] = _round32(
+                np.maximum(
+                    np.maximum(
+                        d_mat[:, i - 1, j - 1] + sim_val,
+                        p_mat[:, i - 1, j - 1] + sim_val,
+                    ),
+                    q_mat[:, i - 1, j - 1] + sim_val,
+                )
+            )
+            p_mat[:, i, j] = _round32(
+                np.maximum(
+                    d_mat[:, i - 1, j] - gap_open,
+                    p_mat[:, i - 1, j] - gap_ext,
+                )
+            )
+            q_mat[:, i, j] = _round32(
+                np.maximum(
+                    d_mat[:, i, j - 1] - gap_open,
+                    q_mat[:, i, j - 1] - gap_ext,
+                )
+            )
+        return np.maximum(
+            np.maximum(d_mat[:, src_len, tar_len], p_mat[:, src_len, tar_len]),
+            q_mat[:, src_len, tar_len],
+        )
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    measures = {
+        'needlemanwunsch': (NeedlemanWunsch(), BatchNeedlemanWunsch()),
+        'smithwaterman': (SmithWaterman(), BatchSmithWaterman()),
+        'gotoh': (Gotoh(), BatchGotoh()),
+    }
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(len(names) - 1)]
+    sample = pairs[::step]
+
+    mismatches = 0
+    for algo, (cmp, batch_cmp) in measures.items():
+        for method in ('sim_score', 'sim'):
+            start = time()
+            for src, tar in sample:
+                getattr(cmp, method)(src, tar)
+            report(
+                '{}_{} per pair'.format(algo, method),
+                '{:0.0f} pairs/s'.format(len(sample) / (time() - start)),
+            )
+
+            start = time()
+            calcs = getattr(batch_cmp, method + '_many')(pairs)
+            report(
+                '{}_{} batched'.format(algo, method),
+                '{:0.0f} pairs/s'.format(len(pairs) / (time() - start)),
+            )
+
+            changed = 0
+            stored = load_dist_corpus('{}_{}'.format(algo, method))
+            for (src, tar), val, calc in zip(pairs, stored, calcs):
+                if to_float32(calc) == val:
+                    continue
+                if calc == getattr(cmp, method)(src, tar):
+                    changed += 1
+                    continue
+                mismatches += 1
+                sys.stdout.write(
+                    '{}_{} mismatch for: {} & {}: {} != {}\n'.format(
+                        algo, method, src, tar, calc, val
+                    )
+                )
+            if changed:
+                report(
+                    '{}_{} changed in Abydos'.format(algo, method),
+                    str(changed),
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""bk_tree.py.
+
+This module contains a BK-tree (Burkhard-Keller tree) index of strings under
+a metric distance measure. Each node's children are keyed by their distance
+to it, so by the triangle inequality a search for strings within distance r
+of a query at distance d from a node need only descend into the children
+keyed d-r through d+r. Any measure whose :py:meth:`dist_abs` is a metric,
+such as Levenshtein, Damerau-Levenshtein, Hamming, or Indel distance, can be
+indexed; radius and k-nearest neighbour queries return the same strings as a
+linear scan.
+
+Run as a script, it checks the Levenshtein measure used for the index
+against the stored `levenshtein_dist_abs` corpus, builds a tree over every
+name, and compares the results and latency of radius and k-nearest queries
+for misspelled names with a brute-force scan of all the names. Smaller trees
+are checked the same way for each of the metric measures. An optional
+argument sets the stride through the names for the query strings (default
+15000).
+"""
+
+import sys
+from heapq import heappop, heappush
+from time import time
+
+from abydos.distance import DamerauLevenshtein, Hamming, Indel, Levenshtein
+
+from _common import load_dist_corpus, load_names, report
+from banded_edit import BandedLevenshtein
+
+
+class BKTree(object):
+    """A BK-tree index of strings under a metric distance.
+
+    Nodes are (string, children) tuples, where children is a dict mapping
+    each child's distance from the node to the child.
+    """
+
+    def __init__(self, words=(), metric=None):
+        """Initialize BKTree instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to index
+        metric : _Distance
+            A string distance measure whose dist_abs is a metric, defaulting
+            to Levenshtein distance
+
+        """
+        if metric is None:
+            metric = Levenshtein()
+        self._dist = metric.dist_abs
+        self._root = None
+        self._size = 0
+        self.comparisons = 0
+        self.update(words)
+
+    def __len__(self):
+        """Return the number of strings in the tree.
+
+        Returns
+        -------
+        int
+            The number of distinct strings indexed
+
+        """
+        return self._size
+
+    def add(self, word):
+        """Add a string to the tree.
+
+        Parameters
+        ----------
+        word : str
+            The string to index
+
+        Returns
+        -------
+        bool
+            True if the string was added, False if it was already present
+
+        """
+        if self._root is None:
+            self._root = (word, {})
+            self._size = 1
+            return True
+
+        dist = self._dist
+        node_word, children = self._root
+        while True:
+            if word == node_word:
+                return False
+            key = dist(word, node_word)
+            child = children.get(key)
+            if child is None:
+                children[key] = (word, {})
+                self._size += 1
+                return True
+            node_word, children = child
+
+    def update(self, words):
+        """Add strings to the tree.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to index
+
+        """
+        for word in words:
+            self.add(word)
+
+    def query(self, word, radius):
+        """Return the indexed strings within a distance of a string.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        radius : int or float
+            The maximum distance
+
+        Returns
+        -------
+        list
+            (distance, string) tuples, in ascending order
+
+        """
+        if self._root is None:
+            return []
+
+        dist = self._dist
+        found = []
+        stack = [self._root]
+        visited = 0
+        while stack:
+            node_word, children = stack.pop()
+            node_dist = dist(word, node_word)
+            visited += 1
+            if node_dist <= radius:
+                found.append((node_dist, node_word))
+            low = node_dist - radius
+            high = node_dist + radius
+            for key, child in children.items():
+                if low <= key <= high:
+                    stack.append(child)
+
+        self.comparisons += visited
+        found.sort()
+        return found
+
+    def nearest(self, word, k=1):
+        """Return the k indexed strings nearest a string.
+
+        Subtrees are searched in order of the lower bound the triangle
+        inequality places on their distances, and are skipped once that
+        bound exceeds the distance of the kth nearest string found.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        k : int
+            The number of strings to return
+
+        Returns
+        -------
+        list
+            (distance, string) tuples, in ascending order; ties are broken by
+            the strings' order
+
+        """
+        if self._root is None or k < 1:
+            return []
+
+        dist = self._dist
+        radius = float('inf')
+        # the negated distances of the k nearest strings so far
+        nearest = []
+        found = []
+        # (lower bound, entry number, node) entries
+        queue = [(0, 0, self._root)]
+        entries = 1
+        visited = 0
+        while queue:
+            bound, _, (node_word, children) = heappop(queue)
+            if bound > radius:
+                break
+            node_dist = dist(word, node_word)
+            visited += 1
+            if node_dist <= radius:
+                found.append((node_dist, node_word))
+                heappush(nearest, -node_dist)
+                if len(nearest) > k:
+                    heappop(nearest)
+                if len(nearest) == k:
+                    radius = -nearest[0]
+            for key, child in children.items():
+                bound = abs(key - node_dist)
+                if bound <= radius:
+                    heappush(queue, (bound, entries, child))
+                    entries += 1
+
+        self.comparisons += visited
+        found.sort()
+        return [entry for entry in found if entry[0] <= radius][:k]
+
+
+def _brute_force(dists, names, radii, counts):
+    """Return the results of radius & k-nearest queries from a full scan.
+
+    Parameters
+    ----------
+    dists : list
+        The query string's distance to each name
+    names : list
+        The names
+    radii : tuple
+        The query radii
+    counts : tuple
+        The numbers of nearest names
+
+    Returns
+    -------
+    dict
+        The results, keyed by ('radius', r) or ('nearest', k)
+
+    """
+    scanned = sorted(zip(dists, names))
+    results = {}
+    for radius in radii:
+        results['radius', radius] = [
+            entry for entry in scanned if entry[0] <= radius
+        ]
+    for count in counts:
+        results['nearest', count] = scanned[:count]
+    return results
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 15000
+
+    radii = (1, 2, 3)
+    counts = (1, 5, 10)
+
+    names = load_names()
+    mismatches = 0
+
+    # Without a cutoff BandedLevenshtein is Levenshtein; a cutoff of the
+    # longest name's length leaves it exact but computes it in pure Python.
+    metric = BandedLevenshtein(max_distance=max(len(name) for name in names))
+    start = time()
+    for src, tar, val in zip(
+        names, names[1:], load_dist_corpus('levenshtein_dist_abs')
+    ):
+        calc = metric.dist_abs(src, tar)
+        if calc != val:
+            mismatches += 1
+            sys.stdout.write(
+                'levenshtein_dist_abs mismatch for: '
+                '{} & {}: {} != {}\n'.format(src, tar, calc, val)
+            )
+    report('checked levenshtein_dist_abs', '{:0.1f} s'.format(time() - start))
+
+    for label, metric, indexed in (
+        ('Levenshtein', metric, names),
+        ('Levenshtein 1/50', Levenshtein(), names[::50]),
+        ('Damerau 1/50', DamerauLevenshtein(), names[::50]),
+        ('Hamming 1/50', Hamming(), names[::50]),
+        ('Indel 1/50', Indel(), names[::50]),
+    ):
+        start = time()
+        tree = BKTree(indexed, metric)
+        report(
+            '{} tree of {}'.format(label, len(tree)),
+            '{:0.3f} s'.format(time() - start),
+        )
+
+        # each query is a name with its middle letter deleted
+        queries = [
+            name[: len(name) // 2] + name[len(name) // 2 + 1 :]
+            for name in names[step // 2 :: step]
+        ]
+        scan_time = 0.0
+        tree_times = dict.fromkeys(
+            [('radius', radius) for radius in radii]
+            + [('nearest', count) for count in counts],
+            0.0,
+        )
+        tree_comparisons = dict.fromkeys(tree_times, 0)
+        for query in queries:
+            start = time()
+            dists = [metric.dist_abs(query, name) for name in indexed]
+            expected = _brute_force(dists, indexed, radii, counts)
+            scan_time += time() - start
+
+            for key in tree_times:
+                tree.comparisons = 0
+                start = time()
+                if key[0] == 'radius':
+                    result = tree.query(query, key[1])
+                else:
+                    result = tree.nearest(query, key[1])
+                tree_times[key] += time() - start
+                tree_comparisons[key] += tree.comparisons
+
+                if result != expected[key]:
+                    mismatches += 1
+                    sys.stdout.write(
+                        '{} {} {} mismatch for: {}: {} != {}\n'.format(
+                            label, *key, query, result, expected[key]
+                        )
+                    )
+
+        report(
+            '{} scan'.format(label),
+            '{:0.1f} ms/query'.format(scan_time / len(queries) * 1000),
+        )
+        for (kind, arg), tree_time in tree_times.items():
+            report(
+                '{} {} {}'.format(label, kind, arg),
+                '{:0.1f} ms/query ({:0.1f}x, {:0.1%})'.format(
+                    tree_time / len(queries) * 1000,
+                    scan_time / tree_time,
+                    tree_comparisons[kind, arg] / len(queries) / len(tree),
+                ),
+            )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""blocking_index.py.
+
+This module contains a blocking index, which groups strings into blocks by
+the keys given them by phonetic algorithms or fingerprints so that only the
+strings sharing a block need be compared. With several encoders, such as
+Soundex and Metaphone, two strings are candidates if they share the key of
+any of them. The index reports the distribution of its block sizes and the
+number of candidate pairs, and their ratio to all pairs, exactly: with
+several encoders, the pairs sharing some key are counted by
+inclusion-exclusion over the pairs sharing the keys of each set of encoders.
+An index can be saved to and loaded from a pickle file.
+
+Run as a script, it blocks every name by Soundex, Metaphone, and both,
+checking the codes against the stored corpora and the pair counts against
+the pairs generated, then ranks every algorithm in
+`reg_test_phonetic.algorithms` by its blocking of the names. The keys for
+the ranking are not computed by running the encoders: they are read from the
+algorithms' stored `<algorithm>.csv` corpora, which hold each name's code and
+are what `reg_test_phonetic` checks the encoders against. Encoding every
+name would take hours for the Beider-Morse and Phonet variants alone, which
+code about 100-400 names per second. Blocks are rated by their reduction
+ratio (the fraction of all pairs of names they exclude) and their pairs
+completeness, the fraction of the consecutive names in the sorted
+`regtest_names.csv` that are within a Levenshtein distance of 2 of each
+other (according to the stored `levenshtein_dist_abs` corpus) that share a
+block. Encoders are ranked by the harmonic mean of the two. An optional
+argument sets the stride through the names for the check of generated pairs
+(default 20).
+"""
+
+import os
+import pickle  # noqa: S403
+import sys
+import tempfile
+from collections import Counter
+from itertools import combinations
+from time import time
+
+from abydos.phonetic import Metaphone, Soundex
+
+from _common import (
+    CORPORA,
+    load_csv_corpus,
+    load_dist_corpus,
+    load_names,
+    load_reg_test,
+    report,
+)
+from fingerprint_batch import fingerprint_many
+from phonetic_batch import encode_many
+
+
+def encode_keys(encoder, words):
+    """Return the keys an encoder gives some strings.
+
+    Parameters
+    ----------
+    encoder : _Phonetic, _Fingerprint, or function
+        A phonetic algorithm or fingerprint instance, or a function
+        returning a string's key
+    words : list
+        The strings to encode
+
+    Returns
+    -------
+    list
+        The key of each string
+
+    """
+    if hasattr(encoder, 'encode'):
+        return list(encode_many(encoder, words))
+    if hasattr(encoder, 'fingerprint'):
+        return list(fingerprint_many(encoder, words))
+    return [encoder(word) for word in words]
+
+
+def _pair_count(sizes):
+    """Return the number of pairs within blocks.
+
+    Parameters
+    ----------
+    sizes : iterable
+        The block sizes
+
+    Returns
+    -------
+    int
+        The number of pairs of strings sharing a block
+
+    """
+    return sum(size * (size - 1) // 2 for size in sizes)
+
+
+class BlockingIndex(object):
+    """A blocking index of strings by phonetic or fingerprint keys.
+
+    Strings are numbered in the order they were indexed. For each encoder,
+    the index keeps each string's key and the numbers of the strings with
+    each key.
+    """
+
+    def __init__(self, words=(), *encoders):
+        """Initialize BlockingIndex instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to index
+        *encoders : _Phonetic, _Fingerprint, or function
+            Phonetic algorithm or fingerprint instances, or functions
+            returning a string's key; strings sharing the key of any encoder
+            share a block
+
+        """
+        self._words = list(dict.fromkeys(words))
+        self._encoders = encoders
+        self._build(
+            [encode_keys(encoder, self._words) for encoder in encoders]
+        )
+
+    @classmethod
+    def from_codes(cls, words, *codes):
+        """Return an index of strings whose keys have been computed already.
+
+        Parameters
+        ----------
+        words : list
+            The distinct strings to index
+        *codes : list
+            For each encoder, the key of each string
+
+        Returns
+        -------
+        BlockingIndex
+            The index, which can not look up new strings
+
+        """
+        index = cls()
+        index._words = list(words)
+        index._build(codes)
+        return index
+
+    @classmethod
+    def load(cls, path):
+        """Return an index saved to a pickle file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the pickle file
+
+        Returns
+        -------
+        BlockingIndex
+            The index, which can not look up new strings
+
+        """
+        with open(path, 'rb') as index_file:
+            words, codes = pickle.load(index_file)  # noqa: S301
+        return cls.from_codes(words, *codes)
+
+    def save(self, path):
+        """Save the index's strings and keys to a pickle file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the pickle file
+
+        """
+        with open(path, 'wb') as index_file:
+            pickle.dump(
+                (self._words, self._codes),
+                index_file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    def _build(self, codes):
+        """Build the blocks from the strings' keys.
+
+        Parameters
+        ----------
+        codes : list
+            For each encoder, the key of each string
+
+        """
+        self._codes = [list(keys) for keys in codes]
+        self._blocks = []
+        for keys in self._codes:
+            blocks = {}
+            for num, key in enumerate(keys):
+                blocks.setdefault(key, []).append(num)
+            self._blocks.append(blocks)
+
+    def __len__(self):
+        """Return the number of strings in the index.
+
+        Returns
+        -------
+        int
+            The number of distinct strings indexed
+
+        """
+        return len(self._words)
+
+    def candidates(self, word):
+        """Return the indexed strings sharing a block with a string.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+
+        Returns
+        -------
+        list
+            The candidate strings, in index order
+
+        Raises
+        ------
+        ValueError
+            The index was built from stored keys
+
+        """
+        if len(self._encoders) != len(self._blocks):
+            raise ValueError('An index of stored keys can not encode strings')
+        found = set()
+        for encoder, blocks in zip(self._encoders, self._blocks):
+            found.update(blocks.get(encode_keys(encoder, [word])[0], ()))
+        return [self._words[num] for num in sorted(found)]
+
+    def pairs(self):
+        """Yield the pairs of strings sharing a block.
+
+        Each pair is yielded once, for the first encoder whose key they
+        share.
+
+        Yields
+        ------
+        tuple
+            A pair of strings, in index order
+
+        """
+        words = self._words
+        for encoder, blocks in enumerate(self._blocks):
+            earlier = self._codes[:encoder]
+            for block in blocks.values():
+                for src, tar in combinations(block, 2):
+                    if not any(keys[src] == keys[tar] for keys in earlier):
+                        yield words[src], words[tar]
+
+    def block_sizes(self):
+        """Return the sizes of the blocks.
+
+        Returns
+        -------
+        list
+            The number of strings with each key of each encoder
+
+        """
+        return [
+            len(block) for blocks in self._blocks for block in blocks.values()
+        ]
+
+    def pair_count(self):
+        """Return the number of pairs of strings sharing a block.
+
+        Returns
+        -------
+        int
+            The number of pairs sharing the key of any encoder
+
+        """
+        count = 0
+        for size in range(1, len(self._codes) + 1):
+            for encoders in combinations(self._codes, size):
+                shared = _pair_count(Counter(zip(*encoders)).values())
+                count += shared if size % 2 else -shared
+        return count
+
+    def stats(self):
+        """Return statistics of the blocks.
+
+        Returns
+        -------
+        dict
+            The number of blocks, the number of singleton blocks, the
+            largest, mean, median, and 99th percentile block sizes, the
+            number of candidate pairs, and the reduction ratio: the fraction
+            of all pairs of strings that are not candidates
+
+        """
+        sizes = sorted(self.block_sizes())
+        all_pairs = _pair_count([len(self._words)])
+        pairs = self.pair_count()
+        return {
+            'blocks': len(sizes),
+            'singletons': sizes.count(1),
+            'largest': sizes[-1] if sizes else 0,
+            'mean': sum(sizes) / len(sizes) if sizes else 0.0,
+            'median': sizes[len(sizes) // 2] if sizes else 0,
+            'p99': sizes[len(sizes) * 99 // 100] if sizes else 0,
+            'pairs': pairs,
+            'reduction_ratio': 1 - pairs / all_pairs if all_pairs else 0.0,
+        }
+
+    def size_histogram(self):
+        """Return the distribution of block sizes.
+
+        Returns
+        -------
+        dict
+            The number of blocks of sizes 1, 2-3, 4-7, ..., keyed by the
+            least size of each range
+
+        """
+        histogram = Counter(
+            1 << (size.bit_length() - 1) for size in self.block_sizes()
+        )
+        return dict(sorted(histogram.items()))
+
+    def completeness(self, pairs):
+        """Return the fraction of some pairs of strings sharing a block.
+
+        Parameters
+        ----------
+        pairs : list
+            Pairs of indexed strings' numbers
+
+        Returns
+        -------
+        float
+            The pairs completeness
+
+        """
+        if not pairs:
+            return 1.0
+        found = sum(
+            any(keys[src] == keys[tar] for keys in self._codes)
+            for src, tar in pairs
+        )
+        return found / len(pairs)
+
+
+def _report_stats(label, index):
+    """Report an index's block statistics.
+
+    Parameters
+    ----------
+    label : str
+        The label of the index
+    index : BlockingIndex
+        The index
+
+    """
+    stats = index.stats()
+    report(
+        label + ' blocks',
+        '{} ({} singletons)'.format(stats['blocks'], stats['singletons']),
+    )
+    report(
+        label + ' block sizes',
+        '{:0.1f} mean, {} median, {} p99, {} max'.format(
+            stats['mean'], stats['median'], stats['p99'], stats['largest']
+        ),
+    )
+    report(
+        label + ' size histogram',
+        ' '.join(
+            '{}:{}'.format(size, count)
+            for size, count in index.size_histogram().items()
+        ),
+    )
+    report(
+        label + ' pairs',
+        '{} ({:0.4%} reduction)'.format(
+            stats['pairs'], stats['reduction_ratio']
+        ),
+    )
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    names = load_names()
+    mismatches = 0
+
+    # consecutive names within a Levenshtein distance of 2
+    near_pairs = [
+        (num, num + 1)
+        for num, val in enumerate(load_dist_corpus('levenshtein_dist_abs'))
+        if val <= 2
+    ]
+    report('near pairs', str(len(near_pairs)))
+
+    soundex = Soundex()
+    metaphone = Metaphone()
+    for label, encoders, algos in (
+        ('soundex', (soundex,), ('soundex',)),
+        ('metaphone', (metaphone,), ('metaphone',)),
+        (
+            'soundex+metaphone',
+            (soundex, metaphone),
+            ('soundex', 'metaphone'),
+        ),
+    ):
+        start = time()
+        index = BlockingIndex(names, *encoders)
+        report(label + ' index', '{:0.3f} s'.format(time() - start))
+
+        for algo, keys in zip(algos, index._codes):  # noqa: SF01
+            changed = sum(
+                key != val for key, val in zip(keys, load_csv_corpus(algo))
+            )
+            if changed:
+                report(algo + ' changed in Abydos', str(changed))
+
+        _report_stats(label, index)
+        report(
+            label + ' completeness',
+            '{:0.4f}'.format(index.completeness(near_pairs)),
+        )
+
+        # every pair is generated once, and the pair count agrees
+        subset = BlockingIndex.from_codes(
+            names[::step], *(keys[::step] for keys in index._codes)
+        )
+        pairs = list(subset.pairs())
+        expected = {
+            (src, tar)
+            for src, tar in combinations(range(len(subset)), 2)
+            if any(keys[src] == keys[tar] for keys in subset._codes)
+        }
+        if len(pairs) != len(expected) or len(set(pairs)) != len(expected):
+            mismatches += 1
+            sys.stdout.write(
+                '{} generated {} pairs != {}\n'.format(
+                    label, len(pairs), len(expected)
+                )
+            )
+        if subset.pair_count() != len(expected):
+            mismatches += 1
+            sys.stdout.write(
+                '{} counted {} pairs != {}\n'.format(
+                    label, subset.pair_count(), len(expected)
+                )
+            )
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, 'index.pkl')
+            index.save(path)
+            loaded = BlockingIndex.load(path)
+        if loaded.stats() != index.stats():
+            mismatches += 1
+            sys.stdout.write('{} loaded index differs\n'.format(label))
+
+        query = names[len(names) // 2]
+        report(
+            '{} candidates for {}'.format(label, query),
+            str(len(index.candidates(query))),
+        )
+
+    ranking = []
+    for algo in load_reg_test('reg_test_phonetic').algorithms:
+        if not os.path.isfile(os.path.join(CORPORA, algo + '.csv')):
+            report(algo, 'no corpus')
+            continue
+        index = BlockingIndex.from_codes(names, load_csv_corpus(algo))
+        stats = index.stats()
+        completeness = index.completeness(near_pairs)
+        reduction = stats['reduction_ratio']
+        ranking.append(
+            (
+                2 * reduction * completeness / (reduction + completeness)
+                if reduction + completeness
+                else 0.0,
+                reduction,
+                completeness,
+                stats['blocks'],
+                stats['largest'],
+                algo,
+            )
+        )
+
+    ranking.sort(reverse=True)
+    report('algorithm', 'F RR PC blocks max')
+    for f_score, reduction, completeness, blocks, largest, algo in ranking:
+        report(
+            algo,
+            '{:0.4f} {:0.4f} {:0.4f} {} {}'.format(
+                f_score, reduction, completeness, blocks, largest
+            ),
+        )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
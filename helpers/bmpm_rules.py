@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""bmpm_rules.py.
+
+This module contains a Beider-Morse Phonetic Matching encoder that compiles
+its rule sets before use. For each name mode & match mode, the language
+detection rules become precompiled regular expressions and the phonetic &
+final rule sets for each language become lookup tables keyed by the leading
+character of each rule's pattern, so that only the rules that can match at a
+position are tried. The tables are built once per process, or loaded from a
+pickled cache file.
+
+Run as a script, it checks the compiled encoder against
+:py:class:`BeiderMorse` and reports names per second. Where a stored
+`bmpm_*.csv` corpus exists, it also reports how many of its codes the
+installed :py:class:`BeiderMorse` no longer gives, as changed in Abydos. An
+optional argument sets the stride through the names (default 50).
+"""
+
+import os
+import pickle  # noqa: S403
+import sys
+from re import compile as re_compile
+from time import time
+from unicodedata import normalize
+
+from abydos.phonetic import BeiderMorse
+from abydos.phonetic._beider_morse import (
+    BMDATA,
+    L_ANY,
+    L_NONE,
+    _LANG_DICT,
+    _LCONTEXT_POS,
+    _PATTERN_POS,
+    _PHONETIC_POS,
+    _RCONTEXT_POS,
+)
+
+from _common import load_csv_corpus, load_names, report
+
+# compiled tables, keyed by (name_mode, match_mode)
+_TABLES = {}
+
+
+def _index_rules(rules):
+    """Return a rule set as a lookup table keyed by leading character.
+
+    Parameters
+    ----------
+    rules : tuple
+        A Beider-Morse rule set of (pattern, left context, right context,
+        phonetic) rules
+
+    Returns
+    -------
+    dict
+        A dict mapping each leading character to a tuple of the rules whose
+        patterns begin with it, in their original order. Each rule is a tuple
+        of its pattern, its pattern length, searches for its left & right
+        contexts (or None), and its phonetic value. Rules with empty patterns
+        are in every entry, under the key ''.
+
+    """
+    numbered = {}
+    for num, rule in enumerate(rules):
+        lcontext = rule[_LCONTEXT_POS]
+        rcontext = rule[_RCONTEXT_POS]
+        pattern = rule[_PATTERN_POS]
+        entry = (
+            pattern,
+            len(pattern),
+            re_compile(lcontext + '$').search if lcontext else None,
+            re_compile('^' + rcontext).search if rcontext else None,
+            rule[_PHONETIC_POS],
+        )
+        numbered.setdefault(pattern[:1], []).append((num, entry))
+
+    anywhere = numbered.get('', [])
+    index = {}
+    for char, entries in numbered.items():
+        index[char] = tuple(entry for _, entry in sorted(entries + anywhere))
+    if anywhere:
+        index[''] = tuple(entry for _, entry in anywhere)
+    return index
+
+
+def _compile_tables(name_mode, match_mode):
+    """Return the compiled rule tables of a name mode & match mode.
+
+    Parameters
+    ----------
+    name_mode : str
+        The name mode of the algorithm: ``gen``, ``ash``, or ``sep``
+    match_mode : str
+        Matching mode: ``approx`` or ``exact``
+
+    Returns
+    -------
+    dict
+        The compiled language rules, phonetic rules for each language, common
+        final rules, and final rules for each language
+
+    """
+    data = BMDATA[name_mode]
+    return {
+        'language_rules': tuple(
+            (re_compile(letters).search, languages, accept)
+            for letters, languages, accept in data['language_rules']
+        ),
+        'rules': {
+            lang: _index_rules(rules) for lang, rules in data['rules'].items()
+        },
+        'common': _index_rules(data[match_mode]['common']),
+        'final': {
+            lang: _index_rules(rules)
+            for lang, rules in data[match_mode].items()
+            if lang != 'common'
+        },
+    }
+
+
+def _load_tables(name_mode, match_mode, cache_file=None):
+    """Return the compiled rule tables, building them if necessary.
+
+    Parameters
+    ----------
+    name_mode : str
+        The name mode of the algorithm: ``gen``, ``ash``, or ``sep``
+    match_mode : str
+        Matching mode: ``approx`` or ``exact``
+    cache_file : str
+        A pickle file holding the tables of every name mode & match mode
+        compiled so far; it is read if it exists and (re)written if it lacks
+        the tables requested
+
+    Returns
+    -------
+    dict
+        The compiled rule tables
+
+    """
+    key = (name_mode, match_mode)
+    if key in _TABLES:
+        return _TABLES[key]
+
+    if cache_file and os.path.isfile(cache_file):
+        with open(cache_file, 'rb') as cache:
+            _TABLES.update(pickle.load(cache))  # noqa: S301
+        if key in _TABLES:
+            return _TABLES[key]
+
+    _TABLES[key] = _compile_tables(name_mode, match_mode)
+    if cache_file:
+        with open(cache_file, 'wb') as cache:
+            pickle.dump(_TABLES, cache, protocol=pickle.HIGHEST_PROTOCOL)
+    return _TABLES[key]
+
+
+class CompiledBeiderMorse(BeiderMorse):
+    """Beider-Morse Phonetic Matching, with compiled rule tables.
+
+    This accepts the same arguments as :py:class:`BeiderMorse` and returns the
+    same encodings.
+    """
+
+    def __init__(
+        self,
+        language_arg=0,
+        name_mode='gen',
+        match_mode='approx',
+        concat=False,
+        filter_langs=False,
+        cache_file=None,
+    ):
+        """Initialize CompiledBeiderMorse instance.
+
+        Parameters
+        ----------
+        language_arg : str or int
+            The language of the term, as for :py:class:`BeiderMorse`
+        name_mode : str
+            The name mode of the algorithm:
+                - ``gen`` -- general (default)
+                - ``ash`` -- Ashkenazi
+                - ``sep`` -- Sephardic
+        match_mode : str
+            Matching mode: ``approx`` or ``exact``
+        concat : bool
+            Concatenation mode
+        filter_langs : bool
+            Filter out incompatible languages
+        cache_file : str
+            A pickle file from which to load (or to which to save) the
+            compiled rule tables
+
+        """
+        super(CompiledBeiderMorse, self).__init__(
+            language_arg, name_mode, match_mode, concat, filter_langs
+        )
+        self._tables = _load_tables(
+            self._name_mode, self._match_mode, cache_file
+        )
+
+    def _language(self, name, name_mode):
+        """Return the best guess language ID for the word and language choices.
+
+        Parameters
+        ----------
+        name : str
+            The term to guess the language of
+        name_mode : str
+            The name mode of the algorithm: ``gen`` (default),
+            ``ash`` (Ashkenazi), or ``sep`` (Sephardic)
+
+        Returns
+        -------
+        int
+            Language ID
+
+        """
+        name = name.strip().lower()
+        all_langs = (
+            sum(_LANG_DICT[_] for _ in BMDATA[name_mode]['languages']) - 1
+        )
+        choices_remaining = all_langs
+        for search, languages, accept in self._tables['language_rules']:
+            if search(name) is not None:
+                if accept:
+                    choices_remaining &= languages
+                else:
+                    choices_remaining &= (~languages) % (all_langs + 1)
+        if choices_remaining == L_NONE:
+            choices_remaining = L_ANY
+        return choices_remaining
+
+    def _phonetic(
+        self,
+        term,
+        name_mode,
+        rules,
+        final_rules1,
+        final_rules2,
+        language_arg=0,
+        concat=False,
+    ):
+        """Return the Beider-Morse encoding(s) of a term.
+
+        Parameters
+        ----------
+        term : str
+            The term to encode via Beider-Morse
+        name_mode : str
+            The name mode of the algorithm: ``gen`` (default),
+            ``ash`` (Ashkenazi), or ``sep`` (Sephardic)
+        rules : dict
+            The indexed set of initial phonetic transform regexps
+        final_rules1 : dict
+            The indexed common set of final phonetic transform regexps
+        final_rules2 : dict
+            The indexed specific set of final phonetic transform regexps
+        language_arg : int
+            The language of the term
+        concat : bool
+            A flag to indicate concatenation
+
+        Returns
+        -------
+        str
+            A Beider-Morse phonetic code
+
+        """
+        term = term.replace('-', ' ').strip()
+
+        if name_mode == 'gen':  # generic case
+            # discard and concatenate certain words if at the start of the name
+            for pfx in BMDATA['gen']['discards']:
+                if term.startswith(pfx):
+                    remainder = term[len(pfx) :]
+                    combined = pfx[:-1] + remainder
+                    return (
+                        self._redo_language(
+                            remainder,
+                            name_mode,
+                            rules,
+                            final_rules1,
+                            final_rules2,
+                            concat,
+                        )
+                        + '-'
+                        + self._redo_language(
+                            combined,
+                            name_mode,
+                            rules,
+                            final_rules1,
+                            final_rules2,
+                            concat,
+                        )
+                    )
+
+        words = term.split()
+        words2 = []
+
+        if name_mode == 'sep':  # Sephardic case
+            for word in words:
+                word = word[word.rfind("'") + 1 :]
+                if word not in BMDATA['sep']['discards']:
+                    words2.append(word)
+        elif name_mode == 'ash':  # Ashkenazic case
+            if len(words) > 1 and words[0] in BMDATA['ash']['discards']:
+                words2 = words[1:]
+            else:
+                words2 = list(words)
+        else:
+            words2 = list(words)
+
+        if concat:
+            term = ' '.join(words2)
+        elif len(words2) == 1:  # not a multi-word name
+            term = words2[0]
+        else:
+            return '-'.join(
+                [
+                    self._redo_language(
+                        w, name_mode, rules, final_rules1, final_rules2, concat
+                    )
+                    for w in words2
+                ]
+            )
+
+        # apply language rules to map to phonetic alphabet
+        phonetic = ''
+        anywhere = rules.get('', ())
+        i = 0
+        while i < len(term):
+            pattern_length = 1
+            for pattern, length, left, right, target in rules.get(
+                term[i], anywhere
+            ):
+                if not term.startswith(pattern, i):
+                    continue
+                if right is not None and not right(term[i + length :]):
+                    continue
+                if left is not None and not left(term, 0, i):
+                    continue
+                candidate = self._apply_rule_if_compat(
+                    phonetic, target, language_arg
+                )
+                if candidate is not None:  # pragma: no branch
+                    phonetic = candidate
+                    pattern_length = length
+                    break
+            i += pattern_length
+
+        phonetic = self._apply_final_rules(
+            phonetic, final_rules1, language_arg, False
+        )
+        phonetic = self._apply_final_rules(
+            phonetic, final_rules2, language_arg, True
+        )
+        return phonetic
+
+    def _apply_final_rules(self, phonetic, final_rules, language_arg, strip):
+        """Apply a set of final rules to the phonetic encoding.
+
+        Parameters
+        ----------
+        phonetic : str
+            The term to which to apply the final rules
+        final_rules : dict
+            The indexed set of final phonetic transform regexps
+        language_arg : int
+            An integer representing the target language of the phonetic
+            encoding
+        strip : bool
+            Flag to indicate whether to normalize the language attributes
+
+        Returns
+        -------
+        str
+            A Beider-Morse phonetic code
+
+        """
+        if not final_rules:
+            return phonetic
+
+        anywhere = final_rules.get('', ())
+        phonetic = self._expand_alternates(phonetic)
+        phonetic_array = phonetic.split('|')
+
+        for k in range(len(phonetic_array)):
+            phonetic = phonetic_array[k]
+            phonetic2 = ''
+            phoneticx = self._normalize_lang_attrs(phonetic, True)
+
+            i = 0
+            while i < len(phonetic):
+                if phonetic[i] == '[':  # skip over language attribute
+                    attrib_end = phonetic.index(']', i) + 1
+                    phonetic2 += phonetic[i:attrib_end]
+                    i = attrib_end
+                    continue
+
+                pattern_length = 0
+                for pattern, length, left, right, target in final_rules.get(
+                    phoneticx[i : i + 1], anywhere
+                ):
+                    if not phoneticx.startswith(pattern, i):
+                        continue
+                    if right is not None and not right(
+                        phoneticx[i + length :]
+                    ):
+                        continue
+                    if left is not None and not left(phoneticx, 0, i):
+                        continue
+                    candidate = self._apply_rule_if_compat(
+                        phonetic2, target, language_arg
+                    )
+                    if candidate is not None:  # pragma: no branch
+                        phonetic2 = candidate
+                        pattern_length = length
+                        break
+
+                if not pattern_length:
+                    phonetic2 += phonetic[i]
+                    pattern_length = 1
+                i += pattern_length
+
+            phonetic_array[k] = self._expand_alternates(phonetic2)
+
+        phonetic = '|'.join(phonetic_array)
+        if strip:
+            phonetic = self._normalize_lang_attrs(phonetic, True)
+
+        if '|' in phonetic:
+            phonetic = '(' + self._remove_dupes(phonetic) + ')'
+
+        return phonetic
+
+    def encode(self, word):
+        """Return the Beider-Morse Phonetic Matching encoding(s) of a term.
+
+        Parameters
+        ----------
+        word : str
+            The word to transform
+
+        Returns
+        -------
+        tuple
+            The Beider-Morse phonetic value(s)
+
+        """
+        word = normalize('NFC', word.strip().lower())
+
+        if self._lang_choices == 0:
+            language_arg = self._language(word, self._name_mode)
+        else:
+            language_arg = self._lang_choices
+        language_arg2 = self._language_index_from_code(
+            language_arg, self._name_mode
+        )
+
+        result = self._phonetic(
+            word,
+            self._name_mode,
+            self._tables['rules'][language_arg2],
+            self._tables['common'],
+            self._tables['final'][language_arg2],
+            language_arg,
+            self._concat,
+        )
+        return self._phonetic_numbers(result)
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    settings = {
+        'bmpm': {},
+        'bmpm_german': {'language_arg': 'german'},
+        'bmpm_french': {'language_arg': 'french'},
+        'bmpm_gen_exact': {'match_mode': 'exact'},
+        'bmpm_ash_approx': {'name_mode': 'ash'},
+        'bmpm_ash_exact': {'name_mode': 'ash', 'match_mode': 'exact'},
+        'bmpm_sep_approx': {'name_mode': 'sep'},
+        'bmpm_sep_exact': {'name_mode': 'sep', 'match_mode': 'exact'},
+    }
+
+    names = load_names()
+    sample = names[::step]
+
+    start = time()
+    for name_mode in ('gen', 'ash', 'sep'):
+        for match_mode in ('approx', 'exact'):
+            _compile_tables(name_mode, match_mode)
+    report('compile all tables', '{:0.3f} s'.format(time() - start))
+
+    mismatches = 0
+    for algo, kwargs in settings.items():
+        bmpm = BeiderMorse(**kwargs)
+        compiled_bmpm = CompiledBeiderMorse(**kwargs)
+
+        start = time()
+        codes = [bmpm.encode(name) for name in sample]
+        baseline = len(sample) / (time() - start)
+        report(algo, '{:0.1f} names/s'.format(baseline))
+
+        start = time()
+        compiled_codes = [compiled_bmpm.encode(name) for name in sample]
+        rate = len(sample) / (time() - start)
+        report(
+            algo + ' compiled',
+            '{:0.1f} names/s ({:0.1f}x)'.format(rate, rate / baseline),
+        )
+
+        for name, code, compiled_code in zip(sample, codes, compiled_codes):
+            if code != compiled_code:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} mismatch for: {}: {} != {}\n'.format(
+                        algo, name, compiled_code, code
+                    )
+                )
+
+        try:
+            stored = load_csv_corpus(algo)[::step]
+        except FileNotFoundError:
+            continue
+        # compiled codes differing from BeiderMorse are counted above, so
+        # only the stored codes BeiderMorse no longer gives remain
+        changed = sum(code != val for code, val in zip(codes, stored))
+        if changed:
+            report(algo + ' changed in Abydos', str(changed))
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
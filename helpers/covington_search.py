@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""covington_search.py.
+
+This module contains a faster Covington distance. Covington's cost for each
+step of an alignment depends only on the characters aligned and on whether
+the previous step skipped in the same string, so the minimum cost over all
+alignments can be found by dynamic programming over (source position, target
+position, previous step) rather than by enumerating every alignment. The same
+table of best completion costs bounds a branch-and-bound search that returns
+the top alignments without generating the rest.
+
+Run as a script, it checks every pair against the stored Covington corpora and
+compares throughput with :py:class:`Covington`. An optional argument sets the
+stride through the corpus pairs for the baseline (default 100).
+"""
+
+import sys
+from collections import namedtuple
+from heapq import heappush, heappushpop
+from time import time
+from unicodedata import combining
+from unicodedata import normalize as unicode_normalize
+
+from abydos.distance import Covington
+
+from _common import load_dist_corpus, load_names, report, to_float32
+
+Alignment = namedtuple('Alignment', ['src', 'tar', 'score'])
+
+_INF = float('inf')
+
+# The previous step of an alignment: both strings advanced, only the target
+# advanced (a skip in the source), or only the source advanced
+_MATCH, _SRC_SKIP, _TAR_SKIP = 0, 1, 2
+
+
+class FastCovington(Covington):
+    """Covington distance, by dynamic programming.
+
+    This accepts the same arguments as :py:class:`Covington` and returns the
+    same values. :py:meth:`dist_abs` and :py:meth:`dist` never build an
+    alignment; :py:meth:`alignment` and :py:meth:`alignments` with a `top_n`
+    prune every branch that cannot place among the top alignments found so
+    far. Strings containing combining characters are passed to
+    :py:class:`Covington`, which normalizes whole alignments.
+    """
+
+    def __init__(self, weights=(0, 5, 10, 30, 60, 100, 40, 50), **kwargs):
+        """Initialize FastCovington instance.
+
+        Parameters
+        ----------
+        weights : tuple
+            An 8-tuple of costs, as for :py:class:`Covington`
+        **kwargs
+            Arbitrary keyword arguments
+
+        """
+        super(FastCovington, self).__init__(weights=weights, **kwargs)
+        self._char_costs = {}
+        self._slack = (
+            0
+            if all(isinstance(weight, int) for weight in weights)
+            else 1e-9 * sum(abs(weight) for weight in weights)
+        )
+
+    def _char_cost(self, s, t):
+        """Return the cost of aligning character s with character t.
+
+        Parameters
+        ----------
+        s : str
+            A source character
+        t : str
+            A target character
+
+        Returns
+        -------
+        float
+            The cost of the alignment
+
+        """
+        if (s, t) in self._char_costs:
+            return self._char_costs[s, t]
+
+        s = unicode_normalize('NFC', s)
+        t = unicode_normalize('NFC', t)
+        if s == t:
+            if s in self._consonants or s in self._glides:
+                cost = self._weights[0]
+            else:
+                cost = self._weights[1]
+        elif ''.join(sorted([s, t])) in {'iy', 'uw'}:
+            cost = self._weights[2]
+        else:
+            sd = unicode_normalize('NFKD', s)
+            td = unicode_normalize('NFKD', t)
+            if sd[0] == td[0] and s in self._vowels:
+                cost = self._weights[2]
+            elif sd[0] in self._vowels and td[0] in self._vowels:
+                cost = self._weights[3]
+            elif sd[0] in self._consonants and td[0] in self._consonants:
+                cost = self._weights[4]
+            else:
+                cost = self._weights[5]
+
+        self._char_costs[s, t] = cost
+        return cost
+
+    def _steps(self, src, tar, i, j, last):
+        """Yield the steps that may follow a partial alignment.
+
+        Steps are yielded in the order Covington explores them.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+        i : int
+            The number of source characters aligned so far
+        j : int
+            The number of target characters aligned so far
+        last : int or None
+            The previous step, or None at the start of the alignment
+
+        Yields
+        ------
+        tuple
+            The step, its cost, and the source & target positions after it
+
+        """
+        skip_ext, skip = self._weights[6], self._weights[7]
+        can_match = i < len(src) and j < len(tar)
+        if can_match and last is not None:
+            yield _MATCH, self._char_cost(src[i], tar[j]), i + 1, j + 1
+        if j < len(tar) and last != _TAR_SKIP:
+            yield (
+                _SRC_SKIP,
+                skip_ext if last == _SRC_SKIP else skip,
+                i,
+                j + 1,
+            )
+        if i < len(src) and last != _SRC_SKIP:
+            yield (
+                _TAR_SKIP,
+                skip_ext if last == _TAR_SKIP else skip,
+                i + 1,
+                j,
+            )
+        if can_match and last is None:
+            yield _MATCH, self._char_cost(src[i], tar[j]), i + 1, j + 1
+
+    def _unsupported(self, src, tar):
+        """Return True if src & tar must be passed to Covington.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        bool
+            True if either string is empty or contains a combining character
+
+        """
+        return not src or not tar or any(map(combining, src + tar))
+
+    def _completion_costs(self, src, tar):
+        """Return the least cost of completing each partial alignment.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        list
+            rem[i][j][last] is the least cost of aligning src[i:] & tar[j:]
+            after a step of kind last
+
+        """
+        src_len = len(src)
+        tar_len = len(tar)
+        rem = [
+            [[_INF, _INF, _INF] for _ in range(tar_len + 1)]
+            for _ in range(src_len + 1)
+        ]
+        rem[src_len][tar_len] = [0, 0, 0]
+        for i in range(src_len, -1, -1):
+            for j in range(tar_len, -1, -1):
+                if i == src_len and j == tar_len:
+                    continue
+                for last in (_MATCH, _SRC_SKIP, _TAR_SKIP):
+                    best = _INF
+                    for _, cost, ni, nj in self._steps(src, tar, i, j, last):
+                        cand = cost + rem[ni][nj][_last_of(i, j, ni, nj)]
+                        if cand < best:
+                            best = cand
+                    rem[i][j][last] = best
+        return rem
+
+    def dist_abs(self, src, tar):
+        """Return the Covington distance of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            Covington distance
+
+        """
+        if self._unsupported(src, tar):
+            return super(FastCovington, self).dist_abs(src, tar)
+
+        src_len = len(src)
+        tar_len = len(tar)
+        # Costs are accumulated from the start of the alignment, in the order
+        # Covington sums them, so float weights give identical results.
+        best = [
+            [[_INF, _INF, _INF] for _ in range(tar_len + 1)]
+            for _ in range(src_len + 1)
+        ]
+        for step, cost, i, j in self._steps(src, tar, 0, 0, None):
+            best[i][j][step] = cost
+        for i in range(src_len + 1):
+            for j in range(tar_len + 1):
+                for last in (_MATCH, _SRC_SKIP, _TAR_SKIP):
+                    prefix = best[i][j][last]
+                    if prefix == _INF:
+                        continue
+                    for step, cost, ni, nj in self._steps(
+                        src, tar, i, j, last
+                    ):
+                        if prefix + cost < best[ni][nj][step]:
+                            best[ni][nj][step] = prefix + cost
+        return min(best[src_len][tar_len])
+
+    def alignment(self, src, tar):
+        """Return the top Covington alignment of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        tuple(float, str, str)
+            Covington score & alignment
+
+        """
+        alignment = self.alignments(src, tar, 1)[0]
+        return alignment.score, alignment.src, alignment.tar
+
+    def alignments(self, src, tar, top_n=None):
+        """Return the Covington alignments of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+        top_n : int
+            The number of alignments to return. If None, all alignments will
+            be returned. If 0, all alignments with the top score will be
+            returned.
+
+        Returns
+        -------
+        list
+            Covington alignments
+
+        """
+        if top_n is None or self._unsupported(src, tar):
+            return super(FastCovington, self).alignments(src, tar, top_n)
+
+        rem = self._completion_costs(src, tar)
+        if top_n == 0:
+            limit = None
+            threshold = self.dist_abs(src, tar)
+        else:
+            limit = top_n
+            threshold = _INF
+
+        # found is a heap of (-score, -order, alignment), so its root is the
+        # alignment that ranks last among those kept
+        found = []
+        counter = [0]
+        slack = self._slack
+
+        def _search(cost, i, j, last, src_align, tar_align):
+            if i == len(src) and j == len(tar):
+                entry = (
+                    -cost,
+                    -counter[0],
+                    Alignment(src_align, tar_align, cost),
+                )
+                counter[0] += 1
+                if limit is None or len(found) < limit:
+                    heappush(found, entry)
+                else:
+                    heappushpop(found, entry)
+                return
+
+            for step, step_cost, ni, nj in self._steps(src, tar, i, j, last):
+                bound = (
+                    -found[0][0]
+                    if limit is not None and len(found) == limit
+                    else threshold
+                )
+                if cost + step_cost + rem[ni][nj][step] > bound + slack:
+                    continue
+                _search(
+                    cost + step_cost,
+                    ni,
+                    nj,
+                    step,
+                    src_align + (src[i] if ni > i else '-'),
+                    tar_align + (tar[j] if nj > j else '-'),
+                )
+
+        _search(0, 0, 0, None, '', '')
+        ranked = sorted(found, key=lambda entry: (-entry[0], -entry[1]))
+        if limit is None:
+            return [al for _, _, al in ranked if al.score <= threshold]
+        return [al for _, _, al in ranked]
+
+
+def _last_of(i, j, ni, nj):
+    """Return the kind of step from (i, j) to (ni, nj).
+
+    Parameters
+    ----------
+    i : int
+        The source position before the step
+    j : int
+        The target position before the step
+    ni : int
+        The source position after the step
+    nj : int
+        The target position after the step
+
+    Returns
+    -------
+    int
+        The kind of step
+
+    """
+    if ni > i and nj > j:
+        return _MATCH
+    return _SRC_SKIP if nj > j else _TAR_SKIP
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    cmp = Covington()
+    fast_cmp = FastCovington()
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(len(names) - 1)]
+    sample = pairs[::step]
+
+    mismatches = 0
+
+    start = time()
+    alignments = [cmp.alignment(src, tar) for src, tar in sample]
+    baseline = len(sample) / (time() - start)
+    report('covington alignment', '{:0.1f} pairs/s'.format(baseline))
+
+    start = time()
+    fast_alignments = [fast_cmp.alignment(src, tar) for src, tar in sample]
+    rate = len(sample) / (time() - start)
+    report('fast covington alignment', '{:0.1f} pairs/s'.format(rate))
+    report('speedup', '{:0.1f}x'.format(rate / baseline))
+
+    for (src, tar), al, fast_al in zip(sample, alignments, fast_alignments):
+        if al != fast_al:
+            mismatches += 1
+            sys.stdout.write(
+                'alignment mismatch for: {} & {}: {} != {}\n'.format(
+                    src, tar, fast_al, al
+                )
+            )
+
+    for method in ('dist_abs', 'dist'):
+        start = time()
+        calcs = [getattr(fast_cmp, method)(src, tar) for src, tar in pairs]
+        report(
+            'fast covington_{}'.format(method),
+            '{:0.1f} pairs/s'.format(len(pairs) / (time() - start)),
+        )
+
+        stored = load_dist_corpus('covington_' + method)
+        for (src, tar), val, calc in zip(pairs, stored, calcs):
+            if to_float32(calc) != val:
+                mismatches += 1
+                sys.stdout.write(
+                    'covington_{} mismatch for: {} & {}: {} != {}\n'.format(
+                        method, src, tar, calc, val
+                    )
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
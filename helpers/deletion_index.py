@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""deletion_index.py.
+
+This module contains a symmetric deletion (SymSpell-style) index of strings
+for lookups within a small edit distance. If two strings are within an edit
+distance of k of each other, deleting at most k characters from each of
+them yields a common string, so the index stores, for every string, the
+strings made by deleting up to k of its characters, and a query need only
+look up its own deletions. Each deletion is stored as a 64-bit hash, in a
+sorted array of hashes with a parallel array of the numbers of the strings
+it was made from, so lookups are binary searches. Strings whose hashes
+collide are only extra candidates: every candidate is verified with an
+abydos measure, such as :py:class:`Levenshtein` or
+:py:class:`DamerauLevenshtein`.
+
+Run as a script, it builds indices of every name with deletions up to 2
+and compares the results of queries within distances 1 & 2 of misspelled
+names with those of a Levenshtein automaton over a trie of the names, which
+are the same as a scan of every name, reporting each index's memory, build
+time and median & 99th percentile query latency. An optional argument sets
+the stride through the names for the query strings (default 100).
+"""
+
+import sys
+from time import time
+
+from abydos.distance import DamerauLevenshtein, Levenshtein
+
+import numpy as np
+
+from _common import load_names, report
+from levenshtein_automaton import LevenshteinTrie
+
+
+def _deletions(word, count):
+    """Return the strings made by deleting characters from a string.
+
+    Parameters
+    ----------
+    word : str
+        The string
+    count : int
+        The maximum number of characters to delete
+
+    Returns
+    -------
+    set
+        The string and every string made by deleting up to count of its
+        characters
+
+    """
+    found = {word}
+    level = {word}
+    for _ in range(count):
+        level = {
+            part[:pos] + part[pos + 1 :]
+            for part in level
+            for pos in range(len(part))
+        }
+        found |= level
+    return found
+
+
+class DeletionIndex(object):
+    """A symmetric deletion index of strings.
+
+    Strings are numbered in the order they were indexed.
+    """
+
+    def __init__(self, words=(), max_distance=2, metric=None):
+        """Initialize DeletionIndex instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to index
+        max_distance : int
+            The greatest distance that can be queried
+        metric : _Distance
+            The edit distance measure used to verify candidates, defaulting
+            to Levenshtein distance
+
+        """
+        if metric is None:
+            metric = Levenshtein()
+        self._dist = metric.dist_abs
+        self._max_distance = max_distance
+        self._words = list(dict.fromkeys(words))
+        self.comparisons = 0
+
+        hashes = []
+        nums = []
+        for num, word in enumerate(self._words):
+            deletions = [hash(part) for part in _deletions(word, max_distance)]
+            hashes.extend(deletions)
+            nums.extend([num] * len(deletions))
+        hashes = np.array(hashes, dtype=np.int64)
+        order = np.argsort(hashes, kind='stable')
+        self._hashes = hashes[order]
+        self._nums = np.array(nums, dtype=np.int32)[order]
+
+    def __len__(self):
+        """Return the number of strings in the index.
+
+        Returns
+        -------
+        int
+            The number of distinct strings indexed
+
+        """
+        return len(self._words)
+
+    @property
+    def nbytes(self):
+        """Return the memory used by the deletion arrays.
+
+        Returns
+        -------
+        int
+            The size of the index's arrays, in bytes
+
+        """
+        return self._hashes.nbytes + self._nums.nbytes
+
+    def candidates(self, word, radius):
+        """Return the indexed strings sharing a deletion with a string.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        radius : int
+            The maximum distance, which may not exceed the index's
+
+        Returns
+        -------
+        list
+            The candidate strings, in index order
+
+        Raises
+        ------
+        ValueError
+            The radius exceeds the index's maximum distance
+
+        """
+        if radius > self._max_distance:
+            raise ValueError(
+                'The radius may not exceed {}'.format(self._max_distance)
+            )
+        hashes = np.array(
+            [hash(part) for part in _deletions(word, radius)], dtype=np.int64
+        )
+        lows = np.searchsorted(self._hashes, hashes, 'left')
+        highs = np.searchsorted(self._hashes, hashes, 'right')
+        found = [
+            self._nums[low:high]
+            for low, high in zip(lows, highs)
+            if low < high
+        ]
+        if not found:
+            return []
+        return [self._words[num] for num in np.unique(np.concatenate(found))]
+
+    def query(self, word, radius):
+        """Return the indexed strings within a distance of a string.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        radius : int
+            The maximum distance, which may not exceed the index's
+
+        Returns
+        -------
+        list
+            (distance, string) tuples, in ascending order
+
+        Raises
+        ------
+        ValueError
+            The radius exceeds the index's maximum distance
+
+        """
+        dist = self._dist
+        length = len(word)
+        found = []
+        for candidate in self.candidates(word, radius):
+            if abs(len(candidate) - length) > radius:
+                continue
+            self.comparisons += 1
+            cand_dist = dist(word, candidate)
+            if cand_dist <= radius:
+                found.append((cand_dist, candidate))
+        found.sort()
+        return found
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    radii = (1, 2)
+
+    names = load_names()
+    mismatches = 0
+
+    # each query is a name with its middle letter deleted and the two
+    # letters before it transposed
+    queries = []
+    for name in names[step // 2 :: step]:
+        pos = len(name) // 2
+        name = name[:pos] + name[pos + 1 :]
+        if pos >= 2:
+            name = name[: pos - 2] + name[pos - 1] + name[pos - 2] + name[pos:]
+        queries.append(name)
+
+    for label, measure, transpositions in (
+        ('Levenshtein', Levenshtein(), False),
+        ('Damerau', DamerauLevenshtein(), True),
+    ):
+        start = time()
+        index = DeletionIndex(names, max(radii), measure)
+        report(
+            '{} index of {}'.format(label, len(index)),
+            '{:0.1f} s, {:0.1f} MB'.format(
+                time() - start, index.nbytes / 2 ** 20
+            ),
+        )
+        trie = LevenshteinTrie(names, transpositions)
+
+        for radius in radii:
+            latencies = []
+            trie_time = 0.0
+            found = 0
+            index.comparisons = 0
+            for query in queries:
+                start = time()
+                result = index.query(query, radius)
+                latencies.append(time() - start)
+
+                start = time()
+                expected = trie.query(query, radius)
+                trie_time += time() - start
+                found += len(expected)
+
+                if result != expected:
+                    mismatches += 1
+                    sys.stdout.write(
+                        '{} {} mismatch for: {}: {} != {}\n'.format(
+                            label, radius, query, result, expected
+                        )
+                    )
+
+            latencies.sort()
+            report(
+                '{} k={} p50/p99'.format(label, radius),
+                '{:0.2f}/{:0.2f} ms'.format(
+                    latencies[len(latencies) // 2] * 1000,
+                    latencies[len(latencies) * 99 // 100] * 1000,
+                ),
+            )
+            report(
+                '{} k={} trie'.format(label, radius),
+                '{:0.2f} ms/query'.format(trie_time / len(queries) * 1000),
+            )
+            report(
+                '{} k={} verified/found'.format(label, radius),
+                '{:0.1f}/{:0.1f} per query'.format(
+                    index.comparisons / len(queries), found / len(queries)
+                ),
+            )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""fingerprint_batch.py.
+
+This module contains a batch fingerprinting API for the fingerprint
+algorithms. :py:meth:`fingerprint_many` takes an iterable of words and yields
+their fingerprints, looking up the fingerprinter's configuration once rather
+than once per word.
+
+The bit vector fingerprints (Count, Position, Occurrence, and Occurrence
+Halved) build a table of each common letter's bit position once, and yield
+their fingerprints as strings of '0's and '1's, the form stored in the
+corpora, or as integers. The String and Q-gram fingerprints normalize ASCII
+phrases with shared :py:meth:`str.translate` tables and collect q-grams
+without a tokenizer object; other phrases fall back to
+:py:meth:`fingerprint`. Any other fingerprinter can be given the generic
+batch API with :py:func:`batch_fingerprinter`.
+
+Run as a script, it checks the batch output of every fingerprint algorithm
+against the stored `<algorithm>.csv` corpora and compares throughput with
+calling :py:meth:`fingerprint` on each name. The algorithms with specialized
+batch paths are checked on every name; an optional argument sets the stride
+through the names for the others and for the baselines (default 10).
+"""
+
+import os
+import sys
+from time import time
+
+from abydos.fingerprint import (
+    BWTF,
+    BWTRLEF,
+    Consonant,
+    Count,
+    Extract,
+    ExtractPositionFrequency,
+    LACSS,
+    LCCutter,
+    Occurrence,
+    OccurrenceHalved,
+    OmissionKey,
+    Phonetic,
+    Position,
+    QGram,
+    SkeletonKey,
+    String,
+    SynonameToolcode,
+)
+
+from _common import CORPORA, load_csv_corpus, load_names, report
+
+_ASCII = ''.join(chr(_) for _ in range(128))
+
+# deletes the ASCII characters that String & QGram fingerprints discard
+_ALNUM_SPACE_TRANS = str.maketrans(
+    '', '', ''.join(_ for _ in _ASCII if not (_.isalnum() or _.isspace()))
+)
+_ALNUM_TRANS = str.maketrans(
+    '', '', ''.join(_ for _ in _ASCII if not _.isalnum())
+)
+
+
+class BatchFingerprintMixin(object):
+    """A mixin providing the generic batch fingerprinting API.
+
+    Combined with a fingerprint algorithm class, it adds
+    :py:meth:`fingerprint_many`, which yields the same values as calling
+    :py:meth:`fingerprint` on each word.
+    """
+
+    def fingerprint_many(self, words):
+        """Yield the fingerprints of many words.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to fingerprint
+
+        Yields
+        ------
+        str
+            The fingerprint of each word, in order
+
+        """
+        fingerprint = self.fingerprint
+        for word in words:
+            yield fingerprint(word)
+
+
+class _BitFingerprintMixin(BatchFingerprintMixin):
+    """A mixin for fingerprints that are vectors of bits.
+
+    Subclasses define :py:meth:`_bits`, which yields integer fingerprints
+    using a table of the common letters' bit positions. The table is only
+    valid when all the common letters are single characters; otherwise
+    :py:meth:`fingerprint` is called for each word.
+    """
+
+    def _width(self):
+        """Return the number of bits in each fingerprint.
+
+        Returns
+        -------
+        int
+            The fingerprint width
+
+        """
+        return self._n_bits
+
+    def _bits(self, words):
+        """Yield the fingerprints of many words as integers.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to fingerprint
+
+        Yields
+        ------
+        int
+            The fingerprint of each word, in order
+
+        """
+        fingerprint = self.fingerprint
+        for word in words:
+            yield fingerprint(word)
+
+    def fingerprint_many(self, words, as_int=False):
+        """Yield the fingerprints of many words.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to fingerprint
+        as_int : bool
+            If True, yield each fingerprint as an integer; otherwise yield it
+            as a string of '0's and '1's
+
+        Yields
+        ------
+        str or int
+            The fingerprint of each word, in order
+
+        """
+        if all(len(letter) == 1 for letter in self._most_common):
+            bits = self._bits(words)
+        else:
+            bits = super(_BitFingerprintMixin, self).fingerprint_many(words)
+
+        if as_int:
+            yield from bits
+        else:
+            spec = '0{}b'.format(self._width())
+            for fingerprint in bits:
+                yield format(fingerprint, spec)
+
+
+class BatchCount(_BitFingerprintMixin, Count):
+    """Count fingerprint, with a specialized batch path."""
+
+    def _width(self):
+        """Return the number of bits in each fingerprint.
+
+        Returns
+        -------
+        int
+            The fingerprint width
+
+        """
+        return self._n_bits + self._n_bits % 2
+
+    def _bits(self, words):
+        """Yield the count fingerprints of many words as integers.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to fingerprint
+
+        Yields
+        ------
+        int
+            The fingerprint of each word, in order
+
+        """
+        width = self._width()
+        table = [
+            (letter, width - 2 * pos - 2)
+            for pos, letter in enumerate(self._most_common[: width // 2])
+        ]
+
+        for word in words:
+            fingerprint = 0
+            for letter, shift in table:
+                count = word.count(letter)
+                if count:
+                    fingerprint += (count & 3) << shift
+            yield fingerprint
+
+
+class BatchPosition(_BitFingerprintMixin, Position):
+    """Position fingerprint, with a specialized batch path."""
+
+    def _bits(self, words):
+        """Yield the position fingerprints of many words as integers.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to fingerprint
+
+        Yields
+        ------
+        int
+            The fingerprint of each word, in order
+
+        """
+        # each letter's shift and maximum value, followed by the trailing 1s
+        n_bits = self._n_bits
+        table = []
+        for letter in self._most_common:
+            if not n_bits:
+                break
+            letter_bits = min(self._bits_per_letter, n_bits)
+            n_bits -= letter_bits
+            table.append((letter, n_bits, 2 ** letter_bits - 1))
+        trailing = 2 ** n_bits - 1
+
+        for word in words:
+            fingerprint = trailing
+            for letter, shift, most in table:
+                pos = word.find(letter)
+                if pos < 0 or pos > most:
+                    pos = most
+                fingerprint += pos << shift
+            yield fingerprint
+
+
+class BatchOccurrence(_BitFingerprintMixin, Occurrence):
+    """Occurrence fingerprint, with a specialized batch path."""
+
+    def _bits(self, words):
+        """Yield the occurrence fingerprints of many words as integers.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to fingerprint
+
+        Yields
+        ------
+        int
+            The fingerprint of each word, in order
+
+        """
+        width = self._n_bits
+        if width < 1:
+            yield from super(BatchOccurrence, self)._bits(words)
+            return
+        table = [
+            (letter, 1 << (width - pos - 1))
+            for pos, letter in enumerate(self._most_common[:width])
+        ]
+
+        for word in words:
+            fingerprint = 0
+            for letter, bit in table:
+                if letter in word:
+                    fingerprint |= bit
+            yield fingerprint
+
+
+class BatchOccurrenceHalved(_BitFingerprintMixin, OccurrenceHalved):
+    """Occurrence halved fingerprint, with a specialized batch path."""
+
+    def _width(self):
+        """Return the number of bits in each fingerprint.
+
+        Returns
+        -------
+        int
+            The fingerprint width
+
+        """
+        return self._n_bits + self._n_bits % 2
+
+    def _bits(self, words):
+        """Yield the occurrence halved fingerprints of many words as integers.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to fingerprint
+
+        Yields
+        ------
+        int
+            The fingerprint of each word, in order
+
+        """
+        width = self._width()
+        table = [
+            (letter, 1 << (width - 2 * pos - 1), 1 << (width - 2 * pos - 2))
+            for pos, letter in enumerate(self._most_common[: width // 2])
+        ]
+
+        for word in words:
+            half = len(word) // 2
+            first, second = word[:half], word[half:]
+            fingerprint = 0
+            for letter, first_bit, second_bit in table:
+                if letter in first:
+                    fingerprint |= first_bit
+                if letter in second:
+                    fingerprint |= second_bit
+            yield fingerprint
+
+
+class BatchString(BatchFingerprintMixin, String):
+    """String fingerprint, with a specialized batch path."""
+
+    def fingerprint_many(self, words):
+        """Yield the string fingerprints of many phrases.
+
+        Parameters
+        ----------
+        words : iterable
+            The phrases to fingerprint
+
+        Yields
+        ------
+        str
+            The fingerprint of each phrase, in order
+
+        """
+        fingerprint = self.fingerprint
+        join = self._joiner.join
+
+        for phrase in words:
+            if not phrase.isascii():
+                yield fingerprint(phrase)
+                continue
+            phrase = phrase.strip().lower().translate(_ALNUM_SPACE_TRANS)
+            yield join(sorted(set(phrase.split())))
+
+
+class BatchQGram(BatchFingerprintMixin, QGram):
+    """Q-gram fingerprint, with a specialized batch path."""
+
+    def fingerprint_many(self, words):
+        """Yield the q-gram fingerprints of many phrases.
+
+        Parameters
+        ----------
+        words : iterable
+            The phrases to fingerprint
+
+        Yields
+        ------
+        str
+            The fingerprint of each phrase, in order
+
+        """
+        fingerprint = self.fingerprint
+        join = self._joiner.join
+
+        # the padding and step of each (q, skip) combination, as in QGrams
+        tokenizer = self._tokenizer
+        qvals = tokenizer.qval
+        if not isinstance(qvals, (list, tuple, range)):
+            qvals = (qvals,)
+        skips = tokenizer.skip
+        if not isinstance(skips, (list, tuple, range)):
+            skips = (skips,)
+        start_stop = tokenizer.start_stop
+        grams = []
+        for qval in qvals:
+            if qval < 1:
+                continue
+            for skip in skips:
+                if start_stop:
+                    start = start_stop[0] * (qval - 1)
+                    stop = start_stop[-1] * (qval - 1)
+                else:
+                    start = stop = ''
+                grams.append((qval, skip + 1, start, stop))
+
+        for phrase in words:
+            if not phrase.isascii():
+                yield fingerprint(phrase)
+                continue
+            phrase = phrase.strip().lower().translate(_ALNUM_TRANS)
+            tokens = set()
+            if phrase:
+                for qval, step, start, stop in grams:
+                    padded = start + phrase + stop
+                    if qval > 1 and len(padded) < qval:
+                        continue
+                    span = qval * step
+                    tokens.update(
+                        padded[pos : pos + span : step]
+                        for pos in range(len(padded) - qval + 1)
+                    )
+            yield join(sorted(tokens))
+
+
+_BATCH_CLASSES = {
+    Count: BatchCount,
+    Position: BatchPosition,
+    Occurrence: BatchOccurrence,
+    OccurrenceHalved: BatchOccurrenceHalved,
+    String: BatchString,
+    QGram: BatchQGram,
+}
+
+
+def batch_fingerprinter(fingerprinter):
+    """Return a fingerprinter with the batch fingerprinting API.
+
+    Fingerprinters with a specialized batch path get it; any other gets the
+    generic path of :py:class:`BatchFingerprintMixin`. The returned
+    fingerprinter shares the configuration of the one passed in.
+
+    Parameters
+    ----------
+    fingerprinter : _Fingerprint
+        A fingerprint algorithm instance
+
+    Returns
+    -------
+    BatchFingerprintMixin
+        The fingerprinter, as an instance of a batch fingerprinting subclass
+
+    """
+    if isinstance(fingerprinter, BatchFingerprintMixin):
+        return fingerprinter
+
+    cls = type(fingerprinter)
+    batch_cls = _BATCH_CLASSES.get(cls)
+    if batch_cls is None:
+        batch_cls = _BATCH_CLASSES[cls] = type(
+            'Batch' + cls.__name__, (BatchFingerprintMixin, cls), {}
+        )
+    batch = batch_cls.__new__(batch_cls)
+    batch.__dict__.update(vars(fingerprinter))
+    return batch
+
+
+def fingerprint_many(fingerprinter, words):
+    """Yield the fingerprints of many words.
+
+    Parameters
+    ----------
+    fingerprinter : _Fingerprint
+        A fingerprint algorithm instance
+    words : iterable
+        The words to fingerprint
+
+    Yields
+    ------
+    str
+        The fingerprint of each word, in order
+
+    """
+    return batch_fingerprinter(fingerprinter).fingerprint_many(words)
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    synoname = SynonameToolcode()
+    settings = {
+        'bwtf': BWTF(),
+        'bwtrlef': BWTRLEF(),
+        'consonant': Consonant(),
+        'consonant_2': Consonant(variant=2),
+        'consonant_3': Consonant(variant=3),
+        'consonant_nd': Consonant(doubles=False),
+        'count': Count(),
+        'count_32': Count(n_bits=32),
+        'extract': Extract(),
+        'extract_2': Extract(letter_list=2),
+        'extract_3': Extract(letter_list=3),
+        'extract_4': Extract(letter_list=4),
+        'extract_position_frequency': ExtractPositionFrequency(),
+        'lacss': LACSS(),
+        'lc_cutter': LCCutter(),
+        'occurrence': Occurrence(),
+        'occurrence_halved': OccurrenceHalved(),
+        'omission_key': OmissionKey(),
+        'phonetic': Phonetic(),
+        'position': Position(),
+        'position_32_2': Position(n_bits=32, bits_per_letter=2),
+        'qgram': QGram(),
+        'qgram_q3': QGram(qval=3),
+        'qgram_ssj': QGram(start_stop='$#', joiner=' '),
+        'skeleton_key': SkeletonKey(),
+        'string': String(),
+        'synoname_toolcode': synoname,
+    }
+    bit_vectors = {Count, Position, Occurrence, OccurrenceHalved}
+
+    names = load_names()
+    sample = names[::step]
+
+    mismatches = 0
+    for algo, fingerprinter in settings.items():
+        if not os.path.isfile(os.path.join(CORPORA, algo + '.csv')):
+            report(algo, 'no corpus')
+            continue
+
+        batch = batch_fingerprinter(fingerprinter)
+        specialized = type(batch).fingerprint_many is not (
+            BatchFingerprintMixin.fingerprint_many
+        )
+        checked = names if specialized else sample
+        stored = load_csv_corpus(algo)
+        if checked is sample:
+            stored = stored[::step]
+
+        fingerprint = fingerprinter.fingerprint
+        timed = checked[::step] if specialized else checked
+        start = time()
+        for name in timed:
+            fingerprint(name)
+        baseline = len(timed) / (time() - start)
+
+        start = time()
+        fingerprints = list(batch.fingerprint_many(checked))
+        rate = len(checked) / (time() - start)
+        report(
+            algo,
+            '{:0.1f} names/s ({:0.1f}x)'.format(rate, rate / baseline),
+        )
+
+        if type(fingerprinter) in bit_vectors:
+            start = time()
+            as_ints = list(batch.fingerprint_many(checked, as_int=True))
+            rate = len(checked) / (time() - start)
+            report(
+                algo + ' as int',
+                '{:0.1f} names/s ({:0.1f}x)'.format(rate, rate / baseline),
+            )
+            for name, calc in zip(timed, as_ints[::step]):
+                if calc != fingerprint(name):
+                    mismatches += 1
+                    sys.stdout.write(
+                        '{} mismatch for: {}: {} != {}\n'.format(
+                            algo, name, calc, fingerprint(name)
+                        )
+                    )
+
+        for name, val, calc in zip(checked, stored, fingerprints):
+            if isinstance(calc, tuple):
+                calc = ','.join(calc)
+            if calc != val:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} mismatch for: {}: {} != {}\n'.format(
+                        algo, name, calc, val
+                    )
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""higueramico_engine.py.
+
+This module contains a faster Higuera-Micó contextual normalized edit
+distance. :py:class:`HigueraMico` fills a (len(src)+1, len(tar)+1,
+len(src)+len(tar)+1) table element by element, then costs every feasible
+number of edit operations with a fresh sum of harmonic terms. Here only the
+operation counts that can occur at a cell (from abs(i-j) to i+j) are filled,
+each cell as one slice operation; the cost of each (lengths, operations,
+insertions) combination is memoized; and batches of pairs with equal lengths
+are filled together with NumPy.
+
+Run as a script, it checks every name pair against the stored
+`higueramico_dist*` corpora, compares throughput with
+:py:class:`HigueraMico`, and reports the time per pair by string length. An
+optional argument sets the stride through the names for the baseline
+(default 20).
+"""
+
+import sys
+from collections import defaultdict
+from time import time
+
+from abydos.distance import HigueraMico
+
+import numpy as np
+
+from _common import load_dist_corpus, load_names, report, to_float32
+
+_NINF = float('-inf')
+
+
+class FastHigueraMico(HigueraMico):
+    """The Higuera-Micó distance, with pruned & memoized computation.
+
+    Values are identical to those of :py:class:`HigueraMico`.
+    """
+
+    _max_group = 4096
+
+    def __init__(self, **kwargs):
+        """Initialize FastHigueraMico instance.
+
+        Parameters
+        ----------
+        **kwargs
+            Arbitrary keyword arguments
+
+        """
+        super(FastHigueraMico, self).__init__(**kwargs)
+        self._costs = {}
+        self._cost_tables = {}
+
+    def _cost(self, src_len, tar_len, ops, ins):
+        """Return the contextual cost of an edit operation count.
+
+        Parameters
+        ----------
+        src_len : int
+            The length of the source string
+        tar_len : int
+            The length of the target string
+        ops : int
+            The number of edit operations
+        ins : int
+            The number of insertions among them
+
+        Returns
+        -------
+        float
+            The contextual normalized cost, summed as in HigueraMico
+
+        """
+        key = (src_len, tar_len, ops, ins)
+        cost = self._costs.get(key)
+        if cost is None:
+            dels = src_len - tar_len + ins
+            subs = ops - (ins + dels)
+            cost = 0
+            for i in range(src_len + 1, src_len + ins + 1):
+                cost += 1 / i
+            cost += subs / (src_len + ins)
+            for i in range(tar_len + 1, tar_len + dels + 1):
+                cost += 1 / i
+            self._costs[key] = cost
+        return cost
+
+    def _cost_table(self, src_len, tar_len):
+        """Return the costs of every operation & insertion count.
+
+        Parameters
+        ----------
+        src_len : int
+            The length of the source strings
+        tar_len : int
+            The length of the target strings
+
+        Returns
+        -------
+        numpy.ndarray
+            A (len(src)+len(tar)+1, len(tar)+1) array of costs, infinite where
+            the insertion count is impossible
+
+        """
+        table = self._cost_tables.get((src_len, tar_len))
+        if table is None:
+            table = np.full((src_len + tar_len + 1, tar_len + 1), float('inf'))
+            for ops in range(src_len + tar_len + 1):
+                for ins in range(tar_len + 1):
+                    dels = src_len - tar_len + ins
+                    if dels >= 0 and ops - (ins + dels) >= 0:
+                        table[ops, ins] = self._cost(
+                            src_len, tar_len, ops, ins
+                        )
+            self._cost_tables[src_len, tar_len] = table
+        return table
+
+    def dist_abs(self, src, tar):
+        """Return the Higuera-Micó distance between two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            The Higuera-Micó distance between src & tar
+
+        """
+        if src == tar:
+            return 0.0
+
+        src_len = len(src)
+        tar_len = len(tar)
+        max_ops = src_len + tar_len
+
+        # prev[j][k] is the greatest number of insertions among k operations
+        # that transform src[:i-1] into tar[:j]; only k in [abs(i-j), i+j]
+        # can be reached, so only that range is filled
+        prev = []
+        for j in range(tar_len + 1):
+            cell = [_NINF] * (max_ops + 1)
+            cell[j] = j
+            prev.append(cell)
+
+        for i in range(1, src_len + 1):
+            cell = [_NINF] * (max_ops + 1)
+            cell[i] = 0
+            row = [cell]
+            for j in range(1, tar_len + 1):
+                diag = prev[j - 1]
+                if src[i - 1] == tar[j - 1]:
+                    cell = diag[:]
+                else:
+                    cell = [_NINF] + diag[:-1]
+                low = max(1, abs(i - j))
+                high = i + j + 1
+                up = prev[j]
+                left = row[j - 1]
+                cell[low:high] = map(
+                    max,
+                    up[low - 1 : high - 1],
+                    [ins + 1 for ins in left[low - 1 : high - 1]],
+                    cell[low:high],
+                )
+                row.append(cell)
+            prev = row
+
+        min_dist = float('inf')
+        for ops, ins in enumerate(prev[tar_len]):
+            if ins >= 0:
+                loc_dist = self._cost(src_len, tar_len, ops, int(ins))
+                if loc_dist < min_dist:
+                    min_dist = loc_dist
+        return min_dist
+
+    def dist_abs_many(self, pairs):
+        """Return the Higuera-Micó distances of many pairs of strings.
+
+        Pairs with equal string lengths are filled together.
+
+        Parameters
+        ----------
+        pairs : iterable
+            (src, tar) pairs of strings
+
+        Returns
+        -------
+        numpy.ndarray
+            The distance of each pair, in order
+
+        """
+        pairs = list(pairs)
+        dists = np.empty(len(pairs))
+
+        groups = defaultdict(list)
+        for pos, (src, tar) in enumerate(pairs):
+            if src == tar or not src or not tar:
+                dists[pos] = self.dist_abs(src, tar)
+            else:
+                groups[len(src), len(tar)].append(pos)
+
+        for (src_len, tar_len), positions in groups.items():
+            for start in range(0, len(positions), self._max_group):
+                group = positions[start : start + self._max_group]
+                src_chars = np.array(
+                    [[ord(char) for char in pairs[pos][0]] for pos in group]
+                )
+                tar_chars = np.array(
+                    [[ord(char) for char in pairs[pos][1]] for pos in group]
+                )
+                dists[group] = self._fill(
+                    src_chars[:, :, None] == tar_chars[:, None, :]
+                )
+
+        return dists
+
+    def _fill(self, matches):
+        """Return the distances of a group of equal-length pairs.
+
+        Parameters
+        ----------
+        matches : numpy.ndarray
+            A (group size, len(src), len(tar)) array of character equality
+
+        Returns
+        -------
+        numpy.ndarray
+            The distances of the pairs in the group
+
+        """
+        size, src_len, tar_len = matches.shape
+        max_ops = src_len + tar_len
+
+        prev = []
+        for j in range(tar_len + 1):
+            cell = np.full((size, max_ops + 1), _NINF)
+            cell[:, j] = j
+            prev.append(cell)
+
+        for i in range(1, src_len + 1):
+            cell = np.full((size, max_ops + 1), _NINF)
+            cell[:, i] = 0
+            row = [cell]
+            for j in range(1, tar_len + 1):
+                diag = prev[j - 1]
+                cell = np.full((size, max_ops + 1), _NINF)
+                cell[:, 1:] = diag[:, :-1]
+                match = matches[:, i - 1, j - 1]
+                cell[match] = diag[match]
+                low = max(1, abs(i - j))
+                high = i + j + 1
+                np.maximum(
+                    cell[:, low:high],
+                    np.maximum(
+                        prev[j][:, low - 1 : high - 1],
+                        row[j - 1][:, low - 1 : high - 1] + 1,
+                    ),
+                    out=cell[:, low:high],
+                )
+                row.append(cell)
+            prev = row
+
+        final = prev[tar_len]
+        reached = final >= 0
+        costs = self._cost_table(src_len, tar_len)[
+            np.arange(max_ops + 1), np.where(reached, final, 0).astype(np.intp)
+        ]
+        return np.where(reached, costs, float('inf')).min(axis=1)
+
+    def dist_many(self, pairs):
+        """Return the bounded Higuera-Micó distances of many pairs of strings.
+
+        Parameters
+        ----------
+        pairs : iterable
+            (src, tar) pairs of strings
+
+        Returns
+        -------
+        numpy.ndarray
+            The distance of each pair, bounded to [0, 1], in order
+
+        """
+        return np.minimum(1.0, self.dist_abs_many(pairs))
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(len(names) - 1)]
+    sample = pairs[::step]
+
+    mismatches = 0
+    for method in ('dist_abs', 'dist'):
+        algo = 'higueramico_' + method
+        stored = load_dist_corpus(algo)
+
+        base_cmp = getattr(HigueraMico(), method)
+        start = time()
+        for src, tar in sample:
+            base_cmp(src, tar)
+        baseline = len(sample) / (time() - start)
+        report(algo, '{:0.1f} pairs/s'.format(baseline))
+
+        fast_cmp = FastHigueraMico()
+        for label, calc_many in (
+            ('pruned', lambda: [fast_cmp.dist_abs(*pair) for pair in pairs]),
+            ('batched', lambda: getattr(fast_cmp, method + '_many')(pairs)),
+        ):
+            start = time()
+            calcs = calc_many()
+            rate = len(pairs) / (time() - start)
+            report(
+                '{} {}'.format(algo, label),
+                '{:0.1f} pairs/s ({:0.1f}x)'.format(rate, rate / baseline),
+            )
+            if method == 'dist':
+                calcs = [min(1.0, calc) for calc in calcs]
+
+            for (src, tar), val, calc in zip(pairs, stored, calcs):
+                if to_float32(calc) != val:
+                    mismatches += 1
+                    sys.stdout.write(
+                        '{} {} mismatch for: {} & {}: {} != {}\n'.format(
+                            algo, label, src, tar, calc, val
+                        )
+                    )
+
+    # time per pair by length (HigueraMico/pruned/batched), pairing equal
+    # length runs of the concatenated names
+    base_cmp = HigueraMico()
+    fast_cmp = FastHigueraMico()
+    joined = ''.join(names)
+    for length in (2, 4, 8, 12, 16, 24, 32):
+        strings = [
+            joined[pos : pos + length]
+            for pos in range(0, len(joined) - length, length * 997)
+        ][:101]
+        len_pairs = list(zip(strings, strings[1:]))
+        timings = []
+        expected = None
+        for calc_many in (
+            lambda: [base_cmp.dist_abs(*pair) for pair in len_pairs],
+            lambda: [fast_cmp.dist_abs(*pair) for pair in len_pairs],
+            lambda: list(fast_cmp.dist_abs_many(len_pairs)),
+        ):
+            start = time()
+            calcs = calc_many()
+            timings.append((time() - start) / len(len_pairs) * 1e3)
+            if expected is None:
+                expected = calcs
+            elif calcs != expected:
+                mismatches += 1
+                sys.stdout.write(
+                    'higueramico_dist_abs mismatch for length {}\n'.format(
+                        length
+                    )
+                )
+        report(
+            'length {} ms/pair'.format(length),
+            '{:0.3f}/{:0.3f}/{:0.3f}'.format(*timings),
+        )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
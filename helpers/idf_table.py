@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""idf_table.py.
+
+This module contains a precomputed inverse document frequency (IDF) table for
+:py:class:`TFIDF` and :py:class:`SoftTFIDF`. Without a corpus, those measures
+build a two-document :py:class:`UnigramCorpus` from the strings of every
+comparison; with one, they look up each token's document count and take a
+logarithm per token per call. Here the IDF of every token of a corpus is
+computed once into a compact token-to-weight table, which can be saved,
+loaded, and passed to either measure in place of the corpus.
+
+Run as a script, it builds the table for the q-grams of `regtest_names.csv`,
+checks it against :py:class:`UnigramCorpus`, and compares per-query latency
+without a corpus, with a :py:class:`UnigramCorpus` & with the table. An
+optional argument sets the stride through the names (default 10).
+"""
+
+import os
+import pickle  # noqa: S403
+import sys
+import tempfile
+from array import array
+from math import log1p
+from time import time
+
+from abydos.corpus import UnigramCorpus
+from abydos.distance import SoftTFIDF, TFIDF
+
+from _common import load_names, report
+
+
+class _IDFDict(dict):
+    """A token-to-IDF dict, giving infinity for tokens not in the corpus."""
+
+    def __missing__(self, term):
+        return float('inf')
+
+
+class IDFTable(object):
+    """A precomputed token-to-IDF table.
+
+    Its idf(term) method returns the same values as that of
+    :py:class:`UnigramCorpus` (infinity for terms not in the corpus), so it
+    can be used as the corpus of :py:class:`TFIDF` & :py:class:`SoftTFIDF`.
+    """
+
+    def __init__(self, tokens=(), weights=(), doc_count=0):
+        """Initialize IDFTable instance.
+
+        Parameters
+        ----------
+        tokens : sequence
+            The tokens of the corpus
+        weights : sequence
+            The IDF of each token, in the same order
+        doc_count : int
+            The number of documents in the corpus
+
+        """
+        self.doc_count = doc_count
+        self._idf = _IDFDict(zip(tokens, weights))
+        # look-ups go straight to the dict, bypassing a Python-level call
+        self.idf = self._idf.__getitem__
+
+    def __len__(self):
+        """Return the number of tokens in the table."""
+        return len(self._idf)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """Return the IDF table of a unigram corpus.
+
+        Parameters
+        ----------
+        corpus : UnigramCorpus
+            The corpus
+
+        Returns
+        -------
+        IDFTable
+            The IDF of every token of the corpus
+
+        """
+        tokens = sorted(corpus.corpus)
+        return cls(
+            tokens,
+            [
+                log1p(corpus.doc_count / corpus.corpus[token][1])
+                for token in tokens
+            ],
+            corpus.doc_count,
+        )
+
+    @classmethod
+    def from_documents(cls, documents, tokenizer=None):
+        """Return the IDF table of a collection of documents.
+
+        Parameters
+        ----------
+        documents : iterable
+            The documents, e.g. names, as strings
+        tokenizer : _Tokenizer
+            The tokenizer of the measure that will use the table, e.g.
+            ``TFIDF().params['tokenizer']``; if None, documents are split on
+            whitespace
+
+        Returns
+        -------
+        IDFTable
+            The IDF of every token of the documents
+
+        """
+        corpus = UnigramCorpus(word_tokenizer=tokenizer)
+        for doc in documents:
+            corpus.add_document(doc)
+        return cls.from_corpus(corpus)
+
+    @classmethod
+    def load(cls, filename):
+        """Load an IDF table from a file.
+
+        Parameters
+        ----------
+        filename : str
+            A file written by :py:meth:`save`
+
+        Returns
+        -------
+        IDFTable
+            The saved table
+
+        """
+        with open(filename, 'rb') as pkl:
+            doc_count, tokens, weights = pickle.load(pkl)  # noqa: S301
+        return cls(tokens, weights, doc_count)
+
+    def save(self, filename):
+        """Save the IDF table to a file.
+
+        The tokens are stored as a single tuple & their weights as a packed
+        array of doubles.
+
+        Parameters
+        ----------
+        filename : str
+            The file to (re)write
+
+        """
+        with open(filename, 'wb') as pkl:
+            pickle.dump(
+                (
+                    self.doc_count,
+                    tuple(self._idf),
+                    array('d', self._idf.values()),
+                ),
+                pkl,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(0, len(names) - 1, step)]
+    tokenizer = TFIDF().params['tokenizer']
+
+    start = time()
+    corpus = UnigramCorpus(word_tokenizer=tokenizer)
+    for name in names:
+        corpus.add_document(name)
+    report('build UnigramCorpus', '{:0.3f} s'.format(time() - start))
+
+    start = time()
+    table = IDFTable.from_corpus(corpus)
+    report('build IDFTable', '{:0.3f} s'.format(time() - start))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'idf.pkl')
+        table.save(filename)
+        report('saved size', '{} bytes'.format(os.path.getsize(filename)))
+        start = time()
+        table = IDFTable.load(filename)
+        report('load IDFTable', '{:0.3f} s'.format(time() - start))
+
+    mismatches = 0
+    for token in corpus.corpus:
+        if table.idf(token) != corpus.idf(token):
+            mismatches += 1
+            sys.stdout.write(
+                'idf mismatch for: {}: {} != {}\n'.format(
+                    token, table.idf(token), corpus.idf(token)
+                )
+            )
+
+    for cls in (TFIDF, SoftTFIDF):
+        algo = cls.__name__.lower() + '_sim'
+        calcs = {}
+        for label, idf_corpus in (
+            ('no corpus', None),
+            ('UnigramCorpus', corpus),
+            ('IDFTable', table),
+        ):
+            cmp = cls(corpus=idf_corpus)
+            start = time()
+            calcs[label] = [cmp.sim(src, tar) for src, tar in pairs]
+            report(
+                '{} {}'.format(algo, label),
+                '{:0.1f} us/query'.format((time() - start) / len(pairs) * 1e6),
+            )
+
+        for (src, tar), val, calc in zip(
+            pairs, calcs['UnigramCorpus'], calcs['IDFTable']
+        ):
+            if val != calc:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} mismatch for: {} & {}: {} != {}\n'.format(
+                        algo, src, tar, calc, val
+                    )
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""levenshtein_automaton.py.
+
+This module contains a trie of strings that finds the strings within an
+edit distance of a query by simulating the query's Levenshtein automaton over
+it. The automaton's state at a trie node is the row of the edit distance
+table between the query and the node's prefix, which is computed from its
+parent's row in time proportional to the query's length. The prefixes below
+a node can come no closer to the query than the least value in its row, so
+the subtrees of nodes whose rows exceed the maximum distance are never
+visited, and every string that is reached has its exact distance in its
+row's last cell.
+
+With transpositions, the rows are those of the (unrestricted)
+Damerau-Levenshtein distance of :py:class:`DamerauLevenshtein`, as computed
+by the Lowrance-Wagner algorithm; each node's row then also depends on the
+rows of its ancestors, which are kept on the path's stack.
+
+Run as a script, it builds tries of every name and compares the results and
+latency of queries within distances 1 to 3 of misspelled names with a
+brute-force scan of the names with :py:meth:`Levenshtein.dist_abs` and
+:py:meth:`DamerauLevenshtein.dist_abs`. An optional argument sets the stride
+through the names for the query strings (default 50000).
+"""
+
+import sys
+from time import time
+
+from abydos.distance import DamerauLevenshtein, Levenshtein
+
+from _common import load_names, report
+
+
+class LevenshteinTrie(object):
+    """A trie of strings for edit distance queries.
+
+    Nodes are dicts mapping each next character to a child node; the string
+    ending at a node, if any, is stored under the key None.
+    """
+
+    def __init__(self, words=(), transpositions=False):
+        """Initialize LevenshteinTrie instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to index
+        transpositions : bool
+            If True, distances are Damerau-Levenshtein distances, counting
+            the transposition of two characters as one edit; otherwise they
+            are Levenshtein distances
+
+        """
+        self._root = {}
+        self._size = 0
+        self._transpositions = transpositions
+        self.comparisons = 0
+        self.update(words)
+
+    def __len__(self):
+        """Return the number of strings in the trie.
+
+        Returns
+        -------
+        int
+            The number of distinct strings indexed
+
+        """
+        return self._size
+
+    def add(self, word):
+        """Add a string to the trie.
+
+        Parameters
+        ----------
+        word : str
+            The string to index
+
+        Returns
+        -------
+        bool
+            True if the string was added, False if it was already present
+
+        """
+        node = self._root
+        for char in word:
+            child = node.get(char)
+            if child is None:
+                child = node[char] = {}
+            node = child
+        if None in node:
+            return False
+        node[None] = word
+        self._size += 1
+        return True
+
+    def update(self, words):
+        """Add strings to the trie.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to index
+
+        """
+        for word in words:
+            self.add(word)
+
+    def query(self, word, radius):
+        """Return the indexed strings within an edit distance of a string.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        radius : int
+            The maximum distance
+
+        Returns
+        -------
+        list
+            (distance, string) tuples, in ascending order
+
+        """
+        found = []
+        first = list(range(len(word) + 1))
+        if None in self._root and first[-1] <= radius:
+            found.append((first[-1], self._root[None]))
+        if self._transpositions:
+            visited = self._damerau_search(word, radius, found)
+        else:
+            visited = self._levenshtein_search(word, radius, found)
+        self.comparisons += visited
+        found.sort()
+        return found
+
+    def _levenshtein_search(self, word, radius, found):
+        """Add the strings within a Levenshtein distance to found.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        radius : int
+            The maximum distance
+        found : list
+            The list of (distance, string) tuples to extend
+
+        Returns
+        -------
+        int
+            The number of nodes visited
+
+        """
+        length = len(word)
+        visited = 0
+        # (node, its character, its parent's row) entries
+        stack = [
+            (child, char, list(range(length + 1)))
+            for char, child in self._root.items()
+            if char is not None
+        ]
+        while stack:
+            node, char, above = stack.pop()
+            visited += 1
+            row = [above[0] + 1]
+            for pos in range(length):
+                row.append(
+                    min(
+                        row[pos] + 1,
+                        above[pos + 1] + 1,
+                        above[pos] + (word[pos] != char),
+                    )
+                )
+            if row[-1] <= radius and None in node:
+                found.append((row[-1], node[None]))
+            if min(row) <= radius:
+                stack.extend(
+                    (child, next_char, row)
+                    for next_char, child in node.items()
+                    if next_char is not None
+                )
+        return visited
+
+    def _damerau_search(self, word, radius, found):
+        """Add the strings within a Damerau-Levenshtein distance to found.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        radius : int
+            The maximum distance
+        found : list
+            The list of (distance, string) tuples to extend
+
+        Returns
+        -------
+        int
+            The number of nodes visited
+
+        """
+        length = len(word)
+        # rows[depth] is the row of the prefix of that length
+        rows = [list(range(length + 1))]
+        # the last depth along the path at which each character occurs
+        last_depth = {}
+        visited = 0
+
+        def _descend(node, char, depth):
+            nonlocal visited
+            visited += 1
+            above = rows[depth - 1]
+            row = [depth]
+            # the last position in the query matching char
+            last_pos = 0
+            for pos in range(1, length + 1):
+                query_char = word[pos - 1]
+                cost = query_char != char
+                value = min(
+                    row[pos - 1] + 1, above[pos] + 1, above[pos - 1] + cost
+                )
+                match_depth = last_depth.get(query_char, 0)
+                if last_pos and match_depth:
+                    value = min(
+                        value,
+                        rows[match_depth - 1][last_pos - 1]
+                        + (pos - last_pos - 1)
+                        + 1
+                        + (depth - match_depth - 1),
+                    )
+                row.append(value)
+                if not cost:
+                    last_pos = pos
+
+            if row[-1] <= radius and None in node:
+                found.append((row[-1], node[None]))
+            if min(row) > radius:
+                return
+
+            rows.append(row)
+            previous = last_depth.get(char)
+            last_depth[char] = depth
+            for next_char, child in node.items():
+                if next_char is not None:
+                    _descend(child, next_char, depth + 1)
+            if previous is None:
+                del last_depth[char]
+            else:
+                last_depth[char] = previous
+            rows.pop()
+
+        for char, child in self._root.items():
+            if char is not None:
+                _descend(child, char, 1)
+        return visited
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    radii = (1, 2, 3)
+
+    names = load_names()
+    mismatches = 0
+
+    # each query is a name with its middle two letters transposed
+    queries = []
+    for name in names[step // 2 :: step]:
+        pos = len(name) // 2 - 1
+        queries.append(
+            name[:pos] + name[pos + 1] + name[pos] + name[pos + 2 :]
+        )
+
+    for label, measure, transpositions in (
+        ('Levenshtein', Levenshtein(), False),
+        ('Damerau', DamerauLevenshtein(), True),
+    ):
+        start = time()
+        trie = LevenshteinTrie(names, transpositions)
+        report(
+            '{} trie of {}'.format(label, len(trie)),
+            '{:0.3f} s'.format(time() - start),
+        )
+
+        scan_time = 0.0
+        trie_times = dict.fromkeys(radii, 0.0)
+        trie_nodes = dict.fromkeys(radii, 0)
+        found = dict.fromkeys(radii, 0)
+        for query in queries:
+            start = time()
+            scanned = sorted(
+                (measure.dist_abs(query, name), name) for name in names
+            )
+            scan_time += time() - start
+
+            for radius in radii:
+                expected = [entry for entry in scanned if entry[0] <= radius]
+                found[radius] += len(expected)
+                trie.comparisons = 0
+                start = time()
+                result = trie.query(query, radius)
+                trie_times[radius] += time() - start
+                trie_nodes[radius] += trie.comparisons
+
+                if result != expected:
+                    mismatches += 1
+                    sys.stdout.write(
+                        '{} {} mismatch for: {}: {} != {}\n'.format(
+                            label, radius, query, result, expected
+                        )
+                    )
+
+        report(
+            '{} scan'.format(label),
+            '{:0.1f} ms/query'.format(scan_time / len(queries) * 1000),
+        )
+        for radius, trie_time in trie_times.items():
+            report(
+                '{} k={}'.format(label, radius),
+                '{:0.2f} ms/query ({:0.0f}x)'.format(
+                    trie_time / len(queries) * 1000, scan_time / trie_time
+                ),
+            )
+            report(
+                '{} k={} nodes/found'.format(label, radius),
+                '{:0.0f}/{:0.1f} per query'.format(
+                    trie_nodes[radius] / len(queries),
+                    found[radius] / len(queries),
+                ),
+            )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
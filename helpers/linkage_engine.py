@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""linkage_engine.py.
+
+This module contains an engine that computes the single, complete, and
+average linkage distances of two strings together. :py:class:`SingleLinkage`,
+:py:class:`CompleteLinkage`, and :py:class:`AverageLinkage` each tokenize both
+strings and call their metric for every pair of tokens, only to take a
+minimum, maximum, or mean. Here the token-by-token distances of a pair are
+gathered once for all three linkages, the distances of token pairs are cached
+across calls, and the tokens of the most recently seen strings are kept, since
+adjacent pairs in a batch usually share an operand.
+
+Run as a script, it checks every name pair against the stored linkage corpora
+and compares throughput with the three linkage classes. An optional argument
+sets the stride through the names for the baseline (default 20).
+"""
+
+import sys
+from collections import namedtuple
+from time import time
+
+from abydos.distance import (
+    AverageLinkage,
+    CompleteLinkage,
+    Levenshtein,
+    SingleLinkage,
+)
+from abydos.tokenizer import QGrams
+
+import numpy as np
+
+from _common import load_dist_corpus, load_names, report, to_float32
+
+Linkages = namedtuple(
+    'Linkages',
+    [
+        'singlelinkage_dist_abs',
+        'singlelinkage_dist',
+        'completelinkage_dist_abs',
+        'completelinkage_dist',
+        'averagelinkage_dist',
+    ],
+)
+
+
+class LinkageEngine(object):
+    """Single, complete, and average linkage distances, computed together.
+
+    Values are identical to those of the linkage classes given the same
+    tokenizer & metric.
+    """
+
+    def __init__(self, tokenizer=None, metric=None, cache_size=2 ** 20):
+        """Initialize LinkageEngine instance.
+
+        Parameters
+        ----------
+        tokenizer : _Tokenizer
+            A tokenizer instance from the :py:mod:`abydos.tokenizer` package,
+            defaulting to the QGrams tokenizer with q=2
+        metric : _Distance
+            A string distance measure class for comparing tokens, defaulting
+            to Levenshtein distance
+        cache_size : int
+            The maximum number of token pairs whose distances are kept; the
+            cache is emptied when it fills
+
+        """
+        self._tokenizer = QGrams() if tokenizer is None else tokenizer
+        self._metric = Levenshtein() if metric is None else metric
+        self._cache_size = cache_size
+        self._pair_dists = {}
+        self._tokens = {}
+
+    def _get_tokens(self, word):
+        """Return the distinct tokens and the token list of a string.
+
+        Parameters
+        ----------
+        word : str
+            The string to tokenize
+
+        Returns
+        -------
+        tuple
+            The distinct tokens and the full token list, in order
+
+        """
+        tokens = self._tokens.get(word)
+        if tokens is None:
+            tokenized = self._tokenizer.tokenize(word)
+            tokens = (list(tokenized.get_counter()), tokenized.get_list())
+            # at most three strings' tokens are kept, which is enough for
+            # consecutive pairs that share a string
+            if len(self._tokens) > 2:
+                self._tokens.clear()
+            self._tokens[word] = tokens
+        return tokens
+
+    def _token_dists(self, src, tar):
+        """Return the absolute & normalized distances of two tokens.
+
+        Parameters
+        ----------
+        src : str
+            Source token
+        tar : str
+            Target token
+
+        Returns
+        -------
+        tuple
+            The metric's dist_abs & dist values
+
+        """
+        dists = self._pair_dists.get((src, tar))
+        if dists is None:
+            dists = (
+                self._metric.dist_abs(src, tar),
+                self._metric.dist(src, tar),
+            )
+            if len(self._pair_dists) >= self._cache_size:
+                self._pair_dists.clear()
+            self._pair_dists[src, tar] = dists
+        return dists
+
+    def linkages(self, src, tar):
+        """Return the linkage distances of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        Linkages
+            The single & complete linkage distances, absolute and normalized,
+            and the average linkage distance
+
+        """
+        src_keys, src_list = self._get_tokens(src)
+        tar_keys, tar_list = self._get_tokens(tar)
+
+        token_dists = self._token_dists
+        matrix = {
+            term_src: [
+                token_dists(term_src, term_tar) for term_tar in tar_keys
+            ]
+            for term_src in src_keys
+        }
+
+        single_abs = float('inf')
+        single = 1.0
+        complete_abs = float('-inf')
+        complete = 0.0
+        for row in matrix.values():
+            for dist_abs, dist in row:
+                single_abs = min(single_abs, dist_abs)
+                single = min(single, dist)
+                complete_abs = max(complete_abs, dist_abs)
+                complete = max(complete, dist)
+
+        if not src and not tar:
+            average = 0.0
+        elif not src_list or not tar_list:
+            average = 1.0
+        else:
+            # the sum runs over the token lists, in AverageLinkage's order
+            tar_pos = {term: pos for pos, term in enumerate(tar_keys)}
+            tar_cols = [tar_pos[term] for term in tar_list]
+            num = 0.0
+            for term_src in src_list:
+                row = matrix[term_src]
+                for col in tar_cols:
+                    num += row[col][1]
+            average = num / (len(src_list) * len(tar_list))
+
+        return Linkages(
+            float(single_abs),
+            float(single),
+            float(complete_abs),
+            float(complete),
+            average,
+        )
+
+    def linkages_many(self, pairs):
+        """Return the linkage distances of many pairs of strings.
+
+        Parameters
+        ----------
+        pairs : iterable
+            (src, tar) pairs of strings
+
+        Returns
+        -------
+        Linkages
+            For each linkage distance, a numpy.ndarray of the values of each
+            pair, in order
+
+        """
+        values = np.array(
+            [self.linkages(src, tar) for src, tar in pairs], dtype=np.float64
+        ).reshape(-1, len(Linkages._fields))
+        return Linkages(*values.T)
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    measures = {
+        'singlelinkage_dist_abs': SingleLinkage().dist_abs,
+        'singlelinkage_dist': SingleLinkage().dist,
+        'completelinkage_dist_abs': CompleteLinkage().dist_abs,
+        'completelinkage_dist': CompleteLinkage().dist,
+        'averagelinkage_dist': AverageLinkage().dist,
+    }
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(len(names) - 1)]
+    sample = pairs[::step]
+
+    baseline = 0.0
+    for algo, cmp in measures.items():
+        start = time()
+        for src, tar in sample:
+            cmp(src, tar)
+        dur = time() - start
+        baseline += dur
+        report(algo, '{:0.1f} pairs/s'.format(len(sample) / dur))
+    baseline = len(sample) / baseline
+    report('all linkages', '{:0.1f} pairs/s'.format(baseline))
+
+    start = time()
+    calcs = LinkageEngine().linkages_many(pairs)
+    rate = len(pairs) / (time() - start)
+    report(
+        'all linkages batched',
+        '{:0.1f} pairs/s ({:0.1f}x)'.format(rate, rate / baseline),
+    )
+
+    mismatches = 0
+    for algo in measures:
+        stored = load_dist_corpus(algo)
+        for (src, tar), val, calc in zip(pairs, stored, getattr(calcs, algo)):
+            if to_float32(calc) != val:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} mismatch for: {} & {}: {} != {}\n'.format(
+                        algo, src, tar, calc, val
+                    )
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
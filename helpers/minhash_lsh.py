@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""minhash_lsh.py.
+
+This module contains a MinHash locality-sensitive hashing (LSH) index of
+strings. :py:meth:`MinHash.sim` tokenizes both strings and hashes their
+tokens on every call; here each string's signature, the minimum of its
+hashed tokens under each of k XOR masks, is computed once and stored as a
+row of a uint64 (or uint32) array. The signatures are cut into b bands of r
+rows, and each band is hashed to a bucket, so a query need only estimate the
+similarity of the strings that share a bucket with it in some band: strings
+with set Jaccard similarity s do so with probability 1 - (1 - s^r)^b.
+
+The masks are those of :py:class:`MinHash` with the same seed, drawn from
+the same tokenizer's tokens. :py:class:`MinHash` XORs the masks with each
+token's full 512-bit SHA-512 digest, so its minima are decided by the
+digests' high bits (and each mask's sign) and its k slots select at most two
+distinct tokens. As in :cite:`Kula:2015`, the index XORs the masks with the
+low 64 bits of the digest, so that each slot is an independent minimum and
+the fraction of matching slots estimates the strings' Jaccard similarity.
+
+Run as a script, it checks :py:class:`MinHash` against the stored
+`minhash_sim` corpus and compares its error and that of the signatures'
+estimates with `jaccard_sim`, then indexes every name and measures the
+precision & recall of threshold queries for misspelled names against the
+exact Jaccard similarities, for several band & row settings, with the
+candidates scored by their signatures or verified with :py:class:`Jaccard`.
+An optional argument sets the stride through the names for the query
+strings (default 1000).
+"""
+
+import sys
+from hashlib import sha512
+from time import time
+
+from abydos.distance import Jaccard, MinHash
+
+import numpy as np
+
+from _common import load_dist_corpus, load_names, report, to_float32
+from qgram_index import QGramIndex
+
+# multiplier for combining a band's rows into a bucket key (64-bit FNV prime)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+class MinHashLSH(object):
+    """A MinHash LSH index of strings.
+
+    Strings are numbered in the order they were indexed, and their
+    signatures are the rows of a (strings, bands x rows) array.
+    """
+
+    def __init__(
+        self, words=(), measure=None, bands=16, rows=4, dtype=np.uint64
+    ):
+        """Initialize MinHashLSH instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to index
+        measure : MinHash
+            A MinHash instance, whose tokenizer & seed are used for the
+            signatures, defaulting to MinHash with q=2
+        bands : int
+            The number of bands the signatures are cut into
+        rows : int
+            The number of signature rows (hash functions) in each band
+        dtype : numpy.dtype
+            np.uint64 or np.uint32, the type in which signatures are stored;
+            32-bit signatures halve the memory, but slots of different
+            tokens match with probability 2^-32
+
+        """
+        if measure is None:
+            measure = MinHash()
+        self._tokenizer = measure.params['tokenizer']
+        self._bands = bands
+        self._rows = rows
+        self._dtype = np.dtype(dtype)
+        self._masks = (
+            np.random.RandomState(seed=measure._seed)  # noqa: SF01
+            .randint(
+                np.iinfo(np.int64).min,
+                np.iinfo(np.int64).max,
+                bands * rows,
+                dtype=np.int64,
+            )
+            .view(np.uint64)
+        )
+        self._token_hashes = {}
+        self.comparisons = 0
+
+        self._words = list(dict.fromkeys(words))
+        self._signatures = np.empty(
+            (len(self._words), bands * rows), dtype=self._dtype
+        )
+        for num, word in enumerate(self._words):
+            self._signatures[num] = self.signature(word)
+
+        # each band's bucket keys, in ascending order, & their strings
+        self._keys = []
+        self._members = []
+        for keys in self._band_keys(self._signatures):
+            order = np.argsort(keys, kind='stable')
+            self._keys.append(keys[order])
+            self._members.append(order.astype(np.int32))
+
+    def __len__(self):
+        """Return the number of strings in the index.
+
+        Returns
+        -------
+        int
+            The number of distinct strings indexed
+
+        """
+        return len(self._words)
+
+    @property
+    def nbytes(self):
+        """Return the memory used by the signatures & buckets.
+
+        Returns
+        -------
+        int
+            The size of the index's arrays, in bytes
+
+        """
+        return self._signatures.nbytes + sum(
+            keys.nbytes + members.nbytes
+            for keys, members in zip(self._keys, self._members)
+        )
+
+    def signature(self, word):
+        """Return the MinHash signature of a string.
+
+        Parameters
+        ----------
+        word : str
+            The string to hash
+
+        Returns
+        -------
+        numpy.ndarray
+            The minimum of the string's hashed tokens under each mask
+
+        """
+        hashes = []
+        for tok in self._tokenizer.tokenize(word).get_set():
+            if tok not in self._token_hashes:
+                self._token_hashes[tok] = int.from_bytes(
+                    sha512(tok.encode()).digest()[-8:], 'big'
+                )
+            hashes.append(self._token_hashes[tok])
+        if not hashes:
+            return np.full(
+                len(self._masks), np.iinfo(self._dtype).max, self._dtype
+            )
+        return (
+            np.bitwise_xor.outer(
+                np.array(hashes, dtype=np.uint64), self._masks
+            )
+            .min(axis=0)
+            .astype(self._dtype)
+        )
+
+    def _band_keys(self, signatures):
+        """Return the bucket keys of each band of some signatures.
+
+        Parameters
+        ----------
+        signatures : numpy.ndarray
+            A (strings, bands x rows) array of signatures
+
+        Returns
+        -------
+        list
+            An array of each string's bucket key for each band
+
+        """
+        signatures = signatures.astype(np.uint64)
+        band_keys = []
+        for band in range(self._bands):
+            keys = np.zeros(len(signatures), dtype=np.uint64)
+            for row in range(band * self._rows, (band + 1) * self._rows):
+                keys ^= signatures[:, row]
+                keys *= _FNV_PRIME
+            band_keys.append(keys)
+        return band_keys
+
+    def sim(self, src, tar):
+        """Return the signatures' estimate of two strings' similarity.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            The fraction of the signatures' slots that match
+
+        """
+        if not src and not tar:
+            return 1.0
+        return float(
+            (self.signature(src) == self.signature(tar)).sum()
+            / len(self._masks)
+        )
+
+    def _candidates(self, signature):
+        """Return the strings sharing a bucket with a signature.
+
+        Parameters
+        ----------
+        signature : numpy.ndarray
+            The query string's signature
+
+        Returns
+        -------
+        numpy.ndarray
+            The candidates' numbers, in ascending order
+
+        """
+        found = []
+        for keys, members, (key,) in zip(
+            self._keys,
+            self._members,
+            self._band_keys(signature[np.newaxis, :]),
+        ):
+            low = np.searchsorted(keys, key, 'left')
+            high = np.searchsorted(keys, key, 'right')
+            if low < high:
+                found.append(members[low:high])
+        if not found:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(found))
+
+    def candidates(self, word):
+        """Return the indexed strings sharing a bucket with a string.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+
+        Returns
+        -------
+        list
+            The candidate strings, in index order
+
+        """
+        return [
+            self._words[num] for num in self._candidates(self.signature(word))
+        ]
+
+    def query(self, word, threshold, measure=None):
+        """Return the candidates at least a similarity to a string.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        threshold : float
+            The minimum similarity
+        measure : _Distance
+            A measure with which to score the candidates, such as Jaccard;
+            if None, they are scored by the signatures' estimate
+
+        Returns
+        -------
+        list
+            (similarity, string) tuples, in descending order of similarity
+            and ascending order of string
+
+        """
+        signature = self.signature(word)
+        nums = self._candidates(signature)
+        self.comparisons += len(nums)
+        if measure is None:
+            sims = (self._signatures[nums] == signature).sum(axis=1) / len(
+                self._masks
+            )
+            found = [
+                (float(sim), self._words[num])
+                for sim, num in zip(sims, nums)
+                if sim >= threshold
+            ]
+        else:
+            found = []
+            for num in nums:
+                sim = measure.sim(word, self._words[num])
+                if sim >= threshold:
+                    found.append((sim, self._words[num]))
+        found.sort(key=lambda entry: (-entry[0], entry[1]))
+        return found
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    thresholds = (0.5, 0.7)
+    settings = (
+        (32, 2, np.uint64),
+        (32, 2, np.uint32),
+        (16, 4, np.uint32),
+        (8, 8, np.uint32),
+    )
+
+    names = load_names()
+    mismatches = 0
+
+    # MinHash is slow, so check one pair in ten queries
+    minhash = MinHash()
+    jaccard = Jaccard()
+    lsh = MinHashLSH((), minhash, 16, 4)
+    minhash_error = lsh_error = 0.0
+    pairs = 0
+    start = time()
+    for num, (val, jac) in enumerate(
+        zip(load_dist_corpus('minhash_sim'), load_dist_corpus('jaccard_sim'))
+    ):
+        if num % (step // 10 or 1):
+            continue
+        src, tar = names[num], names[num + 1]
+        calc = to_float32(minhash.sim(src, tar))
+        if calc != val:
+            mismatches += 1
+            sys.stdout.write(
+                'minhash_sim mismatch for: {} & {}: {} != {}\n'.format(
+                    src, tar, calc, val
+                )
+            )
+        minhash_error += abs(val - jac)
+        lsh_error += abs(lsh.sim(src, tar) - jac)
+        pairs += 1
+    report('checked minhash_sim', '{:0.1f} s'.format(time() - start))
+    report('MinHash mean |error|', '{:0.4f}'.format(minhash_error / pairs))
+    report('signature mean |error|', '{:0.4f}'.format(lsh_error / pairs))
+
+    # each query is a name with its middle letter deleted
+    queries = [
+        name[: len(name) // 2] + name[len(name) // 2 + 1 :]
+        for name in names[step // 2 :: step]
+    ]
+
+    # the exact results come from an inverted q-gram index, which returns
+    # the same as a full scan
+    start = time()
+    for query in queries[:3]:
+        for name in names:
+            jaccard.sim(query, name)
+    report(
+        'Jaccard scan',
+        '{:0.1f} ms/query'.format((time() - start) / 3 * 1000),
+    )
+    exact_index = QGramIndex(names, jaccard)
+    expected = {}
+    for threshold in thresholds:
+        start = time()
+        expected[threshold] = [
+            {name for _, name in exact_index.query(query, threshold)}
+            for query in queries
+        ]
+        report(
+            'Jaccard index >= {}'.format(threshold),
+            '{:0.1f} ms/query'.format((time() - start) / len(queries) * 1000),
+        )
+
+    for bands, rows, dtype in settings:
+        label = '{}x{} {}'.format(bands, rows, np.dtype(dtype).name)
+        start = time()
+        lsh = MinHashLSH(names, minhash, bands, rows, dtype)
+        report(
+            '{} LSH of {}'.format(label, len(lsh)),
+            '{:0.1f} s, {:0.1f} MB'.format(
+                time() - start, lsh.nbytes / 2 ** 20
+            ),
+        )
+
+        for threshold in thresholds:
+            for scoring, measure in (
+                ('estimated', None),
+                ('verified', jaccard),
+            ):
+                lsh.comparisons = 0
+                true_positives = found = relevant = 0
+                start = time()
+                results = [
+                    lsh.query(query, threshold, measure) for query in queries
+                ]
+                lsh_time = time() - start
+                for result, exact in zip(results, expected[threshold]):
+                    result = {name for _, name in result}
+                    true_positives += len(result & exact)
+                    found += len(result)
+                    relevant += len(exact)
+
+                report(
+                    '{} {} >= {}'.format(label, scoring, threshold),
+                    '{:0.2f} ms/query ({:0.2%})'.format(
+                        lsh_time / len(queries) * 1000,
+                        lsh.comparisons / len(queries) / len(lsh),
+                    ),
+                )
+                report(
+                    '  precision/recall',
+                    '{:0.3f}/{:0.3f}'.format(
+                        true_positives / found if found else 1.0,
+                        true_positives / relevant if relevant else 1.0,
+                    ),
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""nearest_search.py.
+
+This module contains a top-k nearest string search API with pluggable
+candidate backends. :py:meth:`NearestSearch.search` scores the candidates a
+backend gives for a query with any distance or similarity measure, in
+batches through the batch distance API, and streams the scores through a
+bounded heap (:py:func:`heapq.nsmallest`) that keeps only the k best, so
+memory does not grow with the number of candidates. Backends are:
+
+    - :py:class:`BruteForceBackend`, every string, for exact results
+    - :py:class:`QGramBackend`, the strings passing the length and count
+      filters of an inverted q-gram index for a similarity threshold
+    - :py:class:`BKTreeBackend`, the strings within an edit distance in a
+      BK-tree
+    - :py:class:`PhoneticBackend`, the strings sharing a phonetic or
+      fingerprint key in a blocking index
+
+Any object with a :py:meth:`candidates` method returning an iterable of
+strings for a query can serve as a backend; the other backends trade recall
+for speed.
+
+Run as a script, it searches for the names nearest to misspelled names by
+Jaro-Winkler similarity with each backend, checking the brute-force results
+against a sort of every name's similarity, and reports each backend's
+recall of the brute-force results and its queries per second. An optional
+argument sets the stride through the names for the query strings (default
+15000).
+"""
+
+import sys
+from heapq import nsmallest
+from itertools import islice
+from time import time
+
+from abydos.distance import Jaccard, JaroWinkler
+from abydos.phonetic import Metaphone, Soundex
+
+from _common import load_names, report
+from banded_edit import BandedLevenshtein
+from bk_tree import BKTree
+from blocking_index import BlockingIndex
+from distance_batch import batch_measure
+from qgram_index import QGramIndex
+
+# measure methods for which greater values are nearer
+_SIMILARITIES = {'sim', 'sim_score'}
+
+
+class BruteForceBackend(object):
+    """A backend giving every string as a candidate."""
+
+    def __init__(self, words=()):
+        """Initialize BruteForceBackend instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to search
+
+        """
+        self._words = list(dict.fromkeys(words))
+
+    def candidates(self, word):
+        """Return the candidates for a query.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+
+        Returns
+        -------
+        list
+            Every string
+
+        """
+        return self._words
+
+
+class QGramBackend(object):
+    """A backend giving the candidates of an inverted q-gram index."""
+
+    def __init__(self, words=(), measure=None, threshold=0.3):
+        """Initialize QGramBackend instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to search
+        measure : _TokenDistance
+            The q-gram measure of the index, defaulting to Jaccard
+            similarity
+        threshold : float
+            The similarity threshold for which candidates are filtered
+
+        """
+        self._index = QGramIndex(words, measure)
+        self._threshold = threshold
+
+    def candidates(self, word):
+        """Return the candidates for a query.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+
+        Returns
+        -------
+        list
+            The strings passing the index's filters for the threshold
+
+        """
+        return self._index.candidates(word, self._threshold)
+
+
+class BKTreeBackend(object):
+    """A backend giving the strings within an edit distance in a BK-tree."""
+
+    def __init__(self, words=(), metric=None, radius=2):
+        """Initialize BKTreeBackend instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to search
+        metric : _Distance
+            A measure whose dist_abs is a metric, defaulting to Levenshtein
+            distance
+        radius : int or float
+            The maximum distance of the candidates
+
+        """
+        self._tree = BKTree(words, metric)
+        self._radius = radius
+
+    def candidates(self, word):
+        """Return the candidates for a query.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+
+        Returns
+        -------
+        list
+            The strings within the radius
+
+        """
+        return [found for _, found in self._tree.query(word, self._radius)]
+
+
+class PhoneticBackend(object):
+    """A backend giving the strings sharing a key in a blocking index."""
+
+    def __init__(self, words=(), *encoders):
+        """Initialize PhoneticBackend instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to search
+        *encoders : _Phonetic, _Fingerprint, or function
+            The encoders of the blocking index, defaulting to Soundex
+
+        """
+        self._index = BlockingIndex(words, *(encoders or (Soundex(),)))
+
+    def candidates(self, word):
+        """Return the candidates for a query.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+
+        Returns
+        -------
+        list
+            The strings sharing a key with the query
+
+        """
+        return self._index.candidates(word)
+
+
+class NearestSearch(object):
+    """Top-k nearest string search."""
+
+    def __init__(self, backend, measure=None, method='sim', batch_size=4096):
+        """Initialize NearestSearch instance.
+
+        Parameters
+        ----------
+        backend : object or iterable
+            A backend, with a candidates method, or the strings to search,
+            which are searched by brute force
+        measure : _Distance
+            A distance or similarity measure, defaulting to Jaro-Winkler
+        method : str
+            The measure's method by which strings are ranked: 'sim' or
+            'sim_score' (greater is nearer), or 'dist' or 'dist_abs' (less
+            is nearer)
+        batch_size : int
+            The number of candidates scored at a time
+
+        Raises
+        ------
+        ValueError
+            Unsupported method
+
+        """
+        if method not in {'sim', 'sim_score', 'dist', 'dist_abs'}:
+            raise ValueError('Unsupported method: {}'.format(method))
+        if not hasattr(backend, 'candidates'):
+            backend = BruteForceBackend(backend)
+        if measure is None:
+            measure = JaroWinkler()
+        self._backend = backend
+        self._calc_many = getattr(batch_measure(measure), method + '_many')
+        self._sign = -1 if method in _SIMILARITIES else 1
+        self._batch_size = batch_size
+        self.comparisons = 0
+
+    def _scored(self, word):
+        """Yield the candidates for a query, with their sort keys.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+
+        Yields
+        ------
+        tuple
+            (key, candidate), where lesser keys are nearer
+
+        """
+        candidates = iter(self._backend.candidates(word))
+        batch = list(islice(candidates, self._batch_size))
+        while batch:
+            values = self._calc_many([(word, tar) for tar in batch])
+            self.comparisons += len(batch)
+            sign = self._sign
+            for value, tar in zip(values.tolist(), batch):
+                yield sign * value, tar
+            batch = list(islice(candidates, self._batch_size))
+
+    def search(self, word, k=10):
+        """Return the k candidates nearest a query.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        k : int
+            The number of strings to return
+
+        Returns
+        -------
+        list
+            (value, string) tuples, nearest first; ties are broken by the
+            strings' order
+
+        """
+        return [
+            (self._sign * key, tar)
+            for key, tar in nsmallest(k, self._scored(word))
+        ]
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 15000
+
+    counts = (1, 10)
+
+    names = load_names()
+    mismatches = 0
+    measure = JaroWinkler()
+    method = 'sim'
+    calc = getattr(measure, method)
+    sign = -1 if method in _SIMILARITIES else 1
+
+    # each query is a name with its middle letter deleted
+    queries = [
+        name[: len(name) // 2] + name[len(name) // 2 + 1 :]
+        for name in names[step // 2 :: step]
+    ]
+
+    brute_force = NearestSearch(names, measure, method)
+    expected = {}
+    brute_times = dict.fromkeys(counts, 0.0)
+    for query in queries:
+        scanned = sorted((sign * calc(query, name), name) for name in names)
+        for count in counts:
+            start = time()
+            result = brute_force.search(query, count)
+            brute_times[count] += time() - start
+            expected[query, count] = result
+            if result != [(sign * key, name) for key, name in scanned[:count]]:
+                mismatches += 1
+                sys.stdout.write(
+                    'brute force {} mismatch for: {}: {} != {}\n'.format(
+                        count, query, result, scanned[:count]
+                    )
+                )
+    for count in counts:
+        report(
+            'brute force k={}'.format(count),
+            '{:0.2f} queries/s'.format(len(queries) / brute_times[count]),
+        )
+
+    for label, make_backend in (
+        ('q-gram', lambda: QGramBackend(names, Jaccard(), 0.3)),
+        (
+            'BK-tree',
+            lambda: BKTreeBackend(
+                names,
+                BandedLevenshtein(
+                    max_distance=max(len(name) for name in names)
+                ),
+                2,
+            ),
+        ),
+        ('Soundex', lambda: PhoneticBackend(names, Soundex())),
+        (
+            'Soundex+Metaphone',
+            lambda: PhoneticBackend(names, Soundex(), Metaphone()),
+        ),
+    ):
+        start = time()
+        searcher = NearestSearch(make_backend(), measure, method)
+        report(label + ' backend', '{:0.1f} s'.format(time() - start))
+
+        for count in counts:
+            searcher.comparisons = 0
+            recalled = 0
+            start = time()
+            results = [searcher.search(query, count) for query in queries]
+            search_time = time() - start
+            for query, result in zip(queries, results):
+                best = expected[query, count]
+                # names tied with the kth best are as near as it
+                recalled += min(
+                    count,
+                    sum(
+                        1
+                        for value, _ in result
+                        if sign * value <= sign * best[-1][0]
+                    ),
+                )
+
+            report(
+                '{} k={}'.format(label, count),
+                '{:0.2f} queries/s ({:0.0f}x)'.format(
+                    len(queries) / search_time,
+                    brute_times[count] / search_time,
+                ),
+            )
+            report(
+                '{} k={} recall'.format(label, count),
+                '{:0.3f} ({:0.0f} scored/query)'.format(
+                    recalled / count / len(queries),
+                    searcher.comparisons / len(queries),
+                ),
+            )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""phonet_index.py.
+
+This module contains a Phonet encoder that codes from a prebuilt rule index.
+:py:class:`Phonet` hashes its rule table by leading letter (and by leading
+letter pair) at the start of every call to encode, which accounts for nearly
+all of its run time, and then re-parses each rule string it tries, character
+by character, for every position of every word. Here each rule string is
+parsed once into a precompiled condition: the literal letters it must match,
+the letter group that may follow them, its '-' count, priority and '^'/'$'
+anchors, and its replacements for each mode. The rules that can apply to a
+letter, given the letter after it, are looked up once per letter pair and
+kept in an index shared by every encoder using the same rule table, whatever
+its mode.
+
+The rules tried for a letter pair are those that Phonet's letter-pair hashes
+select, in table order, less those whose conditions can't match the next
+letter, so rule priorities are kept exactly.
+
+Run as a script, it checks every name against the stored `phonet_*.csv`
+corpora and compares throughput with :py:class:`Phonet`. An optional argument
+sets the stride through the names for the baseline (default 10).
+"""
+
+import sys
+from time import time
+from unicodedata import normalize as unicode_normalize
+
+from abydos.phonetic import Phonet
+
+from _common import load_csv_corpus, load_names, report
+
+# rule indices, keyed by rule table: 'none' or 'de'
+_INDICES = {}
+
+# Phonet's letter positions: 2-27 for A-Z, 1 for umlauts, 0 for all else
+_ALPHA_POS = dict(
+    {char: 1 for char in 'ÀÁÂÃÄÅÆÇÈÉÊËÌÍÎÏÐÑÒÓÔÕÖØÙÚÛÜÝÞßŒŠŸ'},
+    **{char: num + 2 for num, char in enumerate('ABCDEFGHIJKLMNOPQRSTUVWXYZ')}
+)
+
+
+def _match_condition(tail):
+    """Return the precompiled condition of a rule after its literal letters.
+
+    Parameters
+    ----------
+    tail : str
+        The rest of a rule string, after the letters matched literally
+
+    Returns
+    -------
+    tuple or None
+        The letters of a '(...)' group that must come next (or None), whether
+        the rule lacks a '-' after its letters & group, the number of '-'
+        (matched letters not replaced), the priority, and the anchor: '',
+        '^' (word start), '^$' (whole word), or '$' (word end). None if the
+        rule can't match with this tail.
+
+    """
+    group = None
+    if tail[:1] == '(':
+        group = tail[1:]
+        tail = tail.partition(')')[2]
+    no_dash = tail[:1] != '-'
+    dashes = len(tail) - len(tail.lstrip('-'))
+    tail = tail[dashes:]
+    if tail[:1] == '<':
+        tail = tail[1:]
+    priority = 5
+    if tail[:1].isdigit():
+        priority = int(tail[0])
+        tail = tail[1:]
+    if tail[:2] == '^^':
+        tail = tail[1:]
+
+    if not tail:
+        anchor = ''
+    elif tail[0] == '^':
+        anchor = '^$' if tail[1:2] == '$' else '^'
+    elif tail[0] == '$':
+        anchor = '$'
+    else:
+        return None
+    return group, no_dash, dashes, priority, anchor
+
+
+def _continuation_condition(tail):
+    """Return the precompiled condition of a continuation rule.
+
+    A continuation rule is one that would apply to the last letter a rule
+    matched; if it matches further and with at least the same priority, the
+    first rule is skipped. Continuations match '-' literally & have no '^'.
+
+    Parameters
+    ----------
+    tail : str
+        The rest of a rule string, after the letters matched literally
+
+    Returns
+    -------
+    tuple or None
+        The letters of a '(...)' group that must come next (or None), the
+        priority, and whether the rule is anchored to the word end. None if
+        the rule can't match with this tail.
+
+    """
+    group = None
+    if tail[:1] == '(':
+        group = tail[1:]
+        tail = tail.partition(')')[2]
+    tail = tail.lstrip('-')
+    if tail[:1] == '<':
+        tail = tail[1:]
+    priority = 5
+    if tail[:1].isdigit():
+        priority = int(tail[0])
+        tail = tail[1:]
+
+    if tail and tail[0] != '$':
+        return None
+    return group, priority, bool(tail)
+
+
+def _compile_rule(rules, pos):
+    """Return a rule of a Phonet rule table, precompiled.
+
+    Parameters
+    ----------
+    rules : tuple
+        A Phonet rule table
+    pos : int
+        The position of the rule string in the table
+
+    Returns
+    -------
+    tuple
+        The letters the rule matches literally, its condition after each
+        number of them matched, the same two for a continuation, its
+        replacements for modes 1 & 2 (at positions 1 & 2), and whether it
+        has the '<' & '^^' flags
+
+    """
+    rule = rules[pos][1:]
+
+    length = 0
+    while (
+        length < len(rule)
+        and not rule[length].isdigit()
+        and rule[length:] not in '(-<^$'
+    ):
+        length += 1
+    letters = rule[:length]
+
+    cont_length = 0
+    while cont_length < len(rule) and not rule[cont_length].isdigit():
+        cont_length += 1
+    cont_letters = rule[:cont_length]
+
+    return (
+        letters,
+        tuple(_match_condition(rule[num:]) for num in range(length + 1)),
+        cont_letters,
+        tuple(
+            _continuation_condition(rule[num:])
+            for num in range(cont_length + 1)
+        ),
+        (None, rules[pos + 1], rules[pos + 2]),
+        '<' in rule,
+        '^^' in rule,
+    )
+
+
+class _RuleIndex(object):
+    """A Phonet rule table, precompiled and indexed by letter pair."""
+
+    def __init__(self, rules):
+        """Initialize _RuleIndex instance.
+
+        Parameters
+        ----------
+        rules : tuple
+            A Phonet rule table
+
+        """
+        self._rules = rules
+        self._compiled = {
+            pos: _compile_rule(rules, pos)
+            for pos in range(0, len(rules), 3)
+            if rules[pos]
+        }
+        self._rule_lists = {}
+        self._continuation_lists = {}
+
+        # Phonet's hashes: the first rule for each leading character, and
+        # the first & last rules for each leading letter & following letter
+        self._first = {}
+        self._pair_first = {}
+        self._pair_last = {}
+        for pos in range(0, len(rules), 3):
+            if not rules[pos]:
+                continue
+            char = rules[pos][0]
+            if (
+                _ALPHA_POS.get(char, 0) != 0
+                and char not in self._first
+                and (rules[pos + 1] or rules[pos + 2])
+            ):
+                self._first[char] = pos
+
+            if _ALPHA_POS.get(char, 0) < 2:
+                continue
+            row = _ALPHA_POS[char] - 2
+            rule = rules[pos][1:]
+            if not rule:
+                rule = ' '
+            elif rule[0] == '(':
+                rule = rule[1:].partition(')')[0]
+            else:
+                rule = rule[0]
+            for following in rule:
+                col = _ALPHA_POS.get(following, 0)
+                if col > 0:
+                    if (row, col) not in self._pair_first:
+                        self._pair_first[row, col] = pos
+                        self._pair_last[row, col] = pos
+                    if self._pair_last[row, col] >= pos - 30:
+                        self._pair_last[row, col] = pos
+                    else:
+                        col = 0
+                if col == 0:
+                    self._pair_first.setdefault((row, 0), pos)
+                    self._pair_last[row, 0] = pos
+
+    def _tried(self, char, following):
+        """Return the positions of the rules Phonet tries for a letter.
+
+        Parameters
+        ----------
+        char : str
+            The letter to code
+        following : str
+            The letter after it, or '' at the end of the word
+
+        Returns
+        -------
+        list
+            The positions of the rules, in the order Phonet tries them
+
+        """
+        rules = self._rules
+        pos = _ALPHA_POS.get(char, 0)
+        if pos >= 2:
+            row = pos - 2
+            col = _ALPHA_POS.get(following, 0)
+            start1 = self._pair_first.get((row, col), -1)
+            start2 = self._pair_first.get((row, 0), -1)
+            end1 = self._pair_last.get((row, col), -1)
+            end2 = self._pair_last.get((row, 0), -1)
+
+            # preserve rule priorities
+            if start2 >= 0 and (start1 < 0 or start2 < start1):
+                start1, start2 = start2, start1
+                end1, end2 = end2, end1
+            if end1 >= start2 >= 0:
+                end1 = max(end1, end2)
+                start2 = end2 = -1
+        else:
+            # umlauts start at their first rule; all else at the first rule
+            start1 = self._first.get(char, -1 if pos else 0)
+            end1 = 10000
+            start2 = end2 = -1
+
+        tried = []
+        pos = start1
+        if pos < 0:
+            return tried
+        while pos < len(rules) and (
+            rules[pos] is None or rules[pos][0] == char
+        ):
+            if pos > end1:
+                if start2 > 0:
+                    pos, end1 = start2, end2
+                    start2 = end2 = -1
+                    continue
+                break
+            if rules[pos] is not None:
+                tried.append(pos)
+            pos += 3
+        return tried
+
+    def rule_list(self, mode, char, following):
+        """Return the rules that may apply to a letter.
+
+        Parameters
+        ----------
+        mode : int
+            The phonet variant (1 or 2)
+        char : str
+            The letter to code
+        following : str
+            The letter after it, or '' at the end of the word
+
+        Returns
+        -------
+        tuple
+            The precompiled rules, in the order to try them
+
+        """
+        key = (mode, char, following)
+        if key not in self._rule_lists:
+            selected = []
+            for pos in self._tried(char, following):
+                rule = self._compiled[pos]
+                letters, conditions = rule[0], rule[1]
+                if rule[4][mode] is None:
+                    continue
+                if letters and following == letters[0]:
+                    selected.append(rule)
+                elif conditions[0] is not None and (
+                    conditions[0][0] is None
+                    or (following.isalpha() and following in conditions[0][0])
+                ):
+                    selected.append(rule)
+            self._rule_lists[key] = tuple(selected)
+        return self._rule_lists[key]
+
+    def continuation_list(self, mode, char, following):
+        """Return the rules that may continue a match ending in a letter.
+
+        Parameters
+        ----------
+        mode : int
+            The phonet variant (1 or 2)
+        char : str
+            The last letter matched
+        following : str
+            The letter after it
+
+        Returns
+        -------
+        tuple
+            The precompiled rules, in the order to try them
+
+        """
+        key = (mode, char, following)
+        if key not in self._continuation_lists:
+            selected = []
+            for pos in self._tried(char, following):
+                rule = self._compiled[pos]
+                letters, conditions = rule[2], rule[3]
+                if rule[4][mode] is None:
+                    continue
+                if (letters and following == letters[0]) or (
+                    conditions[0] is not None
+                    and conditions[0][0] is not None
+                    and following.isalpha()
+                    and following in conditions[0][0]
+                ):
+                    selected.append(rule)
+            self._continuation_lists[key] = tuple(selected)
+        return self._continuation_lists[key]
+
+
+def _phonet_index(lang):
+    """Return the rule index for a language.
+
+    Parameters
+    ----------
+    lang : str
+        ``de`` for German, ``none`` for no language
+
+    Returns
+    -------
+    _RuleIndex
+        The precompiled rule table, indexed by letter pair
+
+    """
+    key = 'none' if lang == 'none' else 'de'
+    if key not in _INDICES:
+        _INDICES[key] = _RuleIndex(
+            Phonet._rules_no_lang if key == 'none' else Phonet._rules_german
+        )
+    return _INDICES[key]
+
+
+def _match(rule, src, i):
+    """Return how a precompiled rule matches at a position, if it does.
+
+    Parameters
+    ----------
+    rule : tuple
+        A precompiled rule
+    src : str
+        The upper-cased word
+    i : int
+        The position of the letter to code
+
+    Returns
+    -------
+    tuple or None
+        The number of letters to replace, the rule's priority, and whether
+        to check for a continuation; None if the rule doesn't match
+
+    """
+    letters = rule[0]
+    num = 0
+    while (
+        num < len(letters)
+        and i + 1 + num < len(src)
+        and src[i + 1 + num] == letters[num]
+    ):
+        num += 1
+    condition = rule[1][num]
+    if condition is None:
+        return None
+    group, no_dash, dashes, priority, anchor = condition
+
+    matches = num + 1
+    if group is not None:
+        char = src[i + matches : i + matches + 1]
+        if not (char.isalpha() and char in group):
+            return None
+        matches += 1
+    matched = matches
+    if dashes:
+        if matches <= dashes:
+            return None
+        matches -= dashes
+
+    if anchor:
+        after_letter = i > 0 and src[i - 1].isalpha()
+        if after_letter != (anchor == '$'):
+            return None
+        if anchor != '^':
+            char = src[i + matched : i + matched + 1]
+            if char.isalpha() or char == '.':
+                return None
+
+    return (
+        matches,
+        priority,
+        no_dash and matches > 1 and i + matches < len(src),
+    )
+
+
+def _continues(rule, src, i, matches, priority):
+    """Return whether a precompiled rule continues a match.
+
+    Parameters
+    ----------
+    rule : tuple
+        A precompiled rule
+    src : str
+        The upper-cased word
+    i : int
+        The position of the letter being coded
+    matches : int
+        The number of letters the first rule matched
+    priority : int
+        The first rule's priority
+
+    Returns
+    -------
+    bool
+        Whether the rule matches beyond the first, with at least its priority
+
+    """
+    letters = rule[2]
+    num = 0
+    matched = matches
+    while num < len(letters) and src[i + matched : i + matched + 1] == (
+        letters[num]
+    ):
+        num += 1
+        matched += 1
+    condition = rule[3][num]
+    if condition is None:
+        return False
+    group, cont_priority, at_end = condition
+
+    if group is not None:
+        char = src[i + matched : i + matched + 1]
+        if not (char.isalpha() and char in group):
+            return False
+        matched += 1
+    if at_end:
+        char = src[i + matched : i + matched + 1]
+        if char.isalpha() or char == '.':
+            return False
+
+    return matched != matches and cont_priority >= priority
+
+
+class IndexedPhonet(Phonet):
+    """Phonet code, with a shared rule index.
+
+    This accepts the same arguments as :py:class:`Phonet` and returns the
+    same codes.
+    """
+
+    def __init__(self, mode=1, lang='de'):
+        """Initialize IndexedPhonet instance.
+
+        Parameters
+        ----------
+        mode : int
+            The ponet variant to employ (1 or 2)
+        lang : str
+            ``de`` (default) for German, ``none`` for no language
+
+        """
+        super(IndexedPhonet, self).__init__(mode, lang)
+        self._index = _phonet_index(lang)
+
+    def encode(self, word):
+        """Return the phonet code for a word.
+
+        Parameters
+        ----------
+        word : str
+            The word to transform
+
+        Returns
+        -------
+        str
+            The phonet value
+
+        """
+        word = unicode_normalize('NFKC', word)
+        mode = self._mode
+        rule_list = self._index.rule_list
+        continuation_list = self._index.continuation_list
+
+        src = word.translate(self._upper_trans)
+        dest = []
+        i = 0
+        zeta = 0
+        while i < len(src):
+            char = src[i]
+            zeta0 = 0
+
+            for rule in rule_list(mode, char, src[i + 1 : i + 2]):
+                match = _match(rule, src, i)
+                if match is None:
+                    continue
+                matches, priority, check_continuation = match
+                if check_continuation and any(
+                    _continues(cont, src, i, matches, priority)
+                    for cont in continuation_list(
+                        mode, src[i + matches - 1], src[i + matches]
+                    )
+                ):
+                    continue
+
+                replacement = rule[4][mode]
+                if rule[5] and zeta == 0:
+                    # rule with '<' is applied
+                    if (
+                        dest
+                        and replacement
+                        and dest[-1] in {char, replacement[0]}
+                    ):
+                        dest.pop()
+                    zeta0 = 1
+                    zeta += 1
+                    matches0 = 0
+                    while replacement and src[i + matches0]:
+                        src = (
+                            src[: i + matches0]
+                            + replacement[0]
+                            + src[i + matches0 + 1 :]
+                        )
+                        matches0 += 1
+                        replacement = replacement[1:]
+                    if matches0 < matches:
+                        src = src[: i + matches0] + src[i + matches :]
+                    char = src[i]
+                else:
+                    i += matches - 1
+                    zeta = 0
+                    for letter in replacement[:-1]:
+                        if not dest or dest[-1] != letter:
+                            dest.append(letter)
+                    # new "current char"
+                    char = replacement[-1:]
+                    if rule[6]:
+                        if char:
+                            dest.append(char)
+                        src = src[i + 1 :]
+                        i = 0
+                        zeta0 = 1
+                break
+
+            if zeta0 == 0:
+                # delete multiple letters only
+                if char and (not dest or dest[-1] != char):
+                    dest.append(char)
+                i += 1
+                zeta = 0
+
+        return ''.join(dest)
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    settings = {
+        'phonet_1': {},
+        'phonet_2': {'mode': 2},
+        'phonet_1_none': {'lang': 'none'},
+        'phonet_2_none': {'mode': 2, 'lang': 'none'},
+    }
+
+    names = load_names()
+    sample = names[::step]
+
+    start = time()
+    _phonet_index('de')
+    _phonet_index('none')
+    report('compile rule tables', '{:0.3f} s'.format(time() - start))
+
+    mismatches = 0
+    for algo, kwargs in settings.items():
+        pe = Phonet(**kwargs)
+        start = time()
+        for name in sample:
+            pe.encode(name)
+        baseline = len(sample) / (time() - start)
+        report(algo, '{:0.1f} names/s'.format(baseline))
+
+        indexed_pe = IndexedPhonet(**kwargs)
+        start = time()
+        codes = [indexed_pe.encode(name) for name in names]
+        rate = len(names) / (time() - start)
+        report(
+            algo + ' indexed',
+            '{:0.1f} names/s ({:0.1f}x)'.format(rate, rate / baseline),
+        )
+
+        for name, val, code in zip(names, load_csv_corpus(algo), codes):
+            if val != code:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} mismatch for: {}: {} != {}\n'.format(
+                        algo, name, code, val
+                    )
+                )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
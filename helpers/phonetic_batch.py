@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""phonetic_batch.py.
+
+This module contains a batch encoding API for the phonetic algorithms.
+:py:meth:`encode_many` takes an iterable of words and yields their codes,
+looking up the encoder's configuration once rather than once per word.
+Soundex, Refined Soundex, Fuzzy Soundex, and Phonex have specialized batch
+paths: ASCII words skip Unicode normalization, are filtered and coded by
+:py:meth:`str.translate` with shared tables, and have their repeated codes
+collapsed in a single pass that stops once the code is full; other words fall
+back to :py:meth:`encode`. Any other encoder can be given the generic batch
+API with :py:func:`batch_encoder`.
+
+Run as a script, it checks the batch output of every algorithm in
+`reg_test_phonetic.algorithms` against the stored `<algorithm>.csv` corpora
+and compares throughput with calling :py:meth:`encode` on each name. Names
+whose stored code differs from the installed version of Abydos's own output
+are counted separately, since they reflect changes to the algorithm rather
+than to the batch API. The algorithms with specialized batch paths are
+checked on every name; an optional argument sets the stride through the
+names for the others and for the baselines (default 10).
+"""
+
+import os
+import sys
+from time import time
+
+from abydos.phonetic import FuzzySoundex, Phonex, RefinedSoundex, SPFC, Soundex
+
+from _common import (
+    CORPORA,
+    load_csv_corpus,
+    load_names,
+    load_reg_test,
+    report,
+)
+
+_UC = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# uppercases ASCII letters and deletes all other ASCII characters
+_ALPHA_TRANS = str.maketrans(
+    _UC.lower() + _UC,
+    _UC + _UC,
+    ''.join(chr(_) for _ in range(128) if not chr(_).isalpha()),
+)
+
+# Phonex digits of the letters after the first, with the letters whose codes
+# depend on the following letter listed separately
+_PHONEX_CODES = dict(zip('BFPVCGJKQSXZMN', '11112222222255'))
+_PHONEX_CONTEXT = {'D', 'T', 'L', 'R'}
+_PHONEX_FIRST = dict(zip('EIOUYPVKQJZ', 'AAAAABFCCGS'))
+
+
+class BatchEncoderMixin(object):
+    """A mixin providing the generic batch encoding API.
+
+    Combined with a phonetic algorithm class, it adds :py:meth:`encode_many`
+    and :py:meth:`encode_alpha_many`, which yield the same values as calling
+    :py:meth:`encode` and :py:meth:`encode_alpha` on each word.
+    """
+
+    def encode_many(self, words):
+        """Yield the codes for many words.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to transform
+
+        Yields
+        ------
+        str
+            The code for each word, in order
+
+        """
+        encode = self.encode
+        for word in words:
+            yield encode(word)
+
+    def encode_alpha_many(self, words):
+        """Yield the alphabetic codes for many words.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to transform
+
+        Yields
+        ------
+        str
+            The alphabetic code for each word, in order
+
+        """
+        encode_alpha = self.encode_alpha
+        for word in words:
+            yield encode_alpha(word)
+
+
+class BatchSoundex(BatchEncoderMixin, Soundex):
+    """Soundex, with a specialized batch path.
+
+    The Census variant, whose codes depend on name prefixes, uses the
+    generic batch path.
+    """
+
+    def encode_many(self, words):
+        """Yield the Soundex codes for many words.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to transform
+
+        Yields
+        ------
+        str
+            The Soundex code for each word, in order
+
+        """
+        if self._var == 'Census':
+            yield from super(BatchSoundex, self).encode_many(words)
+            return
+
+        encode = self.encode
+        trans = self._trans
+        max_length = self._max_length
+        reverse = self._reverse
+        pad = '0' * max_length if self._zero_pad else ''
+        empty = pad or '0'
+        nine = '0' if self._var == 'special' else ''
+
+        for word in words:
+            if not word.isascii():
+                yield encode(word)
+                continue
+
+            word = word.upper()
+            if not word.isalpha():
+                word = word.translate(_ALPHA_TRANS)
+                if not word:
+                    yield empty
+                    continue
+            if reverse:
+                word = word[::-1]
+
+            codes = word.translate(trans).replace('9', nine)
+            sdx = word[0]
+            if sdx in 'HW':
+                last = ''
+            else:
+                last = codes[0]
+                codes = codes[1:]
+            for code in codes:
+                if code != last:
+                    last = code
+                    if code != '0':
+                        sdx += code
+                        if len(sdx) == max_length:
+                            break
+            yield (sdx + pad)[:max_length]
+
+
+class BatchRefinedSoundex(BatchEncoderMixin, RefinedSoundex):
+    """Refined Soundex, with a specialized batch path."""
+
+    def encode_many(self, words):
+        """Yield the Refined Soundex codes for many words.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to transform
+
+        Yields
+        ------
+        str
+            The Refined Soundex code for each word, in order
+
+        """
+        encode = self.encode
+        trans = self._trans
+        max_length = self._max_length
+        pad = '0' * max_length if self._zero_pad else ''
+        vowel = '0' if self._retain_vowels else ''
+
+        for word in words:
+            if not word.isascii():
+                yield encode(word)
+                continue
+
+            word = word.upper()
+            if not word.isalpha():
+                word = word.translate(_ALPHA_TRANS)
+
+            sdx = word[:1]
+            last = ''
+            for code in word[1:].translate(trans):
+                if code != last:
+                    last = code
+                    sdx += code if code != '0' else vowel
+                    if len(sdx) == max_length:
+                        break
+            if max_length > 0:
+                sdx = (sdx + pad)[:max_length]
+            yield sdx
+
+
+class BatchFuzzySoundex(BatchEncoderMixin, FuzzySoundex):
+    """Fuzzy Soundex, with a specialized batch path.
+
+    Each of Fuzzy Soundex's substitutions is applied only when its pattern
+    occurs in the word.
+    """
+
+    _prefixes = {
+        'CS': 'SS',
+        'CZ': 'SS',
+        'TS': 'SS',
+        'TZ': 'SS',
+        'GN': 'NN',
+        'HR': 'RR',
+        'WR': 'RR',
+        'HW': 'WW',
+        'KN': 'NN',
+        'NG': 'NN',
+    }
+    # substitutions starting with C, which produce none of the other
+    # substitutions' patterns, are only tried for words containing C
+    _c_substitutions = (
+        ('CA', 'KA'),
+        ('CC', 'KK'),
+        ('CK', 'KK'),
+        ('CE', 'SE'),
+        ('CHL', 'KL'),
+        ('CL', 'KL'),
+        ('CHR', 'KR'),
+        ('CR', 'KR'),
+        ('CI', 'SI'),
+        ('CO', 'KO'),
+        ('CU', 'KU'),
+        ('CY', 'SY'),
+    )
+    _substitutions = (
+        ('DG', 'GG'),
+        ('GH', 'HH'),
+        ('MAC', 'MK'),
+        ('MC', 'MK'),
+        ('NST', 'NSS'),
+        ('PF', 'FF'),
+        ('PH', 'FF'),
+        ('SCH', 'SSS'),
+        ('TIO', 'SIO'),
+        ('TIA', 'SIO'),
+        ('TCH', 'CHH'),
+    )
+
+    def encode_many(self, words):
+        """Yield the Fuzzy Soundex codes for many words.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to transform
+
+        Yields
+        ------
+        str
+            The Fuzzy Soundex code for each word, in order
+
+        """
+        encode = self.encode
+        trans = self._trans
+        max_length = self._max_length
+        pad = '0' * max_length if self._zero_pad else ''
+        empty = pad or '0'
+        prefixes = self._prefixes
+        c_substitutions = self._c_substitutions
+        substitutions = self._substitutions
+
+        for word in words:
+            if not word.isascii():
+                yield encode(word)
+                continue
+
+            word = word.upper()
+            if not word:
+                yield empty
+                continue
+
+            if word[:2] in prefixes:
+                word = prefixes[word[:2]] + word[2:]
+            if word[-2:] == 'CH':
+                word = word[:-2] + 'KK'
+            elif word[-2:] == 'NT':
+                word = word[:-2] + 'TT'
+            elif word[-2:] == 'RT':
+                word = word[:-2] + 'RR'
+            elif word[-3:] == 'RDT':
+                word = word[:-3] + 'RR'
+            if 'C' in word:
+                for src, tar in c_substitutions:
+                    if src in word:
+                        word = word.replace(src, tar)
+            for src, tar in substitutions:
+                if src in word:
+                    word = word.replace(src, tar)
+
+            codes = word.translate(trans).replace('-', '')
+            # the first letter is kept uncoded, but a leading 0 is still
+            # stripped with the 0 codes
+            sdx = word[0].replace('0', '')
+            if sdx in {'H', 'W', 'Y'}:
+                last = ''
+            else:
+                last = codes[:1]
+                codes = codes[1:]
+            for code in codes:
+                if code != last:
+                    last = code
+                    if code != '0':
+                        sdx += code
+                        if len(sdx) == max_length:
+                            break
+            yield (sdx + pad)[:max_length]
+
+
+class BatchPhonex(BatchEncoderMixin, Phonex):
+    """Phonex, with a specialized batch path.
+
+    Letters whose codes do not depend on the following letter are coded by a
+    single lookup, and the Ds & Gs that Phonex rewrites as a preceding M or N
+    are skipped, since they repeat its code.
+    """
+
+    def encode_many(self, words):
+        """Yield the Phonex codes for many words.
+
+        Parameters
+        ----------
+        words : iterable
+            The words to transform
+
+        Yields
+        ------
+        str
+            The Phonex code for each word, in order
+
+        """
+        encode = self.encode
+        max_length = self._max_length
+        pad = '0' * max_length if self._zero_pad else ''
+        vowels = self._uc_vy_set
+        first_codes = _PHONEX_FIRST
+        codes = _PHONEX_CODES
+        context = _PHONEX_CONTEXT
+
+        for word in words:
+            if not word.isascii():
+                yield encode(word)
+                continue
+
+            name = word.upper().rstrip('S')
+            if name[:2] == 'KN':
+                name = 'N' + name[2:]
+            elif name[:2] == 'PH':
+                name = 'F' + name[2:]
+            elif name[:2] == 'WR':
+                name = 'R' + name[2:]
+            if name[:1] == 'H':
+                name = name[1:]
+            if not name:
+                yield pad[:max_length] or '0'
+                continue
+
+            name_code = last = first_codes.get(name[0], name[0])
+            after_mn = False
+            for pos in range(1, len(name)):
+                char = name[pos]
+                if after_mn and char in 'DG':
+                    continue
+                after_mn = char in 'MN'
+                if char in codes:
+                    code = codes[char]
+                elif char in context:
+                    following = name[pos + 1 : pos + 2]
+                    if char in 'DT':
+                        code = '3' if following != 'C' else '0'
+                    elif following in vowels or not following:
+                        code = '4' if char == 'L' else '6'
+                    else:
+                        code = '0'
+                else:
+                    code = '0'
+                if code != last and code != '0':
+                    name_code += code
+                    last = code
+                    if len(name_code) == max_length:
+                        break
+            yield (name_code + pad)[:max_length]
+
+
+_BATCH_CLASSES = {
+    Soundex: BatchSoundex,
+    RefinedSoundex: BatchRefinedSoundex,
+    FuzzySoundex: BatchFuzzySoundex,
+    Phonex: BatchPhonex,
+}
+
+
+def batch_encoder(encoder):
+    """Return an encoder with the batch encoding API.
+
+    Encoders with a specialized batch path get it; any other encoder gets
+    the generic path of :py:class:`BatchEncoderMixin`. The returned encoder
+    shares the configuration of the one passed in.
+
+    Parameters
+    ----------
+    encoder : _Phonetic
+        A phonetic algorithm instance
+
+    Returns
+    -------
+    BatchEncoderMixin
+        The encoder, as an instance of a batch encoding subclass
+
+    """
+    if isinstance(encoder, BatchEncoderMixin):
+        return encoder
+
+    cls = type(encoder)
+    batch_cls = _BATCH_CLASSES.get(cls)
+    if batch_cls is None:
+        batch_cls = _BATCH_CLASSES[cls] = type(
+            'Batch' + cls.__name__, (BatchEncoderMixin, cls), {}
+        )
+    batch = batch_cls.__new__(batch_cls)
+    batch.__dict__.update(vars(encoder))
+    return batch
+
+
+def encode_many(encoder, words):
+    """Yield the codes for many words.
+
+    Parameters
+    ----------
+    encoder : _Phonetic
+        A phonetic algorithm instance
+    words : iterable
+        The words to transform
+
+    Yields
+    ------
+    str
+        The code for each word, in order
+
+    """
+    return batch_encoder(encoder).encode_many(words)
+
+
+def _as_stored(code):
+    """Return a code as it is written in a corpus.
+
+    Encoders that return several codes give a tuple, or a set for Daitch-
+    Mokotoff Soundex, which are stored comma-separated.
+
+    Parameters
+    ----------
+    code : str, int, tuple, or set
+        The code returned by an encoder
+
+    Returns
+    -------
+    str
+        The code, as stored
+
+    """
+    if isinstance(code, set):
+        return ','.join(sorted(code))
+    if isinstance(code, tuple):
+        return ','.join(code)
+    return str(code)
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    algorithms = load_reg_test('reg_test_phonetic').algorithms
+
+    # reg_test_phonetic wraps SPFC, which codes a first and last name, to give
+    # each name as both
+    wrapped = {'spfc': (SPFC(), 'encode', '{0} {0}'.format)}
+
+    names = load_names()
+    sample = names[::step]
+
+    mismatches = 0
+    for algo, encode in algorithms.items():
+        if not os.path.isfile(os.path.join(CORPORA, algo + '.csv')):
+            report(algo, 'no corpus')
+            continue
+
+        if algo in wrapped:
+            encoder, method, wrap = wrapped[algo]
+        else:
+            encoder, method, wrap = encode.__self__, encode.__name__, None
+        encode = getattr(encoder, method)
+
+        batch = batch_encoder(encoder)
+        specialized = type(batch).encode_many is not (
+            BatchEncoderMixin.encode_many
+        )
+        checked = names if specialized and method == 'encode' else sample
+        stored = load_csv_corpus(algo)
+        if checked is sample:
+            stored = stored[::step]
+        if wrap is not None:
+            checked = [wrap(name) for name in checked]
+
+        timed = checked if len(checked) < len(names) else checked[::step]
+        start = time()
+        for word in timed:
+            encode(word)
+        baseline = len(timed) / (time() - start)
+
+        start = time()
+        codes = list(getattr(batch, method + '_many')(checked))
+        rate = len(checked) / (time() - start)
+        report(
+            algo,
+            '{:0.1f} names/s ({:0.1f}x)'.format(rate, rate / baseline),
+        )
+
+        changed = 0
+        for word, val, code in zip(checked, stored, codes):
+            code = _as_stored(code)
+            if code == val:
+                continue
+            if code == _as_stored(encode(word)):
+                changed += 1
+                continue
+            mismatches += 1
+            sys.stdout.write(
+                '{} mismatch for: {}: {} != {}\n'.format(algo, word, code, val)
+            )
+        if changed:
+            report(algo + ' changed in Abydos', str(changed))
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
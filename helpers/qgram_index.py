@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""qgram_index.py.
+
+This module contains an inverted q-gram index of strings for the
+threshold-based q-gram measures: Jaccard, Dice, Cosine, & Overlap similarity
+and q-gram similarity (1 - :py:meth:`QGram.dist`). Each of these is a
+function of the size of the intersection of two strings' q-gram multisets
+and the multisets' sizes, so a lower bound on the similarity is a lower bound
+on the number of q-grams a candidate must share with the query (the count
+filter). Strings with no q-grams in common score 0, and a candidate cannot
+share more q-grams than it has, so a positive threshold also limits the
+sizes of the candidates' multisets (the length filter).
+
+The index numbers its strings in order of multiset size and keeps, for each
+q-gram and occurrence of it within a string, the ascending list of the
+strings that contain it. A query counts its shared q-grams by merging the
+lists of its own q-grams, restricted to the numbers of the strings whose
+size passes the length filter, and only the candidates that pass the count
+filter are scored with the exact abydos measure.
+
+Run as a script, it checks each measure against its stored corpus, indexes
+every name, and compares the results and latency of threshold queries for
+misspelled names with a brute-force scan of all the names. An optional
+argument sets the stride through the names for the query strings (default
+30000).
+"""
+
+import sys
+from bisect import bisect_left
+from collections import Counter
+from math import ceil, sqrt
+from time import time
+
+from abydos.distance import Cosine, Dice, Jaccard, Overlap, QGram
+
+from _common import load_dist_corpus, load_names, report, to_float32
+
+# Lower bounds on the intersection size of multisets of sizes a & b whose
+# similarity is at least t, keyed by measure class. q-gram similarity is
+# |A & B| / |A | B|, which is Jaccard similarity.
+_BOUNDS = {
+    Jaccard: lambda t, a, b: t * (a + b) / (1 + t),
+    Dice: lambda t, a, b: t * (a + b) / 2,
+    Cosine: lambda t, a, b: t * sqrt(a * b),
+    Overlap: lambda t, a, b: t * min(a, b),
+    QGram: lambda t, a, b: t * (a + b) / (1 + t),
+}
+
+# slack for rounding error in the bounds
+_EPSILON = 1e-9
+
+
+def min_overlap(measure):
+    """Return a measure's lower bound on the q-grams similar strings share.
+
+    Parameters
+    ----------
+    measure : _TokenDistance
+        A Jaccard, Dice, Cosine, Overlap, or QGram instance with crisp
+        intersections
+
+    Returns
+    -------
+    function
+        A function of a threshold t and the q-gram multiset sizes a & b of
+        two strings, returning the fewest q-grams they must share for their
+        similarity to be at least t
+
+    Raises
+    ------
+    ValueError
+        Unsupported measure or intersection type
+
+    """
+    for cls in type(measure).__mro__:
+        if cls in _BOUNDS:
+            break
+    else:
+        raise ValueError(
+            'Unsupported measure: {}'.format(type(measure).__name__)
+        )
+    if measure.params['intersection_type'] != 'crisp':
+        raise ValueError(
+            'Unsupported intersection type: {}'.format(
+                measure.params['intersection_type']
+            )
+        )
+    bound = _BOUNDS[cls]
+    return lambda t, a, b: ceil(bound(t, a, b) - _EPSILON)
+
+
+class QGramIndex(object):
+    """An inverted q-gram index of strings for a q-gram similarity measure.
+
+    Query results are the same as those of a scan over every string.
+    """
+
+    def __init__(self, words=(), measure=None):
+        """Initialize QGramIndex instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to index
+        measure : _TokenDistance
+            A Jaccard, Dice, Cosine, Overlap, or QGram instance with crisp
+            intersections, defaulting to Jaccard similarity; its tokenizer
+            is used to index the strings
+
+        Raises
+        ------
+        ValueError
+            Unsupported measure or intersection type
+
+        """
+        if measure is None:
+            measure = Jaccard()
+        self._bound = min_overlap(measure)
+        self._measure = measure
+        self._sim = measure.sim if not isinstance(measure, QGram) else None
+        self._tokenizer = measure.params['tokenizer']
+        self.comparisons = 0
+
+        tokens = {}
+        for word in words:
+            if word not in tokens:
+                tokens[word] = self._tokenize(word)
+        self._words = sorted(
+            tokens, key=lambda word: (sum(tokens[word].values()), word)
+        )
+        self._sizes = [sum(tokens[word].values()) for word in self._words]
+        # _starts[size] is the number of the first string at least that size
+        self._starts = [
+            bisect_left(self._sizes, size)
+            for size in range((self._sizes[-1] if self._sizes else 0) + 2)
+        ]
+
+        # postings of the nth occurrence of each q-gram
+        self._postings = {}
+        for num, word in enumerate(self._words):
+            for gram, count in tokens[word].items():
+                for occurrence in range(count):
+                    self._postings.setdefault((gram, occurrence), []).append(
+                        num
+                    )
+
+    def __len__(self):
+        """Return the number of strings in the index.
+
+        Returns
+        -------
+        int
+            The number of distinct strings indexed
+
+        """
+        return len(self._words)
+
+    def _tokenize(self, word):
+        """Return the q-gram multiset of a string.
+
+        Parameters
+        ----------
+        word : str
+            The string to tokenize
+
+        Returns
+        -------
+        Counter
+            The string's q-grams & their counts
+
+        """
+        return Counter(self._tokenizer.tokenize(word).get_counter())
+
+    def _similarity(self, src, tar):
+        """Return the measure's similarity of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            The similarity
+
+        """
+        if self._sim is None:
+            return 1.0 - self._measure.dist(src, tar)
+        return self._sim(src, tar)
+
+    def candidates(self, word, threshold):
+        """Return the indexed strings that pass the length & count filters.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        threshold : float
+            The minimum similarity
+
+        Returns
+        -------
+        list
+            The candidate strings, in index order
+
+        """
+        if not self._words:
+            return []
+        tokens = self._tokenize(word)
+        size = sum(tokens.values())
+        max_size = len(self._starts) - 2
+        if threshold <= 0 or not size:
+            return list(self._words)
+
+        # the fewest q-grams shared with a string of each size, or None
+        # where no string of that size can reach the threshold
+        need = [None] * (max_size + 1)
+        for other in range(1, max_size + 1):
+            shared = max(1, self._bound(threshold, size, other))
+            if shared <= min(size, other):
+                need[other] = shared
+        sizes = [other for other in range(max_size + 1) if need[other]]
+        if not sizes:
+            return []
+        low = self._starts[sizes[0]]
+        high = self._starts[sizes[-1] + 1]
+
+        shared = Counter()
+        for gram, count in tokens.items():
+            for occurrence in range(count):
+                posting = self._postings.get((gram, occurrence))
+                if posting is not None:
+                    shared.update(
+                        posting[
+                            bisect_left(posting, low) : bisect_left(
+                                posting, high
+                            )
+                        ]
+                    )
+
+        found = []
+        for num, count in shared.items():
+            other_need = need[self._sizes[num]]
+            if other_need is not None and count >= other_need:
+                found.append(num)
+        found.sort()
+        return [self._words[num] for num in found]
+
+    def query(self, word, threshold):
+        """Return the indexed strings at least a similarity to a string.
+
+        Parameters
+        ----------
+        word : str
+            The query string
+        threshold : float
+            The minimum similarity
+
+        Returns
+        -------
+        list
+            (similarity, string) tuples, in descending order of similarity
+            and ascending order of string
+
+        """
+        found = []
+        candidates = self.candidates(word, threshold)
+        for candidate in candidates:
+            sim = self._similarity(word, candidate)
+            if sim >= threshold:
+                found.append((sim, candidate))
+        self.comparisons += len(candidates)
+        found.sort(key=lambda entry: (-entry[0], entry[1]))
+        return found
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 30000
+
+    thresholds = (0.5, 0.7, 0.9)
+
+    names = load_names()
+    mismatches = 0
+
+    for label, measure in (
+        ('jaccard_sim', Jaccard()),
+        ('dice_sim', Dice()),
+        ('cosine_sim', Cosine()),
+        ('overlap_sim', Overlap()),
+        ('qgram_dist', QGram()),
+    ):
+        start = time()
+        index = QGramIndex(names, measure)
+        report(
+            '{} index of {}'.format(label, len(index)),
+            '{:0.3f} s'.format(time() - start),
+        )
+
+        start = time()
+        for src, tar, val in zip(names, names[1:], load_dist_corpus(label)):
+            if label == 'qgram_dist':
+                calc = to_float32(1.0 - index._similarity(src, tar))
+            else:
+                calc = to_float32(index._similarity(src, tar))
+            if calc != val:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} mismatch for: {} & {}: {} != {}\n'.format(
+                        label, src, tar, calc, val
+                    )
+                )
+        report('checked {}'.format(label), '{:0.1f} s'.format(time() - start))
+
+        # each query is a name with its middle letter deleted
+        queries = [
+            name[: len(name) // 2] + name[len(name) // 2 + 1 :]
+            for name in names[step // 2 :: step]
+        ]
+        scan_time = 0.0
+        index_times = dict.fromkeys(thresholds, 0.0)
+        index_comparisons = dict.fromkeys(thresholds, 0)
+        found = dict.fromkeys(thresholds, 0)
+        for query in queries:
+            start = time()
+            scanned = sorted(
+                ((index._similarity(query, name), name) for name in names),
+                key=lambda entry: (-entry[0], entry[1]),
+            )
+            scan_time += time() - start
+
+            for threshold in thresholds:
+                expected = [
+                    entry for entry in scanned if entry[0] >= threshold
+                ]
+                found[threshold] += len(expected)
+                index.comparisons = 0
+                start = time()
+                result = index.query(query, threshold)
+                index_times[threshold] += time() - start
+                index_comparisons[threshold] += index.comparisons
+
+                if result != expected:
+                    mismatches += 1
+                    sys.stdout.write(
+                        '{} {} mismatch for: {}: {} != {}\n'.format(
+                            label, threshold, query, result, expected
+                        )
+                    )
+
+        report(
+            '{} scan'.format(label),
+            '{:0.1f} ms/query'.format(scan_time / len(queries) * 1000),
+        )
+        for threshold, index_time in index_times.items():
+            report(
+                '{} >= {}'.format(label, threshold),
+                '{:0.1f} ms/query ({:0.0f}x, {:0.2%})'.format(
+                    index_time / len(queries) * 1000,
+                    scan_time / index_time,
+                    index_comparisons[threshold] / len(queries) / len(index),
+                ),
+            )
+            report(
+                '{} >= {} found'.format(label, threshold),
+                '{:0.1f}/query'.format(found[threshold] / len(queries)),
+            )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
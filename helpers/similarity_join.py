@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""similarity_join.py.
+
+This module contains a threshold similarity self-join over the q-gram
+multisets of strings, for the measures of :py:mod:`qgram_index`, such as
+Jaccard & Cosine similarity. It follows the PPJoin algorithm of
+:cite:`Xiao:2011`: each multiset becomes the set of its q-grams numbered by
+occurrence, with the tokens of every string ordered by their global
+frequency, rarest first, and the strings are joined in order of size. Two
+strings sharing at least o tokens must share a token among the first n - o +
+1 of each one's n tokens (the prefix filter), so only the prefixes are
+indexed and probed; candidates must also be long enough (the length filter)
+and, given the positions of their last shared prefix tokens, still able to
+share enough of the tokens after them (the positional filter). Each string's
+probe is a handful of NumPy operations on the postings of its prefix tokens,
+and its candidates' tokens are counted together, so that only those that
+share enough tokens are verified with the exact abydos measure. Strings with
+no tokens, such as those shorter than q when the tokenizer adds no start or
+stop symbols, are compared with each other directly, since e.g. q-gram
+similarity scores two of them 1.0.
+
+Run as a script, it checks the join against a scan of every pair on a
+subset of the names, then times joins of every name in `regtest_names.csv`
+and of synthetic corpora of up to four times as many names, made by
+applying a random edit to each copy of each name. An optional argument sets
+the stride through the names for the subset (default 150).
+"""
+
+import sys
+from collections import Counter
+from itertools import combinations
+from random import Random
+from time import time
+
+from abydos.distance import Cosine, Jaccard
+
+import numpy as np
+
+from _common import load_names, report
+from qgram_index import min_overlap
+
+
+class SimilarityJoin(object):
+    """A threshold similarity join of strings by their q-grams.
+
+    Strings are numbered in order of the sizes of their q-gram multisets.
+    """
+
+    def __init__(self, words=(), measure=None):
+        """Initialize SimilarityJoin instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to join
+        measure : _TokenDistance
+            A Jaccard, Dice, Cosine, Overlap, or QGram instance with crisp
+            intersections, defaulting to Jaccard similarity; its tokenizer
+            is used to tokenize the strings
+
+        Raises
+        ------
+        ValueError
+            Unsupported measure or intersection type
+
+        """
+        if measure is None:
+            measure = Jaccard()
+        self._bound = min_overlap(measure)
+        self._sim = measure.sim
+        tokenizer = measure.params['tokenizer']
+        self.candidates = 0
+        self.comparisons = 0
+
+        tokens = {}
+        for word in words:
+            if word not in tokens:
+                tokens[word] = [
+                    (gram, occurrence)
+                    for gram, count in tokenizer.tokenize(word)
+                    .get_counter()
+                    .items()
+                    for occurrence in range(count)
+                ]
+        self._words = sorted(tokens, key=lambda word: len(tokens[word]))
+
+        # number the tokens from rarest to commonest
+        frequencies = Counter(
+            token for record in tokens.values() for token in record
+        )
+        ranks = {
+            token: rank
+            for rank, (_, token) in enumerate(
+                sorted((count, token) for token, count in frequencies.items())
+            )
+        }
+        self._token_count = len(ranks)
+        self._records = [
+            sorted(ranks[token] for token in tokens[word])
+            for word in self._words
+        ]
+        self._sizes = np.array(
+            [len(record) for record in self._records], dtype=np.int64
+        )
+        # each string's tokens, padded with -1
+        self._matrix = np.full(
+            (len(self._records), max(self._sizes, default=0)),
+            -1,
+            dtype=np.int32,
+        )
+        for num, record in enumerate(self._records):
+            self._matrix[num, : len(record)] = record
+
+    def __len__(self):
+        """Return the number of strings.
+
+        Returns
+        -------
+        int
+            The number of distinct strings
+
+        """
+        return len(self._words)
+
+    def _need(self, threshold):
+        """Return the fewest tokens strings must share to be similar.
+
+        Parameters
+        ----------
+        threshold : float
+            The minimum similarity
+
+        Returns
+        -------
+        numpy.ndarray
+            The fewest tokens shared by strings of sizes a & b, where b <= a,
+            at [a, b], or 0 where no strings of those sizes can be similar
+
+        """
+        max_size = int(self._sizes[-1]) if len(self._sizes) else 0
+        need = np.zeros((max_size + 1, max_size + 1), dtype=np.int64)
+        for size in range(1, max_size + 1):
+            for other in range(1, size + 1):
+                shared = max(1, self._bound(threshold, size, other))
+                if shared <= other:
+                    need[size, other] = shared
+        return need
+
+    def _postings(self, threshold):
+        """Return the index of each string's prefix.
+
+        A string's indexed prefix is the prefix that a string at least as
+        large would have to share a token with.
+
+        Parameters
+        ----------
+        threshold : float
+            The minimum similarity
+
+        Returns
+        -------
+        tuple
+            The numbers of the strings whose prefix contains each token &
+            the token's positions in them, grouped by token and in ascending
+            order of string number, and the start of each token's group
+
+        """
+        tokens = []
+        owners = []
+        positions = []
+        for num, record in enumerate(self._records):
+            size = len(record)
+            if not size:
+                continue
+            indexed = size - max(1, self._bound(threshold, size, size)) + 1
+            for pos, token in enumerate(record[: max(0, indexed)]):
+                tokens.append(token)
+                owners.append(num)
+                positions.append(pos)
+        tokens = np.array(tokens, dtype=np.int64)
+        owners = np.array(owners, dtype=np.int64)
+        positions = np.array(positions, dtype=np.int64)
+        order = np.lexsort((owners, tokens))
+        starts = np.searchsorted(
+            tokens[order], np.arange(self._token_count + 1)
+        )
+        return owners[order], positions[order], starts
+
+    def join(self, threshold):
+        """Return the pairs of strings at least a similarity to each other.
+
+        Parameters
+        ----------
+        threshold : float
+            The minimum similarity, which must be positive
+
+        Returns
+        -------
+        list
+            (src, tar, similarity) tuples, where src < tar, in ascending
+            order
+
+        Raises
+        ------
+        ValueError
+            The threshold is not positive
+
+        """
+        if threshold <= 0:
+            raise ValueError('The threshold must be positive')
+        if not self._words:
+            return []
+
+        words = self._words
+        sizes = self._sizes
+        matrix = self._matrix
+        sim = self._sim
+        need = self._need(threshold)
+        # the shortest string that can be similar to one of each size
+        shortest = [
+            next((other for other in range(1, size + 1) if row[other]), None)
+            for size, row in enumerate(need.tolist())
+        ]
+        # the first string of each size
+        size_starts = np.searchsorted(sizes, np.arange(len(need) + 1)).tolist()
+        owners, positions, starts = self._postings(threshold)
+        starts = starts.tolist()
+        # marks the tokens of the string being probed; the last entry is
+        # that of the padding
+        member = np.zeros(self._token_count + 1, dtype=bool)
+
+        found = []
+        # strings with no tokens share none with any string, so the filters
+        # can not find them; they are compared with each other directly
+        for src, tar in combinations(sorted(words[: size_starts[1]]), 2):
+            self.candidates += 1
+            self.comparisons += 1
+            value = sim(src, tar)
+            if value >= threshold:
+                found.append((src, tar, value))
+
+        for num, record in enumerate(self._records):
+            size = len(record)
+            if not size or shortest[size] is None:
+                continue
+
+            # only strings indexed already, no shorter than the shortest
+            # that could be similar, are candidates
+            low = size_starts[shortest[size]]
+            others = []
+            other_positions = []
+            probe_positions = []
+            for pos, token in enumerate(
+                record[: size - need[size, shortest[size]] + 1]
+            ):
+                start = starts[token]
+                end = starts[token + 1]
+                if start == end:
+                    continue
+                posting = owners[start:end]
+                first = start + np.searchsorted(posting, low)
+                last = start + np.searchsorted(posting, num)
+                if first < last:
+                    others.append(owners[first:last])
+                    other_positions.append(positions[first:last])
+                    probe_positions.append(np.full(last - first, pos))
+            if not others:
+                continue
+
+            others = np.concatenate(others)
+            other_positions = np.concatenate(other_positions)
+            probe_positions = np.concatenate(probe_positions)
+            order = np.lexsort((probe_positions, others))
+            others = others[order]
+            # the last shared prefix token with each candidate
+            ends = np.flatnonzero(others[1:] != others[:-1])
+            ends = np.concatenate((ends, [len(others) - 1]))
+            counts = np.diff(ends, prepend=-1)
+            others = others[ends]
+            other_sizes = sizes[others]
+            needed = need[size, other_sizes]
+
+            # the positional filter: the tokens shared so far and the most
+            # that could follow them
+            keep = (
+                counts
+                + np.minimum(
+                    size - probe_positions[order][ends] - 1,
+                    other_sizes - other_positions[order][ends] - 1,
+                )
+                >= needed
+            )
+            others = others[keep]
+            self.candidates += len(others)
+            if not len(others):
+                continue
+
+            member[record] = True
+            shared = member[matrix[others]].sum(axis=1)
+            member[record] = False
+            word = words[num]
+            for other in others[shared >= needed[keep]]:
+                self.comparisons += 1
+                src, tar = sorted((word, words[other]))
+                value = sim(src, tar)
+                if value >= threshold:
+                    found.append((src, tar, value))
+
+        found.sort()
+        return found
+
+
+def _synthetic_names(names, scale, seed=0):
+    """Return the names, with a randomly edited copy of each per scale.
+
+    Parameters
+    ----------
+    names : list
+        The names
+    scale : int
+        The number of times to copy the names
+    seed : int
+        The random seed
+
+    Returns
+    -------
+    list
+        The names followed by scale - 1 edited copies of them; each copy has
+        a letter deleted, substituted, inserted, or transposed
+
+    """
+    rand = Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    corpus = list(names)
+    for _ in range(scale - 1):
+        for name in names:
+            pos = rand.randrange(len(name))
+            edit = rand.randrange(4)
+            if edit == 0 and len(name) > 1:
+                name = name[:pos] + name[pos + 1 :]
+            elif edit == 1:
+                name = name[:pos] + rand.choice(letters) + name[pos + 1 :]
+            elif edit == 2:
+                name = name[:pos] + rand.choice(letters) + name[pos:]
+            elif len(name) > 1:
+                pos = min(pos, len(name) - 2)
+                name = name[:pos] + name[pos + 1] + name[pos] + name[pos + 2 :]
+            corpus.append(name)
+    return corpus
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+
+    thresholds = (0.3, 0.5, 0.8)
+    scales = (1, 2, 4)
+
+    names = load_names()
+    mismatches = 0
+
+    subset = names[::step]
+    for label, measure in (('jaccard', Jaccard()), ('cosine', Cosine())):
+        start = time()
+        scanned = [
+            (src, tar, measure.sim(src, tar))
+            for src, tar in combinations(sorted(subset), 2)
+        ]
+        scan_time = time() - start
+        report(
+            '{} scan of {} pairs'.format(label, len(scanned)),
+            '{:0.1f} s'.format(scan_time),
+        )
+
+        joiner = SimilarityJoin(subset, measure)
+        for threshold in thresholds:
+            expected = [entry for entry in scanned if entry[2] >= threshold]
+            start = time()
+            result = joiner.join(threshold)
+            join_time = time() - start
+            report(
+                '{} subset join >= {}'.format(label, threshold),
+                '{:0.3f} s ({:0.0f}x, {} pairs)'.format(
+                    join_time, scan_time / join_time, len(result)
+                ),
+            )
+            if result != expected:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} {} mismatch: {} pairs != {}\n'.format(
+                        label, threshold, len(result), len(expected)
+                    )
+                )
+
+        # the cost of a scan of every pair of all the names
+        pair_time = scan_time / len(scanned)
+        all_pairs = len(names) * (len(names) - 1) // 2
+        report(
+            '{} scan of all names (est.)'.format(label),
+            '{:0.1f} days'.format(pair_time * all_pairs / 86400),
+        )
+
+        for scale in scales:
+            corpus = _synthetic_names(names, scale)
+            start = time()
+            joiner = SimilarityJoin(corpus, measure)
+            report(
+                '{} x{} tokenized ({})'.format(label, scale, len(joiner)),
+                '{:0.1f} s'.format(time() - start),
+            )
+            start = time()
+            result = joiner.join(thresholds[-1])
+            report(
+                '{} x{} join >= {}'.format(label, scale, thresholds[-1]),
+                '{:0.1f} s, {} pairs'.format(time() - start, len(result)),
+            )
+            report(
+                '{} x{} candidates/verified'.format(label, scale),
+                '{}/{}'.format(joiner.candidates, joiner.comparisons),
+            )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""sorted_neighbourhood.py.
+
+This module contains a sorted-neighbourhood pair generator. Strings are
+sorted by a key, such as a fingerprint (e.g. the Skeleton or Omission Key)
+or phonetic code, or by themselves, and each is paired with the strings that
+follow it within a window of w strings, so that n strings give fewer than
+(w - 1) * n pairs rather than n * (n - 1) / 2. Pairs are generated lazily,
+and can be streamed in batches through the batch distance API, so that a
+run of any size holds only one batch of pairs and values at a time.
+
+The distance corpora are a sorted-neighbourhood run with a window of 2 over
+`regtest_names.csv`, which is in sorted order: each name is compared with the
+next. Run as a script, it checks that the names sorted by themselves with a
+window of 2 give the pairs of the stored `jarowinkler_sim` corpus and its
+values, then compares pair generation & comparison rates and the number of
+pairs with a Jaro-Winkler similarity of at least 0.9 for several keys and
+window sizes. An optional argument sets the stride through the names for
+the comparison (default 8).
+"""
+
+import sys
+from itertools import islice
+from time import time
+
+from abydos.distance import JaroWinkler
+from abydos.fingerprint import OmissionKey, SkeletonKey
+from abydos.phonetic import Soundex
+
+import numpy as np
+
+from _common import load_dist_corpus, load_names, report
+from blocking_index import encode_keys
+from distance_batch import calc_many
+
+
+class SortedNeighbourhood(object):
+    """Sorted-neighbourhood pairs of strings.
+
+    Strings are sorted by their keys; strings with equal keys keep the order
+    in which they were given.
+    """
+
+    def __init__(self, words=(), key=None):
+        """Initialize SortedNeighbourhood instance.
+
+        Parameters
+        ----------
+        words : iterable
+            The strings to pair
+        key : _Phonetic, _Fingerprint, or function
+            A phonetic algorithm or fingerprint instance, or a function
+            returning a string's sort key; if None, strings are sorted by
+            themselves
+
+        """
+        words = list(words)
+        keys = words if key is None else encode_keys(key, words)
+        order = sorted(range(len(words)), key=keys.__getitem__)
+        self._words = [words[num] for num in order]
+        self.comparisons = 0
+
+    def __len__(self):
+        """Return the number of strings.
+
+        Returns
+        -------
+        int
+            The number of strings
+
+        """
+        return len(self._words)
+
+    def sorted_words(self):
+        """Return the strings in sorted order.
+
+        Returns
+        -------
+        list
+            The strings, sorted by their keys
+
+        """
+        return list(self._words)
+
+    def pair_count(self, window=2):
+        """Return the number of pairs within a window.
+
+        Parameters
+        ----------
+        window : int
+            The number of consecutive strings in each window
+
+        Returns
+        -------
+        int
+            The number of pairs
+
+        """
+        size = len(self._words)
+        span = max(0, min(window - 1, size - 1))
+        return span * size - span * (span + 1) // 2
+
+    def pairs(self, window=2):
+        """Yield the pairs of strings within a window of each other.
+
+        Parameters
+        ----------
+        window : int
+            The number of consecutive strings in each window
+
+        Yields
+        ------
+        tuple
+            (src, tar) pairs, where src precedes tar in sorted order
+
+        """
+        words = self._words
+        for pos, src in enumerate(words):
+            for tar in words[pos + 1 : pos + window]:
+                yield src, tar
+
+    def batches(self, window=2, size=4096):
+        """Yield the pairs of strings within a window, in batches.
+
+        Parameters
+        ----------
+        window : int
+            The number of consecutive strings in each window
+        size : int
+            The number of pairs in each batch
+
+        Yields
+        ------
+        list
+            Up to size (src, tar) pairs
+
+        """
+        pairs = self.pairs(window)
+        batch = list(islice(pairs, size))
+        while batch:
+            yield batch
+            batch = list(islice(pairs, size))
+
+    def score(self, method, window=2, size=4096):
+        """Yield the values of a measure for the pairs within a window.
+
+        Parameters
+        ----------
+        method : method
+            A bound method of a distance measure, e.g. Levenshtein().dist
+        window : int
+            The number of consecutive strings in each window
+        size : int
+            The number of pairs given to the batch API at a time
+
+        Yields
+        ------
+        tuple
+            (pairs, values) for each batch, where values is a NumPy array
+            of the measure's value for each pair
+
+        """
+        for batch in self.batches(window, size):
+            values = calc_many(method, batch)
+            self.comparisons += len(batch)
+            yield batch, values
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+
+    windows = (2, 4, 8, 16)
+    threshold = 0.9
+
+    names = load_names()
+    mismatches = 0
+    method = JaroWinkler().sim
+
+    # the stored corpora are a window of 2 over the sorted names
+    start = time()
+    neighbourhood = SortedNeighbourhood(names)
+    stored = np.array(load_dist_corpus('jarowinkler_sim'), dtype=np.float32)
+    pos = 0
+    for batch, values in neighbourhood.score(method):
+        for (src, tar), val, calc in zip(
+            batch, stored[pos : pos + len(batch)], values.astype(np.float32)
+        ):
+            if (src, tar) != (names[pos], names[pos + 1]) or calc != val:
+                mismatches += 1
+                sys.stdout.write(
+                    'jarowinkler_sim mismatch for: {} & {}: {} != {}\n'.format(
+                        src, tar, calc, val
+                    )
+                )
+            pos += 1
+    if pos != len(stored):
+        mismatches += 1
+        sys.stdout.write(
+            'jarowinkler_sim has {} pairs != {}\n'.format(pos, len(stored))
+        )
+    report('checked jarowinkler_sim', '{:0.1f} s'.format(time() - start))
+
+    sample = names[::step]
+    for label, key in (
+        ('name', None),
+        ('skeleton key', SkeletonKey()),
+        ('omission key', OmissionKey()),
+        ('soundex', Soundex()),
+    ):
+        start = time()
+        neighbourhood = SortedNeighbourhood(sample, key)
+        report(
+            '{} sort of {}'.format(label, len(neighbourhood)),
+            '{:0.3f} s'.format(time() - start),
+        )
+
+        for window in windows:
+            start = time()
+            count = sum(1 for _ in neighbourhood.pairs(window))
+            generate_time = time() - start
+            if count != neighbourhood.pair_count(window):
+                mismatches += 1
+                sys.stdout.write(
+                    '{} window {} generated {} pairs != {}\n'.format(
+                        label, window, count, neighbourhood.pair_count(window)
+                    )
+                )
+
+            matches = 0
+            neighbourhood.comparisons = 0
+            start = time()
+            for _, values in neighbourhood.score(method, window):
+                matches += int((values >= threshold).sum())
+            score_time = time() - start
+
+            report(
+                '{} w={} pairs'.format(label, window),
+                '{} ({:0.0f}/s generated)'.format(
+                    count, count / generate_time
+                ),
+            )
+            report(
+                '{} w={} compared'.format(label, window),
+                '{:0.0f}/s, {} >= {}'.format(
+                    neighbourhood.comparisons / score_time,
+                    matches,
+                    threshold,
+                ),
+            )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
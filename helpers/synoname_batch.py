@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""synoname_batch.py.
+
+This module contains a Synoname measure with cached toolcodes and a cheaper
+test cascade. :py:class:`Synoname` computes both names' toolcodes on every
+comparison, computes the Ratcliff-Obershelp ratio needed only by its final
+test before running any test, and checks for single omissions, substitutions
+& transpositions with weighted Levenshtein distances. Here toolcodes are
+computed once per name (or supplied in advance) and kept parsed, the ratio is
+computed only if the cascade reaches the test that needs it, and the single
+edit tests are direct string comparisons. All-pairs comparison of a name list
+thus computes each toolcode once, rather than once per pair.
+
+Run as a script, it checks every name against the stored `synoname_toolcode`
+corpus & every name pair against the `synoname_dist*` corpora, and compares
+throughput with :py:class:`Synoname`, with toolcodes computed on demand and
+with toolcodes taken from the corpus. An optional argument sets the stride
+through the names for the baseline (default 10).
+"""
+
+import sys
+from time import time
+
+from abydos.distance import Levenshtein, RatcliffObershelp, Synoname
+
+from _common import (
+    load_csv_corpus,
+    load_dist_corpus,
+    load_names,
+    report,
+    to_float32,
+)
+
+_PUNCT_TRANS = str.maketrans('', '', ',-./:;"&\'()!{|}?$%*+<=>[\\]^_`~')
+_MASTER_INTROS = ('of the ', 'of ', 'known as the ', 'with the ', 'with ')
+
+
+def _one_omission(src, tar):
+    """Return True if one string is the other with a single character removed.
+
+    This is the same test as a Levenshtein distance of 1 with insertions and
+    deletions costing 1 and substitutions and transpositions costing 99.
+    """
+    if len(src) < len(tar):
+        src, tar = tar, src
+    if len(src) - len(tar) != 1:
+        return False
+    pos = 0
+    while pos < len(tar) and src[pos] == tar[pos]:
+        pos += 1
+    return src[pos + 1 :] == tar[pos:]
+
+
+def _one_substitution(src, tar):
+    """Return True if two strings differ in exactly one position.
+
+    This is the same test as a Levenshtein distance of 1 with substitutions
+    costing 1 and all other edits costing 99.
+    """
+    if len(src) != len(tar):
+        return False
+    return sum(1 for s, t in zip(src, tar) if s != t) == 1
+
+
+def _one_transposition(src, tar):
+    """Return True if two strings differ by one adjacent transposition.
+
+    This is the same test as an optimal string alignment distance of 1 with
+    transpositions costing 1 and all other edits costing 99.
+    """
+    if len(src) != len(tar):
+        return False
+    diffs = [pos for pos, (s, t) in enumerate(zip(src, tar)) if s != t]
+    return (
+        len(diffs) == 2
+        and diffs[1] == diffs[0] + 1
+        and src[diffs[0]] == tar[diffs[1]]
+        and src[diffs[1]] == tar[diffs[0]]
+    )
+
+
+def _strip_master(full_name):
+    """Return a full name without a leading 'master' & its connective."""
+    if full_name.startswith('master '):
+        full_name = full_name[len('master ') :]
+        for intro in _MASTER_INTROS:
+            if full_name.startswith(intro):
+                full_name = full_name[len(intro) :]
+    return full_name
+
+
+class CachedSynoname(Synoname):
+    """Synoname, with cached toolcodes and a cheap-first test cascade.
+
+    Values are identical to those of :py:class:`Synoname`.
+    """
+
+    _insertions = Levenshtein(cost=(1, 99, 99, 99))
+    _ratcliff_obershelp = RatcliffObershelp()
+
+    def __init__(self, cache_size=2 ** 18, **kwargs):
+        """Initialize CachedSynoname instance.
+
+        Parameters
+        ----------
+        cache_size : int
+            The maximum number of names whose toolcodes are kept; the cache
+            is emptied when it fills
+        **kwargs
+            Arbitrary keyword arguments, as for :py:class:`Synoname`
+
+        """
+        super(CachedSynoname, self).__init__(**kwargs)
+        self._cache_size = cache_size
+        self._toolcodes = {}
+        self.toolcodes_computed = 0
+
+    def _synoname_strip_punct(self, word):
+        """Return a word with punctuation stripped out.
+
+        Parameters
+        ----------
+        word : str
+            A word to strip punctuation from
+
+        Returns
+        -------
+        str
+            The word stripped of punctuation
+
+        """
+        return word.translate(_PUNCT_TRANS).strip()
+
+    def add_toolcodes(self, toolcodes):
+        """Add precomputed toolcodes to the cache.
+
+        Parameters
+        ----------
+        toolcodes : dict
+            A mapping from (last name, first name, qualifier) to the
+            (last name, first name, toolcode) result of
+            :py:meth:`SynonameToolcode.fingerprint` for that name, with the
+            name parts stripped & lowercased
+
+        """
+        for name, toolcode in toolcodes.items():
+            self._toolcodes[name] = (
+                toolcode,
+                self._parse_toolcode(*toolcode),
+            )
+
+    @staticmethod
+    def _parse_toolcode(ln, fn, toolcode):
+        """Return a toolcode split into the fields used by the tests."""
+        specials = toolcode.split('$')[1]
+        return (
+            ln,
+            fn,
+            int(toolcode[2]),
+            int(toolcode[3:6]),
+            int(toolcode[6:8]),
+            [
+                (int(specials[pos : pos + 3]), specials[pos + 3 : pos + 4])
+                for pos in range(0, len(specials), 4)
+            ],
+        )
+
+    def toolcode(self, name):
+        """Return the Synoname toolcode of a name, from the cache if possible.
+
+        Parameters
+        ----------
+        name : str or tuple
+            A name, as accepted by :py:meth:`Synoname.dist_abs`
+
+        Returns
+        -------
+        tuple
+            The last name, first name & toolcode, as returned by
+            :py:meth:`SynonameToolcode.fingerprint`
+
+        """
+        return self._cached_toolcode(name)[0]
+
+    def _cached_toolcode(self, name):
+        """Return the toolcode of a name & its parsed fields.
+
+        Parameters
+        ----------
+        name : str or tuple
+            A name, as accepted by :py:meth:`Synoname.dist_abs`
+
+        Returns
+        -------
+        tuple
+            The toolcode, and the last name & first name after toolcode
+            processing, the generation, roman numeral code, first name
+            length, and specials
+
+        """
+        if isinstance(name, tuple):
+            ln, fn, qual = name
+        elif '#' in name:
+            ln, fn, qual = name.split('#')[-3:]
+        else:
+            ln, fn, qual = name, '', ''
+        key = (ln.strip().lower(), fn.strip().lower(), qual.strip().lower())
+
+        cached = self._toolcodes.get(key)
+        if cached is None:
+            toolcode = self._stc.fingerprint(*key)
+            cached = (toolcode, self._parse_toolcode(*toolcode))
+            self.toolcodes_computed += 1
+            if len(self._toolcodes) >= self._cache_size:
+                self._toolcodes.clear()
+            self._toolcodes[key] = cached
+        return cached
+
+    def dist_abs(self, src, tar, force_numeric=False):
+        """Return the Synoname similarity type of two words.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+        force_numeric : bool
+            Overrides the instance's ret_name setting
+
+        Returns
+        -------
+        int (or str if ret_name is True)
+            Synoname value
+
+        """
+        match_type = self._match_type(src, tar)
+        if self._ret_name and not force_numeric:
+            return self._match_name[match_type]
+        return match_type
+
+    def _match_type(self, src, tar):
+        """Return the number of the first Synoname test two names pass.
+
+        The tests are those of :py:meth:`Synoname.dist_abs`, in the same
+        order, but the character approximation ratio is computed only if the
+        last test is reached.
+        """
+        (
+            src_ln,
+            src_fn,
+            src_generation,
+            src_romancode,
+            src_len_fn,
+            src_specials,
+        ) = self._cached_toolcode(src)[1]
+        (
+            tar_ln,
+            tar_fn,
+            tar_generation,
+            tar_romancode,
+            tar_len_fn,
+            tar_specials,
+        ) = self._cached_toolcode(tar)[1]
+
+        tests = self._tests
+        test_dict = self._test_dict
+        match_type_dict = self._match_type_dict
+
+        gen_conflict = (src_generation != tar_generation) and bool(
+            src_generation or tar_generation
+        )
+        roman_conflict = (src_romancode != tar_romancode) and bool(
+            src_romancode or tar_romancode
+        )
+
+        ln_equal = src_ln == tar_ln
+        fn_equal = src_fn == tar_fn
+
+        if tests & test_dict['exact'] and fn_equal and ln_equal:
+            return match_type_dict['exact']
+        if tests & test_dict['omission']:
+            if fn_equal and _one_omission(src_ln, tar_ln):
+                if not roman_conflict:
+                    return match_type_dict['omission']
+            elif ln_equal and _one_omission(src_fn, tar_fn):
+                return match_type_dict['omission']
+        if tests & test_dict['substitution']:
+            if fn_equal and _one_substitution(src_ln, tar_ln):
+                return match_type_dict['substitution']
+            elif ln_equal and _one_substitution(src_fn, tar_fn):
+                return match_type_dict['substitution']
+        if tests & test_dict['transposition']:
+            if fn_equal and _one_transposition(src_ln, tar_ln):
+                return match_type_dict['transposition']
+            elif ln_equal and _one_transposition(src_fn, tar_fn):
+                return match_type_dict['transposition']
+        if tests & test_dict['punctuation']:
+            strip_punct = self._synoname_strip_punct
+            if strip_punct(src_fn) == strip_punct(tar_fn) and strip_punct(
+                src_ln
+            ) == strip_punct(tar_ln):
+                return match_type_dict['punctuation']
+            if strip_punct(src_fn.replace('-', ' ')) == strip_punct(
+                tar_fn.replace('-', ' ')
+            ) and strip_punct(src_ln.replace('-', ' ')) == strip_punct(
+                tar_ln.replace('-', ' ')
+            ):
+                return match_type_dict['punctuation']
+
+        if tests & test_dict['initials'] and ln_equal:
+            if src_fn and tar_fn:
+                src_initials = self._synoname_strip_punct(src_fn).split()
+                tar_initials = self._synoname_strip_punct(tar_fn).split()
+                initials = bool(
+                    (len(src_initials) == len(''.join(src_initials)))
+                    or (len(tar_initials) == len(''.join(tar_initials)))
+                )
+                if initials:
+                    src_initials = ''.join(_[0] for _ in src_initials)
+                    tar_initials = ''.join(_[0] for _ in tar_initials)
+                    if src_initials == tar_initials:
+                        return match_type_dict['initials']
+                    initial_diff = abs(len(src_initials) - len(tar_initials))
+                    if initial_diff and (
+                        initial_diff
+                        == self._insertions.dist_abs(
+                            src_initials, tar_initials
+                        )
+                        or initial_diff
+                        == self._insertions.dist_abs(
+                            tar_initials, src_initials
+                        )
+                    ):
+                        return match_type_dict['initials']
+        if tests & test_dict['extension']:
+            if src_ln[1:2] == tar_ln[1:2] and (
+                src_ln.startswith(tar_ln) or tar_ln.startswith(src_ln)
+            ):
+                if (
+                    (not src_len_fn and not tar_len_fn)
+                    or (tar_fn and src_fn.startswith(tar_fn))
+                    or (src_fn and tar_fn.startswith(src_fn))
+                ) and not roman_conflict:
+                    return match_type_dict['extension']
+        if tests & test_dict['inclusion'] and ln_equal:
+            if (src_fn and src_fn in tar_fn) or (tar_fn and tar_fn in src_ln):
+                return match_type_dict['inclusion']
+        if tests & test_dict['no_first'] and ln_equal:
+            if src_fn == '' or tar_fn == '':
+                return match_type_dict['no_first']
+        if tests & test_dict['word_approx']:
+            ratio = self._synoname_word_approximation(
+                src_ln,
+                tar_ln,
+                src_fn,
+                tar_fn,
+                {
+                    'gen_conflict': gen_conflict,
+                    'roman_conflict': roman_conflict,
+                    'src_specials': src_specials,
+                    'tar_specials': tar_specials,
+                },
+            )
+            if ratio == 1 and tests & test_dict['confusions']:
+                if (
+                    ' '.join((src_fn, src_ln)).strip()
+                    == ' '.join((tar_fn, tar_ln)).strip()
+                ):
+                    return match_type_dict['confusions']
+            if ratio >= self._word_approx_min:
+                return match_type_dict['word_approx']
+        if tests & test_dict['char_approx']:
+            if gen_conflict or roman_conflict:
+                ca_ratio = 0
+            else:
+                ca_ratio = self._ratcliff_obershelp.sim(
+                    _strip_master(' '.join((src_ln, src_fn))),
+                    _strip_master(' '.join((tar_ln, tar_fn))),
+                )
+            if ca_ratio >= self._char_approx_min:
+                return match_type_dict['char_approx']
+        return match_type_dict['no_match']
+
+    def dist_abs_many(self, pairs, force_numeric=False):
+        """Return the Synoname similarity types of many pairs of names.
+
+        Parameters
+        ----------
+        pairs : iterable
+            (src, tar) pairs of names
+        force_numeric : bool
+            Overrides the instance's ret_name setting
+
+        Returns
+        -------
+        list
+            The Synoname value of each pair, in order
+
+        """
+        return [self.dist_abs(src, tar, force_numeric) for src, tar in pairs]
+
+    def dist_many(self, pairs):
+        """Return the normalized Synoname distances of many pairs of names.
+
+        Parameters
+        ----------
+        pairs : iterable
+            (src, tar) pairs of names
+
+        Returns
+        -------
+        list
+            The normalized Synoname distance of each pair, in order
+
+        """
+        return [self._match_type(src, tar) / 14 for src, tar in pairs]
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(len(names) - 1)]
+    sample = pairs[::step]
+
+    cmp = CachedSynoname()
+    stored_toolcodes = load_csv_corpus('synoname_toolcode')
+    mismatches = 0
+    start = time()
+    for name, val in zip(names, stored_toolcodes):
+        code = ','.join(cmp.toolcode(name))
+        if code != val:
+            mismatches += 1
+            sys.stdout.write(
+                'synoname_toolcode mismatch for: {}: {} != {}\n'.format(
+                    name, code, val
+                )
+            )
+    report('synoname_toolcode', '{:0.3f} s'.format(time() - start))
+    precomputed = {
+        (name.strip().lower(), '', ''): tuple(val.split(','))
+        for name, val in zip(names, stored_toolcodes)
+    }
+
+    for method in ('dist_abs', 'dist'):
+        algo = 'synoname_' + method
+
+        base_cmp = getattr(Synoname(), method)
+        start = time()
+        for src, tar in sample:
+            base_cmp(src, tar)
+        baseline = len(sample) / (time() - start)
+        report(algo, '{:0.1f} pairs/s'.format(baseline))
+
+        for label in ('batched', 'precomputed'):
+            batch_cmp = CachedSynoname()
+            if label == 'precomputed':
+                batch_cmp.add_toolcodes(precomputed)
+            start = time()
+            calcs = getattr(batch_cmp, method + '_many')(pairs)
+            rate = len(pairs) / (time() - start)
+            report(
+                '{} {}'.format(algo, label),
+                '{:0.1f} pairs/s ({:0.1f}x)'.format(rate, rate / baseline),
+            )
+
+            for (src, tar), val, calc in zip(
+                pairs, load_dist_corpus(algo), calcs
+            ):
+                if to_float32(calc) != val:
+                    mismatches += 1
+                    sys.stdout.write(
+                        '{} mismatch for: {} & {}: {} != {}\n'.format(
+                            algo, src, tar, calc, val
+                        )
+                    )
+
+    # all pairs of a block of names, as in deduplicating a name list
+    block = names[::500]
+    base_cmp = Synoname()
+    block_cmp = CachedSynoname()
+    start = time()
+    calcs = block_cmp.dist_abs_many(
+        (src, tar) for src in block for tar in block
+    )
+    report(
+        'all pairs of {} names'.format(len(block)),
+        '{:0.3f} s'.format(time() - start),
+    )
+    report('toolcodes computed', str(block_cmp.toolcodes_computed))
+    for pos, calc in enumerate(calcs[: len(calcs) : 97]):
+        src, tar = divmod(pos * 97, len(block))
+        val = base_cmp.dist_abs(block[src], block[tar])
+        if calc != val:
+            mismatches += 1
+            sys.stdout.write(
+                'synoname_dist_abs mismatch for: {} & {}: {} != {}\n'.format(
+                    block[src], block[tar], calc, val
+                )
+            )
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
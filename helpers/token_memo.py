@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# BSD 2-Clause License
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""token_memo.py.
+
+This module contains a shared, bounded memoization layer for the inner
+metrics of hybrid measures. :py:class:`MongeElkan`, :py:class:`MetaLevenshtein`
+and :py:class:`SoftTFIDF` call a string measure on every pair of tokens of
+every comparison, though the same token pairs recur constantly across a
+corpus of names. Wrapping that measure in :py:class:`MemoizedMetric` keeps its
+values in a least-recently-used cache, keyed by the token pair, the method
+called, and the measure's configuration, that is shared by every wrapper in
+the process.
+
+Run as a script, it checks every name pair against the stored
+`mongeelkan_sim`, `metalevenshtein_dist*` & `softtfidf_sim` corpora, compares
+throughput with the unwrapped measures, and reports the cache counters. An
+optional argument sets the stride through the names for the baseline
+(default 20).
+"""
+
+import sys
+from collections import OrderedDict
+from inspect import Parameter, signature
+from time import time
+from types import BuiltinFunctionType, FunctionType, MethodType
+
+from abydos.distance import (
+    JaroWinkler,
+    Levenshtein,
+    MetaLevenshtein,
+    MongeElkan,
+    SoftTFIDF,
+)
+from abydos.distance._distance import _Distance
+from abydos.tokenizer._tokenizer import _Tokenizer
+
+from _common import load_dist_corpus, load_names, report, to_float32
+
+
+# constructor parameters stored under other attribute names
+_ATTRIBUTES = {
+    'taper': '_taper_enabled',
+    'ssk_lambda': '_lambda',
+}
+
+
+def _constructor_args(obj):
+    """Return the values of an object's constructor parameters.
+
+    Each parameter is read from the object's `params` dict, the attribute
+    named in `_ATTRIBUTES`, or the attribute of the same name, with or
+    without a leading underscore.
+
+    Parameters
+    ----------
+    obj : object
+        A distance measure or tokenizer instance
+
+    Returns
+    -------
+    dict or None
+        The value of each parameter, or None if any can't be found
+
+    """
+    params = getattr(obj, 'params', None)
+    args = dict(params) if isinstance(params, dict) else {}
+    attrs = vars(obj)
+    for param in list(signature(type(obj).__init__).parameters.values())[1:]:
+        name = param.name
+        if name in args or param.kind in {
+            Parameter.VAR_POSITIONAL,
+            Parameter.VAR_KEYWORD,
+        }:
+            continue
+        for attr in (_ATTRIBUTES.get(name), '_' + name, name):
+            if attr in attrs:
+                args[name] = attrs[attr]
+                break
+        else:
+            return None
+    return args
+
+
+def _config_value(val):
+    """Return a hashable description of a constructor argument.
+
+    Parameters
+    ----------
+    val : object
+        The argument
+
+    Returns
+    -------
+    object
+        A description of the argument
+
+    """
+    if isinstance(val, (list, tuple)):
+        # QGrams turns qval & skip into tuples on first use
+        if len(val) == 1:
+            return _config_value(val[0])
+        return tuple(_config_value(item) for item in val)
+    if isinstance(val, (set, frozenset)):
+        return frozenset(_config_value(item) for item in val)
+    if isinstance(val, dict):
+        return frozenset(
+            (_config_value(key), _config_value(item))
+            for key, item in val.items()
+        )
+    if isinstance(val, (_Distance, _Tokenizer)):
+        return config_key(val)
+    if isinstance(val, MethodType):
+        # e.g. MongeElkan's sim_func, a method of another measure
+        return 'method', val.__name__, _config_value(val.__self__)
+    if isinstance(val, (FunctionType, BuiltinFunctionType)):
+        if '<' not in val.__qualname__:
+            return 'function', val.__module__, val.__qualname__
+    # anything else, e.g. a lambda or a corpus, is its own description
+    return val
+
+
+def config_key(obj):
+    """Return a hashable description of a measure's or tokenizer's settings.
+
+    The description is the object's class and the values of its constructor
+    parameters. Measures & tokenizers among them are described the same way,
+    their methods by name & instance, and named functions by qualified name,
+    so equal configurations share a key. If a parameter can't be found, the
+    object itself stands in for its settings.
+
+    Parameters
+    ----------
+    obj : object
+        A distance measure or tokenizer instance
+
+    Returns
+    -------
+    tuple
+        The class, followed by (parameter, description) pairs
+
+    """
+    cls = type(obj)
+    args = _constructor_args(obj)
+    if args is None:
+        return (cls.__module__, cls.__qualname__), obj
+    return ((cls.__module__, cls.__qualname__),) + tuple(
+        sorted((name, _config_value(val)) for name, val in args.items())
+    )
+
+
+class MemoCache(object):
+    """A bounded, least-recently-used cache with hit & eviction counters."""
+
+    def __init__(self, maxsize=2 ** 21):
+        """Initialize MemoCache instance.
+
+        Parameters
+        ----------
+        maxsize : int
+            The maximum number of entries held
+
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._values = OrderedDict()
+
+    def __len__(self):
+        """Return the number of entries held."""
+        return len(self._values)
+
+    def __contains__(self, key):
+        """Return True if a key is cached."""
+        return key in self._values
+
+    @property
+    def hit_rate(self):
+        """Return the fraction of lookups that were hits."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key):
+        """Return the cached value of a key, or None.
+
+        Parameters
+        ----------
+        key : tuple
+            The key to look up
+
+        Returns
+        -------
+        object
+            The value, or None if the key is not cached
+
+        """
+        val = self._values.get(key)
+        if val is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._values.move_to_end(key)
+        return val
+
+    def put(self, key, val):
+        """Cache the value of a key.
+
+        Parameters
+        ----------
+        key : tuple
+            The key
+        val : object
+            Its value, which must not be None
+
+        """
+        self._values[key] = val
+        self._values.move_to_end(key)
+        if len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+            self.evictions += 1
+
+    def items(self):
+        """Return the cached (key, value) items, oldest first."""
+        return list(self._values.items())
+
+    def clear(self):
+        """Empty the cache and reset its counters."""
+        self._values.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+# the cache shared by every MemoizedMetric
+SHARED_MEMO = MemoCache()
+
+
+class MemoizedMetric(_Distance):
+    """A string measure whose values are memoized in a shared cache.
+
+    It can stand in for the measure wherever a hybrid measure takes one, e.g.
+    ``MongeElkan(sim_func=MemoizedMetric(Levenshtein()))``.
+    """
+
+    def __init__(self, metric, memo=None, **kwargs):
+        """Initialize MemoizedMetric instance.
+
+        Parameters
+        ----------
+        metric : _Distance
+            The measure to memoize, whose settings must not change after
+            wrapping
+        memo : MemoCache
+            The cache to use, by default the shared cache
+        **kwargs
+            Arbitrary keyword arguments
+
+        """
+        super(MemoizedMetric, self).__init__(**kwargs)
+        self._metric = metric
+        self._memo = SHARED_MEMO if memo is None else memo
+        self._config = config_key(metric)
+
+    def _memoized(self, method, src, tar):
+        """Return a method's value for two strings, from the cache if possible.
+
+        Parameters
+        ----------
+        method : str
+            The name of the measure's method
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            The method's value
+
+        """
+        key = (src, tar, method, self._config)
+        val = self._memo.get(key)
+        if val is None:
+            val = getattr(self._metric, method)(src, tar)
+            self._memo.put(key, val)
+        return val
+
+    def sim(self, src, tar):
+        """Return the memoized similarity of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            The measure's similarity
+
+        """
+        return self._memoized('sim', src, tar)
+
+    def dist(self, src, tar):
+        """Return the memoized normalized distance of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            The measure's normalized distance
+
+        """
+        return self._memoized('dist', src, tar)
+
+    def dist_abs(self, src, tar):
+        """Return the memoized absolute distance of two strings.
+
+        Parameters
+        ----------
+        src : str
+            Source string for comparison
+        tar : str
+            Target string for comparison
+
+        Returns
+        -------
+        float
+            The measure's absolute distance
+
+        """
+        return self._memoized('dist_abs', src, tar)
+
+
+def _run_script():
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    measures = {
+        'mongeelkan_sim': (
+            MongeElkan().sim,
+            MongeElkan(sim_func=MemoizedMetric(Levenshtein())).sim,
+        ),
+        'metalevenshtein_dist_abs': (
+            MetaLevenshtein().dist_abs,
+            MetaLevenshtein(metric=MemoizedMetric(JaroWinkler())).dist_abs,
+        ),
+        'metalevenshtein_dist': (
+            MetaLevenshtein().dist,
+            MetaLevenshtein(metric=MemoizedMetric(JaroWinkler())).dist,
+        ),
+        'softtfidf_sim': (
+            SoftTFIDF().sim,
+            SoftTFIDF(metric=MemoizedMetric(JaroWinkler())).sim,
+        ),
+    }
+
+    names = load_names()
+    pairs = [(names[i], names[i + 1]) for i in range(len(names) - 1)]
+    sample = pairs[::step]
+
+    mismatches = 0
+    for algo, (cmp, memo_cmp) in measures.items():
+        start = time()
+        for src, tar in sample:
+            cmp(src, tar)
+        baseline = len(sample) / (time() - start)
+        report(algo, '{:0.1f} pairs/s'.format(baseline))
+
+        hits, misses = SHARED_MEMO.hits, SHARED_MEMO.misses
+        start = time()
+        calcs = [memo_cmp(src, tar) for src, tar in pairs]
+        rate = len(pairs) / (time() - start)
+        report(
+            algo + ' memoized',
+            '{:0.1f} pairs/s ({:0.1f}x)'.format(rate, rate / baseline),
+        )
+        hits, misses = SHARED_MEMO.hits - hits, SHARED_MEMO.misses - misses
+        report(algo + ' hit rate', '{:0.2%}'.format(hits / (hits + misses)))
+
+        for (src, tar), val, calc in zip(pairs, load_dist_corpus(algo), calcs):
+            if to_float32(calc) != val:
+                mismatches += 1
+                sys.stdout.write(
+                    '{} mismatch for: {} & {}: {} != {}\n'.format(
+                        algo, src, tar, calc, val
+                    )
+                )
+
+    report('entries cached', str(len(SHARED_MEMO)))
+    report('evictions', str(SHARED_MEMO.evictions))
+    report('overall hit rate', '{:0.2%}'.format(SHARED_MEMO.hit_rate))
+
+    if mismatches:
+        sys.stdout.write('{} mismatches\n'.format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _run_script()
@@ -20,8 +20,10 @@ This module contains regression tests for abydos.distance
 """
 
 import bz2
-import struct
+import os
+import sys
 import unittest
+from array import array
 
 from abydos.distance import (
     ALINE,
@@ -294,6 +296,22 @@ from abydos.tokenizer import QGrams
 from . import ORIGINALS, _corpus_file, _one_in
 
 
+def _load_calc_many():
+    """Return the helpers' batch calc_many, or None if it can't be loaded."""
+    helpers = os.path.join(os.path.dirname(__file__), 'helpers')
+    sys.path.insert(0, helpers)
+    try:
+        from distance_batch import calc_many
+    except ImportError:
+        return None
+    finally:
+        sys.path.remove(helpers)
+    return calc_many
+
+
+calc_many = _load_calc_many()
+
+
 algorithms = {
     'aline_sim_score': ALINE().sim_score,
     'aline_sim': ALINE().sim,
@@ -647,27 +665,39 @@ class RegTestDistance(unittest.TestCase):
 
     def _do_test(self, algo_name):
         with bz2.open(_corpus_file(algo_name + '.dat.bz2'), 'rb') as file:
-            algo = algorithms[algo_name]
-            data = file.read()
-            for i in range(0, len(data) // 4):
-                if _one_in(1000):
-                    val = struct.unpack('<f', data[i * 4 : i * 4 + 4])[0]
-                    # cast the calculated measure to a 32-bit float
-                    # (since the values were stored to disk as 32-bit floats)
-                    try:
-                        calc = struct.unpack(
-                            '<f',
-                            struct.pack(
-                                '<f', algo(ORIGINALS[i], ORIGINALS[i + 1])
-                            ),
-                        )[0]
-                    except Exception as inst:
-                        self.fail(
-                            'Exception "{}" thrown by {} for: {} & {}'.format(
-                                inst, algo_name, ORIGINALS[i], ORIGINALS[i + 1]
-                            )
+            vals = array('f', file.read())
+        if sys.byteorder == 'big':
+            vals.byteswap()
+        algo = algorithms[algo_name]
+
+        # every pair under EXTREME_TEST, otherwise a sample of 1 in 1000
+        sample = [i for i in range(len(vals)) if _one_in(1000)]
+        vals = array('f', (vals[i] for i in sample))
+        srcs = [ORIGINALS[i] for i in sample]
+        tars = [ORIGINALS[i + 1] for i in sample]
+        try:
+            if calc_many is None:
+                calcs = [algo(src, tar) for src, tar in zip(srcs, tars)]
+            else:
+                calcs = calc_many(algo, srcs, tars)
+        except Exception:
+            for src, tar in zip(srcs, tars):
+                try:
+                    algo(src, tar)
+                except Exception as inst:
+                    self.fail(
+                        'Exception "{}" thrown by {} for: {} & {}'.format(
+                            inst, algo_name, src, tar
                         )
-                    self.assertEqual(val, calc)
+                    )
+            raise
+
+        # cast the calculated measures to 32-bit floats
+        # (since the values were stored to disk as 32-bit floats)
+        for src, tar, val, calc in zip(srcs, tars, vals, array('f', calcs)):
+            self.assertEqual(
+                val, calc, '{} for: {} & {}'.format(algo_name, src, tar)
+            )
 
     def reg_test_aline_sim_score(self):
         """Regression test aline_sim_score."""
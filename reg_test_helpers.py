@@ -0,0 +1,815 @@
+# Copyright 2020 by Christopher C. Little.
+# This file is part of Abydos.
+#
+# Abydos is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Abydos is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Abydos. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""abydos.tests.regression.reg_test_helpers.
+
+This module contains regression tests for the indexes, engines, and batch
+APIs in the helpers directory, checking them against the abydos classes they
+stand in for
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from itertools import combinations
+from math import isnan
+from statistics import mean
+
+from abydos.corpus import UnigramCorpus
+from abydos.distance import (
+    ALINE,
+    AverageLinkage,
+    CompleteLinkage,
+    Cosine,
+    Covington,
+    DamerauLevenshtein,
+    DiscountedLevenshtein,
+    Dice,
+    Editex,
+    Gotoh,
+    HigueraMico,
+    Jaccard,
+    JaroWinkler,
+    Levenshtein,
+    MLIPNS,
+    MetaLevenshtein,
+    MongeElkan,
+    NCDarith,
+    NeedlemanWunsch,
+    Overlap,
+    QGram,
+    SingleLinkage,
+    SmithWaterman,
+    SoftCosine,
+    SoftTFIDF,
+    Synoname,
+    TFIDF,
+    Typo,
+)
+from abydos.fingerprint import (
+    Count,
+    Occurrence,
+    OccurrenceHalved,
+    Position,
+    SkeletonKey,
+    String,
+)
+from abydos.fingerprint import QGram as QGram_f
+from abydos.phonetic import (
+    BeiderMorse,
+    DaitchMokotoff,
+    DoubleMetaphone,
+    FuzzySoundex,
+    Metaphone,
+    Phonet,
+    Phonex,
+    RefinedSoundex,
+    Soundex,
+)
+from abydos.tokenizer import QGrams
+
+import numpy as np
+
+from . import ORIGINALS
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'helpers'))
+
+from _common import load_dist_corpus  # noqa: E402
+from aline_table import TabulatedALINE  # noqa: E402
+from banded_edit import (  # noqa: E402
+    BandedDamerauLevenshtein,
+    BandedLevenshtein,
+    BandedTypo,
+)
+from batch_alignment import (  # noqa: E402
+    BatchGotoh,
+    BatchNeedlemanWunsch,
+    BatchSmithWaterman,
+)
+from bk_tree import BKTree  # noqa: E402
+from blocking_index import BlockingIndex  # noqa: E402
+from bmpm_rules import CompiledBeiderMorse  # noqa: E402
+from covington_search import FastCovington  # noqa: E402
+from deletion_index import DeletionIndex  # noqa: E402
+from distance_batch import calc_many  # noqa: E402
+from fingerprint_batch import batch_fingerprinter  # noqa: E402
+from higueramico_engine import FastHigueraMico  # noqa: E402
+from idf_table import IDFTable  # noqa: E402
+from levenshtein_automaton import LevenshteinTrie  # noqa: E402
+from linkage_engine import LinkageEngine  # noqa: E402
+from minhash_lsh import MinHashLSH  # noqa: E402
+from ncdarith_model import FastNCDarith, train_probs  # noqa: E402
+from nearest_search import NearestSearch  # noqa: E402
+from phonet_index import IndexedPhonet  # noqa: E402
+from phonetic_batch import _as_stored, encode_many  # noqa: E402
+from qgram_index import QGramIndex  # noqa: E402
+from similarity_join import SimilarityJoin  # noqa: E402
+from softcosine_cache import _CACHES, CachedSoftCosine  # noqa: E402
+from sorted_neighbourhood import SortedNeighbourhood  # noqa: E402
+from synoname_batch import CachedSynoname  # noqa: E402
+from token_memo import MemoCache, MemoizedMetric, config_key  # noqa: E402
+
+# a sample of the pairs of consecutive names the distance corpora hold
+PAIRS = list(zip(ORIGINALS[:-1:97], ORIGINALS[1::97]))
+
+
+class RegTestHelpers(unittest.TestCase):
+    """Perform helper regression tests."""
+
+    def _check_banded(self, cls, expected, cutoffs, pairs=PAIRS, **kwargs):
+        self.assertEqual(
+            [cls(**kwargs).dist_abs(src, tar) for src, tar in pairs],
+            expected,
+        )
+        for max_distance in cutoffs:
+            cmp = cls(max_distance=max_distance, **kwargs)
+            for (src, tar), val in zip(pairs, expected):
+                calc = cmp.dist_abs(src, tar)
+                if val <= max_distance:
+                    self.assertEqual(calc, val)
+                else:
+                    self.assertGreater(calc, max_distance)
+
+    def reg_test_banded_levenshtein(self):
+        """Regression test BandedLevenshtein."""
+        self._check_banded(
+            BandedLevenshtein,
+            load_dist_corpus('levenshtein_dist_abs')[::97],
+            (0, 1, 2, 5),
+        )
+        for kwargs, cutoffs in (
+            ({'mode': 'osa'}, (1, 2, 5)),
+            ({'cost': (1, 2, 1.5, 1)}, (1, 2.5, 5)),
+        ):
+            cmp = Levenshtein(**kwargs)
+            self._check_banded(
+                BandedLevenshtein,
+                [cmp.dist_abs(src, tar) for src, tar in PAIRS],
+                cutoffs,
+                **kwargs
+            )
+
+    def reg_test_banded_damerau_levenshtein(self):
+        """Regression test BandedDamerauLevenshtein."""
+        self._check_banded(
+            BandedDamerauLevenshtein,
+            load_dist_corpus('dameraulevenshtein_dist_abs')[::97],
+            (0, 1, 2, 5),
+        )
+        pairs = [('CA', 'ABC'), ('ab', 'ba'), ('bc', 'dcb'), ('cba', 'bca')]
+        self._check_banded(
+            BandedDamerauLevenshtein,
+            [DamerauLevenshtein().dist_abs(src, tar) for src, tar in pairs],
+            (1, 2, 5),
+            pairs,
+        )
+        self.assertRaises(
+            ValueError,
+            BandedDamerauLevenshtein,
+            max_distance=5,
+            cost=(1, 1, 2, 1),
+        )
+
+    def reg_test_banded_typo(self):
+        """Regression test BandedTypo."""
+        # Typo no longer gives all of the typo_dist_abs corpus, so BandedTypo
+        # is checked against Typo itself
+        cmp = Typo()
+        for pairs in (PAIRS, [('Niall', 'Neil')]):
+            self._check_banded(
+                BandedTypo,
+                [cmp.dist_abs(src, tar) for src, tar in pairs],
+                (1.0, 2.0, 3.5),
+                pairs,
+            )
+
+    def reg_test_batch_alignment(self):
+        """Regression test BatchNeedlemanWunsch, etc."""
+        pairs = PAIRS[::4]
+        for cmp, batch_cmp in (
+            (NeedlemanWunsch(), BatchNeedlemanWunsch()),
+            (SmithWaterman(), BatchSmithWaterman()),
+            (Gotoh(), BatchGotoh()),
+        ):
+            for method in ('sim_score', 'sim'):
+                self.assertEqual(
+                    getattr(batch_cmp, method + '_many')(pairs).tolist(),
+                    [getattr(cmp, method)(src, tar) for src, tar in pairs],
+                )
+            self.assertTrue(isnan(cmp.sim('', 'Niall')))
+            self.assertTrue(isnan(batch_cmp.sim_many([('', 'Niall')])[0]))
+            self.assertEqual(batch_cmp.sim_many([('', '')])[0], 1.0)
+
+    def reg_test_fast_covington(self):
+        """Regression test FastCovington."""
+        cmp = Covington()
+        fast_cmp = FastCovington()
+        for src, tar in PAIRS[::40] + [
+            ('', ''),
+            ('Niall', ''),
+            ('Niall', 'Neil'),
+        ]:
+            self.assertEqual(
+                fast_cmp.dist_abs(src, tar), cmp.dist_abs(src, tar)
+            )
+            self.assertEqual(fast_cmp.dist(src, tar), cmp.dist(src, tar))
+            for top_n in (0, 3):
+                self.assertEqual(
+                    fast_cmp.alignments(src, tar, top_n),
+                    cmp.alignments(src, tar, top_n),
+                )
+        self.assertEqual(
+            fast_cmp.alignment('Niall', 'Neil'), (115, 'Niall', 'Neil-')
+        )
+
+    def reg_test_compiled_beider_morse(self):
+        """Regression test CompiledBeiderMorse."""
+        for kwargs in (
+            {},
+            {'language_arg': 'german'},
+            {'match_mode': 'exact'},
+            {'name_mode': 'ash'},
+            {'name_mode': 'sep', 'match_mode': 'exact'},
+        ):
+            bmpm = BeiderMorse(**kwargs)
+            compiled_bmpm = CompiledBeiderMorse(**kwargs)
+            for name in ORIGINALS[::1499]:
+                self.assertEqual(compiled_bmpm.encode(name), bmpm.encode(name))
+
+    def reg_test_indexed_phonet(self):
+        """Regression test IndexedPhonet."""
+        for kwargs in (
+            {},
+            {'mode': 2},
+            {'lang': 'none'},
+            {'mode': 2, 'lang': 'none'},
+        ):
+            pe = Phonet(**kwargs)
+            indexed_pe = IndexedPhonet(**kwargs)
+            for name in ORIGINALS[::499] + [
+                '',
+                'Müller-Lüdenscheidt',
+                "O'Brien",
+                'van den Berg',
+                'zurück',
+                'Zulasten',
+                'Chaussee',
+            ]:
+                self.assertEqual(indexed_pe.encode(name), pe.encode(name))
+
+    def reg_test_config_key(self):
+        """Regression test config_key."""
+        self.assertEqual(
+            config_key(SoftCosine(metric=Levenshtein())),
+            config_key(SoftCosine(metric=Levenshtein())),
+        )
+        self.assertNotEqual(
+            config_key(SoftCosine(metric=Levenshtein())),
+            config_key(SoftCosine(metric=Levenshtein(mode='osa'))),
+        )
+        self.assertEqual(
+            config_key(MongeElkan(sim_func=Levenshtein().sim)),
+            config_key(MongeElkan(sim_func=Levenshtein().sim)),
+        )
+        self.assertNotEqual(
+            config_key(MongeElkan(sim_func=Levenshtein().sim)),
+            config_key(MongeElkan(sim_func=Levenshtein().dist)),
+        )
+        self.assertNotEqual(
+            config_key(MongeElkan(sim_func=lambda src, tar: 0.0)),
+            config_key(MongeElkan(sim_func=lambda src, tar: 1.0)),
+        )
+
+        # neither per-call state nor object identity is part of the key
+        used = SoftCosine(tokenizer=QGrams(qval=3))
+        used.sim('Niall', 'Neil')
+        self.assertEqual(
+            config_key(used), config_key(SoftCosine(tokenizer=QGrams(qval=3)))
+        )
+        self.assertNotIn('0x', repr(config_key(used)))
+
+        # DiscountedLevenshtein keeps discount_func under no attribute, so an
+        # instance is keyed by itself
+        cmp = DiscountedLevenshtein()
+        self.assertEqual(config_key(cmp), config_key(cmp))
+        self.assertNotEqual(
+            config_key(cmp), config_key(DiscountedLevenshtein())
+        )
+
+    def reg_test_cached_soft_cosine(self):
+        """Regression test CachedSoftCosine."""
+        for kwargs in ({}, {'sim_method': 'b'}, {'metric': Typo()}):
+            cmp = SoftCosine(**kwargs)
+            cached_cmp = CachedSoftCosine(**kwargs)
+            self.assertEqual(
+                [cached_cmp.sim(src, tar) for src, tar in PAIRS[::4]],
+                [cmp.sim(src, tar) for src, tar in PAIRS[::4]],
+            )
+
+    def reg_test_soft_cosine_cache_file(self):
+        """Regression test CachedSoftCosine.load_cache & save_cache."""
+        cached_cmp = CachedSoftCosine(tokenizer=QGrams(qval=4))
+        cached_cmp.sim('Niall', 'Neil')
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_file = os.path.join(tmpdir, 'softcosine.pkl')
+            CachedSoftCosine.save_cache(cache_file)
+            key = cached_cmp._cache_key
+            del _CACHES[key]
+            loaded_cmp = CachedSoftCosine(
+                tokenizer=QGrams(qval=4),
+                cache_size=1000,
+                cache_file=cache_file,
+            )
+        self.assertEqual(_CACHES[key].maxsize, 1000)
+        self.assertEqual(
+            _CACHES[key].get(('$Ni', 'Nei')),
+            cached_cmp.cache.get(('$Ni', 'Nei')),
+        )
+        self.assertEqual(
+            loaded_cmp.sim('Niall', 'Neil'), cached_cmp.sim('Niall', 'Neil')
+        )
+
+    def reg_test_memoized_metric(self):
+        """Regression test MemoizedMetric."""
+        memo = MemoCache(maxsize=64)
+        for cmp, memo_cmp in (
+            (
+                MongeElkan().sim,
+                MongeElkan(sim_func=MemoizedMetric(Levenshtein(), memo)).sim,
+            ),
+            (
+                MetaLevenshtein().dist_abs,
+                MetaLevenshtein(
+                    metric=MemoizedMetric(JaroWinkler(), memo)
+                ).dist_abs,
+            ),
+            (
+                SoftTFIDF().sim,
+                SoftTFIDF(metric=MemoizedMetric(JaroWinkler(), memo)).sim,
+            ),
+        ):
+            self.assertEqual(
+                [memo_cmp(src, tar) for src, tar in PAIRS[::4]],
+                [cmp(src, tar) for src, tar in PAIRS[::4]],
+            )
+        self.assertLessEqual(len(memo), 64)
+        self.assertGreater(memo.evictions, 0)
+        self.assertGreater(memo.hits, 0)
+
+    def reg_test_tabulated_aline(self):
+        """Regression test TabulatedALINE."""
+        pairs = PAIRS[::10] + [('', ''), ('Niall', ''), ('Niall', 'Neil')]
+        for kwargs in (
+            {},
+            {'mode': 'global'},
+            {'mode': 'half-local'},
+            {'mode': 'semi-global'},
+            {'normalizer': mean},
+        ):
+            cmp = ALINE(**kwargs)
+            tabulated_cmp = TabulatedALINE(**kwargs)
+            for src, tar in pairs:
+                self.assertEqual(
+                    tabulated_cmp.alignments(src, tar, score_only=True),
+                    cmp.alignments(src, tar, score_only=True),
+                )
+                self.assertEqual(
+                    tabulated_cmp.sim(src, tar), cmp.sim(src, tar)
+                )
+
+    def reg_test_linkage_engine(self):
+        """Regression test LinkageEngine."""
+        measures = (
+            SingleLinkage().dist_abs,
+            SingleLinkage().dist,
+            CompleteLinkage().dist_abs,
+            CompleteLinkage().dist,
+            AverageLinkage().dist,
+        )
+        pairs = PAIRS[::6] + [('', ''), ('Niall', ''), ('Niall', 'Niall')]
+        values = LinkageEngine().linkages_many(pairs)
+        for cmp, calcs in zip(measures, values):
+            self.assertEqual(
+                calcs.tolist(), [cmp(src, tar) for src, tar in pairs]
+            )
+
+        engine = LinkageEngine()
+        for src, tar in pairs:
+            linkages = engine.linkages(src, tar)
+            self.assertEqual(
+                list(linkages), [cmp(src, tar) for cmp in measures]
+            )
+            for value in linkages:
+                self.assertIsInstance(value, float)
+
+    def reg_test_phonetic_batch(self):
+        """Regression test the phonetic batch API."""
+        words = ORIGINALS[::97] + ['', '0Bm', 'MacHugh', 'Müller-Lüdenscheidt']
+        for encoder in (
+            Soundex(),
+            Soundex(reverse=True),
+            Soundex(zero_pad=True, max_length=6),
+            Soundex(var='special'),
+            Soundex(var='Census'),
+            RefinedSoundex(),
+            RefinedSoundex(retain_vowels=True),
+            RefinedSoundex(zero_pad=True, max_length=6),
+            FuzzySoundex(),
+            FuzzySoundex(max_length=8, zero_pad=True),
+            Phonex(),
+            Phonex(max_length=6, zero_pad=True),
+            DoubleMetaphone(),
+        ):
+            self.assertEqual(
+                list(encode_many(encoder, words)),
+                [encoder.encode(word) for word in words],
+            )
+
+        self.assertEqual(list(encode_many(FuzzySoundex(), ['0Bm'])), ['15000'])
+        self.assertEqual(_as_stored(DoubleMetaphone().encode('Aaron')), 'ARN,')
+        self.assertEqual(
+            _as_stored(DaitchMokotoff().encode('Jayjohn')),
+            '146000,160000,414600,416000',
+        )
+
+    def reg_test_fast_higueramico(self):
+        """Regression test FastHigueraMico."""
+        pairs = PAIRS[::4] + [
+            ('', ''),
+            ('Niall', ''),
+            ('', 'Niall'),
+            ('Niall', 'Niall'),
+        ]
+        cmp = HigueraMico()
+        fast_cmp = FastHigueraMico()
+        for src, tar in pairs:
+            self.assertEqual(
+                fast_cmp.dist_abs(src, tar), cmp.dist_abs(src, tar)
+            )
+            self.assertEqual(fast_cmp.dist(src, tar), cmp.dist(src, tar))
+        self.assertEqual(
+            fast_cmp.dist_abs_many(pairs).tolist(),
+            [cmp.dist_abs(src, tar) for src, tar in pairs],
+        )
+        self.assertEqual(
+            fast_cmp.dist_many(pairs).tolist(),
+            [cmp.dist(src, tar) for src, tar in pairs],
+        )
+
+    def reg_test_fast_ncdarith(self):
+        """Regression test FastNCDarith."""
+        pairs = PAIRS[::4] + [('', ''), ('Niall', ''), ('Niall', 'Niall')]
+        probs = train_probs(ORIGINALS[::97])
+        for kwargs in (
+            {},
+            {'probs': probs},
+            {'probs': probs, 'cache_size': 8},
+        ):
+            cmp = NCDarith(**kwargs)
+            fast_cmp = FastNCDarith(**kwargs)
+            for src, tar in pairs:
+                self.assertEqual(fast_cmp.dist(src, tar), cmp.dist(src, tar))
+                self.assertEqual(fast_cmp.sim(src, tar), cmp.sim(src, tar))
+            self.assertEqual(
+                fast_cmp.dist_many(pairs).tolist(),
+                [cmp.dist(src, tar) for src, tar in pairs],
+            )
+
+    def reg_test_idf_table(self):
+        """Regression test IDFTable."""
+        names = [name for pair in PAIRS for name in pair]
+        tokenizer = TFIDF().params['tokenizer']
+        corpus = UnigramCorpus(word_tokenizer=tokenizer)
+        for name in names:
+            corpus.add_document(name)
+        table = IDFTable.from_documents(names, tokenizer)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'idf.pkl')
+            table.save(filename)
+            loaded = IDFTable.load(filename)
+
+        self.assertEqual(len(loaded), len(corpus.corpus))
+        for token in corpus.corpus:
+            self.assertEqual(table.idf(token), corpus.idf(token))
+            self.assertEqual(loaded.idf(token), corpus.idf(token))
+        self.assertEqual(table.idf('zz'), corpus.idf('zz'))
+
+        for cls in (TFIDF, SoftTFIDF):
+            cmp = cls(corpus=corpus)
+            table_cmp = cls(corpus=loaded)
+            for src, tar in PAIRS[::4]:
+                self.assertEqual(table_cmp.sim(src, tar), cmp.sim(src, tar))
+
+    def reg_test_cached_synoname(self):
+        """Regression test CachedSynoname."""
+        pairs = PAIRS[::4] + [
+            (('Breghel', 'Pieter', ''), ('Brueghel', 'Pieter', '')),
+            (('Rubens', 'Peter Paul', ''), ('Rubens', 'Peter P.', '')),
+            (('van Dyck', 'Anthony', ''), ('Dyck', 'Anthony van', '')),
+            ('', ''),
+        ]
+        for kwargs in ({}, {'ret_name': True}, {'cache_size': 8}):
+            cmp = Synoname(**kwargs)
+            cached_cmp = CachedSynoname(**kwargs)
+            for src, tar in pairs:
+                self.assertEqual(
+                    cached_cmp.dist_abs(src, tar), cmp.dist_abs(src, tar)
+                )
+                self.assertEqual(
+                    cached_cmp.dist_abs(src, tar, force_numeric=True),
+                    cmp.dist_abs(src, tar, force_numeric=True),
+                )
+            self.assertEqual(
+                cached_cmp.dist_abs_many(pairs),
+                [cmp.dist_abs(src, tar) for src, tar in pairs],
+            )
+            self.assertEqual(
+                cached_cmp.dist_many(pairs),
+                [cmp.dist(src, tar) for src, tar in pairs],
+            )
+
+    def reg_test_fingerprint_batch(self):
+        """Regression test the fingerprint batch API."""
+        words = ORIGINALS[::97] + ['', 'Müller-Lüdenscheidt', 'de la Cruz']
+        for fingerprinter in (
+            Count(),
+            Position(),
+            Position(n_bits=32, bits_per_letter=2),
+            Occurrence(),
+            OccurrenceHalved(),
+        ):
+            batch = batch_fingerprinter(fingerprinter)
+            fingerprints = [fingerprinter.fingerprint(word) for word in words]
+            self.assertEqual(
+                list(batch.fingerprint_many(words, as_int=True)),
+                fingerprints,
+            )
+            self.assertEqual(
+                [int(bits, 2) for bits in batch.fingerprint_many(words)],
+                fingerprints,
+            )
+        for fingerprinter in (
+            String(),
+            QGram_f(),
+            QGram_f(qval=3),
+            QGram_f(start_stop='$#', joiner=' '),
+            SkeletonKey(),
+        ):
+            self.assertEqual(
+                list(
+                    batch_fingerprinter(fingerprinter).fingerprint_many(words)
+                ),
+                [fingerprinter.fingerprint(word) for word in words],
+            )
+
+    def reg_test_distance_batch(self):
+        """Regression test the distance batch API."""
+        pairs = PAIRS[::4] + [('', ''), ('Niall', ''), ('Niall', 'Niall')]
+        for batch_method, method in (
+            (Levenshtein().dist_abs, Levenshtein().dist_abs),
+            (Levenshtein().dist, Levenshtein().dist),
+            (Jaccard().sim, Jaccard().sim),
+            (Jaccard().dist, Jaccard().dist),
+            (Editex().dist, Editex().dist),
+            (MLIPNS().sim, MLIPNS().sim),
+            (FastHigueraMico().dist_abs, HigueraMico().dist_abs),
+            (FastHigueraMico().dist, HigueraMico().dist),
+            (FastNCDarith().dist, NCDarith().dist),
+        ):
+            self.assertEqual(
+                calc_many(batch_method, pairs).tolist(),
+                [method(src, tar) for src, tar in pairs],
+            )
+        srcs, tars = zip(*pairs)
+        self.assertEqual(
+            calc_many(Levenshtein().dist, srcs, tars).tolist(),
+            calc_many(Levenshtein().dist, pairs).tolist(),
+        )
+
+    def reg_test_bk_tree(self):
+        """Regression test BKTree."""
+        names = ORIGINALS[::97]
+        cmp = Levenshtein()
+        tree = BKTree(names + names[:10])
+        self.assertEqual(len(tree), len(set(names)))
+        for query in ('Nial', 'Smyth', '', names[100]):
+            scanned = sorted(
+                (cmp.dist_abs(query, name), name) for name in set(names)
+            )
+            for radius in (0, 1, 2):
+                self.assertEqual(
+                    tree.query(query, radius),
+                    [found for found in scanned if found[0] <= radius],
+                )
+            for k in (1, 5):
+                self.assertEqual(tree.nearest(query, k), scanned[:k])
+
+    def reg_test_qgram_index(self):
+        """Regression test QGramIndex."""
+        names = ORIGINALS[::97]
+        for cmp in (Jaccard(), Dice(), Cosine(), Overlap(), QGram()):
+            index = QGramIndex(names, cmp)
+            for query in ('Nial', 'Smyth', 'A', '', names[100]):
+                scored = sorted(
+                    (-cmp.sim(query, name), name) for name in set(names)
+                )
+                for threshold in (0.3, 0.6):
+                    self.assertEqual(
+                        index.query(query, threshold),
+                        [
+                            (-key, name)
+                            for key, name in scored
+                            if -key >= threshold
+                        ],
+                    )
+
+    def reg_test_minhash_lsh(self):
+        """Regression test MinHashLSH."""
+        names = ORIGINALS[::97]
+        cmp = Jaccard()
+        index = MinHashLSH(names)
+        for name in names[::50]:
+            self.assertIn(name, index.candidates(name))
+            self.assertEqual(index.sim(name, name), 1.0)
+        self.assertEqual(index.sim('', ''), 1.0)
+
+        for query in ('Nial', 'Smyth', names[100]):
+            candidates = index.candidates(query)
+            found = index.query(query, 0.3, cmp)
+            self.assertEqual(
+                found,
+                sorted(
+                    (
+                        (cmp.sim(query, name), name)
+                        for name in candidates
+                        if cmp.sim(query, name) >= 0.3
+                    ),
+                    key=lambda entry: (-entry[0], entry[1]),
+                ),
+            )
+            for sim, name in index.query(query, 0.3):
+                self.assertIn(name, candidates)
+                self.assertEqual(sim, index.sim(query, name))
+                self.assertGreaterEqual(sim, 0.3)
+
+        index_32 = MinHashLSH(names, dtype=np.uint32)
+        for name in names[::50]:
+            self.assertEqual(
+                index_32.signature(name).tolist(),
+                index.signature(name).astype(np.uint32).tolist(),
+            )
+
+    def reg_test_blocking_index(self):
+        """Regression test BlockingIndex."""
+        names = ORIGINALS[::97]
+        soundex = Soundex()
+        metaphone = Metaphone()
+        index = BlockingIndex(names, soundex, metaphone)
+        keys = {
+            name: (soundex.encode(name), metaphone.encode(name))
+            for name in names
+        }
+
+        def shared(src, tar):
+            return any(
+                src_key == tar_key
+                for src_key, tar_key in zip(keys[src], keys[tar])
+            )
+
+        expected = {
+            (src, tar)
+            for src, tar in combinations(names, 2)
+            if shared(src, tar)
+        }
+        pairs = list(index.pairs())
+        self.assertEqual(len(pairs), len(expected))
+        self.assertEqual(set(pairs), expected)
+        self.assertEqual(index.pair_count(), len(expected))
+
+        query = names[len(names) // 2]
+        self.assertEqual(
+            index.candidates(query),
+            [name for name in names if shared(name, query)],
+        )
+
+    def reg_test_sorted_neighbourhood(self):
+        """Regression test SortedNeighbourhood."""
+        names = ORIGINALS[::97]
+        soundex = Soundex()
+        neighbourhood = SortedNeighbourhood(names, soundex)
+        ordered = sorted(names, key=soundex.encode)
+        self.assertEqual(neighbourhood.sorted_words(), ordered)
+        self.assertEqual(
+            SortedNeighbourhood(names).sorted_words(), sorted(names)
+        )
+
+        for window in (2, 5):
+            expected = [
+                (src, tar)
+                for pos, src in enumerate(ordered)
+                for tar in ordered[pos + 1 : pos + window]
+            ]
+            self.assertEqual(list(neighbourhood.pairs(window)), expected)
+            self.assertEqual(neighbourhood.pair_count(window), len(expected))
+            self.assertEqual(
+                [
+                    pair
+                    for batch in neighbourhood.batches(window, 100)
+                    for pair in batch
+                ],
+                expected,
+            )
+            cmp = Levenshtein()
+            for batch, values in neighbourhood.score(cmp.dist, window, 100):
+                self.assertEqual(
+                    values.tolist(),
+                    [cmp.dist(src, tar) for src, tar in batch],
+                )
+
+    def reg_test_similarity_join(self):
+        """Regression test SimilarityJoin."""
+        words = ORIGINALS[::499] + ['', 'A', 'B', 'Al', 'Bo', 'Alb']
+        pairs = [sorted(pair) for pair in combinations(words, 2)]
+        for cmp in (Jaccard(), QGram()):
+            join = SimilarityJoin(words, cmp)
+            scored = sorted(
+                (src, tar, cmp.sim(src, tar)) for src, tar in pairs
+            )
+            for threshold in (0.3, 0.6, 1.0):
+                self.assertEqual(
+                    join.join(threshold),
+                    [pair for pair in scored if pair[2] >= threshold],
+                )
+
+    def reg_test_nearest_search(self):
+        """Regression test NearestSearch."""
+        names = list(dict.fromkeys(ORIGINALS[::97]))
+        for cmp, method, sign in (
+            (JaroWinkler(), 'sim', -1),
+            (Levenshtein(), 'dist_abs', 1),
+        ):
+            calc = getattr(cmp, method)
+            searcher = NearestSearch(names, cmp, method, batch_size=100)
+            for query in ('Nial', 'Smyth', ''):
+                scanned = sorted(
+                    (sign * calc(query, name), name) for name in names
+                )
+                self.assertEqual(
+                    searcher.search(query, 5),
+                    [(sign * key, name) for key, name in scanned[:5]],
+                )
+
+    def reg_test_levenshtein_trie(self):
+        """Regression test LevenshteinTrie."""
+        names = ORIGINALS[::97] + ['']
+        for transpositions, cmp in (
+            (False, Levenshtein()),
+            (True, DamerauLevenshtein()),
+        ):
+            trie = LevenshteinTrie(names, transpositions)
+            for query in ('Nial', 'Smtih', 'A', '', names[100]):
+                scanned = sorted(
+                    (cmp.dist_abs(query, name), name) for name in set(names)
+                )
+                for radius in (0, 1, 2):
+                    self.assertEqual(
+                        trie.query(query, radius),
+                        [found for found in scanned if found[0] <= radius],
+                    )
+
+    def reg_test_deletion_index(self):
+        """Regression test DeletionIndex."""
+        names = ORIGINALS[::97] + ['']
+        cmp = Levenshtein()
+        index = DeletionIndex(names, 2)
+        for query in ('Nial', 'Smtih', 'A', '', names[100]):
+            scanned = sorted(
+                (cmp.dist_abs(query, name), name) for name in set(names)
+            )
+            for radius in (0, 1, 2):
+                found = [found for found in scanned if found[0] <= radius]
+                self.assertEqual(index.query(query, radius), found)
+                candidates = index.candidates(query, radius)
+                for _, name in found:
+                    self.assertIn(name, candidates)
+        with self.assertRaises(ValueError):
+            index.query('Nial', 3)
+
+
+if __name__ == '__main__':
+    unittest.main()